@@ -0,0 +1,156 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from prometheus_client import Counter, Gauge, Histogram
+
+WEBHOOK_WORKERS = int(os.getenv('ALERT_WEBHOOK_WORKERS', '2'))
+WEBHOOK_QUEUE_SIZE = int(os.getenv('ALERT_WEBHOOK_QUEUE_SIZE', '1000'))
+WEBHOOK_BATCH_SIZE = int(os.getenv('ALERT_WEBHOOK_BATCH_SIZE', '20'))
+WEBHOOK_LINGER_SECONDS = float(os.getenv('ALERT_WEBHOOK_LINGER_SECONDS', '1.0'))
+WEBHOOK_MAX_RETRIES = int(os.getenv('ALERT_WEBHOOK_MAX_RETRIES', '5'))
+WEBHOOK_BACKOFF_SECONDS = float(os.getenv('ALERT_WEBHOOK_BACKOFF_SECONDS', '0.5'))
+WEBHOOK_MAX_BACKOFF_SECONDS = 30.0
+WEBHOOK_TIMEOUT_SECONDS = float(os.getenv('ALERT_WEBHOOK_TIMEOUT_SECONDS', '3'))
+WEBHOOK_DEAD_LETTER_SIZE = int(os.getenv('ALERT_WEBHOOK_DEAD_LETTER_SIZE', '200'))
+
+WEBHOOK_QUEUE_DEPTH = Gauge(
+    'alert_webhook_queue_depth', 'Alerts waiting for webhook delivery', multiprocess_mode='livesum'
+)
+WEBHOOK_LATENCY = Histogram('alert_webhook_delivery_seconds', 'Webhook delivery latency including retries')
+WEBHOOK_DELIVERIES = Counter(
+    'alert_webhook_deliveries_total',
+    'Webhook delivery attempts by outcome',
+    ['outcome']
+)
+
+
+class _PermanentFailure(Exception):
+    pass
+
+
+class WebhookDispatcher:
+    """Deliver alerts to a webhook from a worker pool instead of the collector thread.
+
+    Alerts are queued (bounded), coalesced into batches of up to
+    `batch_size` events, and posted over a keep-alive session. Failed
+    batches are retried with exponential backoff; batches that exhaust
+    their retries, or alerts that do not fit in the queue, are kept in a
+    bounded dead-letter buffer.
+    """
+
+    def __init__(self, url, workers=WEBHOOK_WORKERS, queue_size=WEBHOOK_QUEUE_SIZE,
+                 batch_size=WEBHOOK_BATCH_SIZE, linger_seconds=WEBHOOK_LINGER_SECONDS,
+                 max_retries=WEBHOOK_MAX_RETRIES, backoff_seconds=WEBHOOK_BACKOFF_SECONDS):
+        self.url = url
+        self.workers = workers
+        self.batch_size = batch_size
+        self.linger_seconds = linger_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.dead_letters = deque(maxlen=WEBHOOK_DEAD_LETTER_SIZE)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._threads = []
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'alert-webhook-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._session.close()
+
+    def submit(self, event):
+        """Queue an alert without blocking; returns False if it was dead-lettered."""
+        try:
+            self._queue.put_nowait(event)
+            WEBHOOK_QUEUE_DEPTH.set(self._queue.qsize())
+            return True
+        except queue.Full:
+            self._dead_letter([event], 'queue full')
+            return False
+
+    def stats(self):
+        return {
+            'queue_depth': self._queue.qsize(),
+            'dead_letters': len(self.dead_letters),
+            'recent_dead_letters': list(self.dead_letters)[-10:],
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.linger_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            WEBHOOK_QUEUE_DEPTH.set(self._queue.qsize())
+            self._deliver(batch)
+
+    def _payload(self, batch):
+        lines = [f"[{e['severity'].upper()}] {e['type']}: {e['message']}" for e in batch]
+        payload = {'text': '\n'.join(lines), 'alerts': batch}
+        if len(batch) == 1:
+            payload['payload'] = batch[0]
+        return payload
+
+    def _deliver(self, batch):
+        payload = self._payload(batch)
+        start = time.perf_counter()
+        delay = self.backoff_seconds
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self._session.post(self.url, json=payload, timeout=WEBHOOK_TIMEOUT_SECONDS)
+                if response.status_code < 400:
+                    WEBHOOK_DELIVERIES.labels(outcome='success').inc()
+                    WEBHOOK_LATENCY.observe(time.perf_counter() - start)
+                    return
+                if response.status_code != 429 and response.status_code < 500:
+                    raise _PermanentFailure(f'HTTP {response.status_code}')
+                error = f'HTTP {response.status_code}'
+            except _PermanentFailure as exc:
+                self._dead_letter(batch, str(exc))
+                return
+            except requests.RequestException as exc:
+                error = str(exc)
+
+            if attempt == self.max_retries or self._stop.is_set():
+                break
+            WEBHOOK_DELIVERIES.labels(outcome='retry').inc()
+            self._stop.wait(delay)
+            delay = min(delay * 2, WEBHOOK_MAX_BACKOFF_SECONDS)
+
+        WEBHOOK_LATENCY.observe(time.perf_counter() - start)
+        print(f"Alert webhook delivery failed: {error}")
+        self._dead_letter(batch, error)
+
+    def _dead_letter(self, batch, reason):
+        WEBHOOK_DELIVERIES.labels(outcome='dead_letter').inc()
+        self.dead_letters.append({
+            'failed_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'reason': reason,
+            'alerts': batch,
+        })
@@ -0,0 +1,407 @@
+import bisect
+import json
+import math
+import operator
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+from coordination import COLLECTOR_STATE_DIR
+
+ALERT_RULES_FILE = os.getenv('ALERT_RULES_FILE', '').strip()
+ALERT_EVENT_LOG_SIZE = int(os.getenv('ALERT_EVENT_LOG_SIZE', '200'))
+ALERT_EVENT_LOG = os.getenv(
+    'ALERT_EVENT_LOG',
+    os.path.join(COLLECTOR_STATE_DIR, 'alert_events.ndjson') if COLLECTOR_STATE_DIR else ''
+).strip()
+
+_OPERATORS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+_AGGREGATES = ('last', 'avg', 'min', 'max', 'rate')
+
+
+class RuleError(ValueError):
+    """An alert rule definition is invalid."""
+
+
+class _Window:
+    """Sliding time window over one signal with running aggregates.
+
+    avg, min, max, rate and last are O(1) per sample (running sum and
+    monotonic deques). Percentiles keep a sorted copy of the window,
+    which is only maintained when a rule asks for one.
+    """
+
+    __slots__ = ('seconds', 'samples', 'total', 'lows', 'highs', 'ordered')
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.samples = deque()
+        self.total = 0.0
+        self.lows = deque()
+        self.highs = deque()
+        self.ordered = None
+
+    def push(self, ts, value):
+        sample = (ts, value)
+        self.samples.append(sample)
+        self.total += value
+        while self.lows and self.lows[-1][1] >= value:
+            self.lows.pop()
+        self.lows.append(sample)
+        while self.highs and self.highs[-1][1] <= value:
+            self.highs.pop()
+        self.highs.append(sample)
+        if self.ordered is not None:
+            bisect.insort(self.ordered, value)
+
+        horizon = ts - self.seconds
+        while len(self.samples) > 1 and self.samples[0][0] <= horizon:
+            old = self.samples.popleft()
+            self.total -= old[1]
+            if self.lows[0] is old:
+                self.lows.popleft()
+            if self.highs[0] is old:
+                self.highs.popleft()
+            if self.ordered is not None:
+                del self.ordered[bisect.bisect_left(self.ordered, old[1])]
+        if len(self.samples) == 1:
+            self.total = value  # drop accumulated float error whenever the window restarts
+
+    def track_percentiles(self):
+        if self.ordered is None:
+            self.ordered = sorted(value for _, value in self.samples)
+
+    def value(self, aggregate):
+        if not self.samples:
+            return None
+        if aggregate == 'last':
+            return self.samples[-1][1]
+        if aggregate == 'avg':
+            return self.total / len(self.samples)
+        if aggregate == 'min':
+            return self.lows[0][1]
+        if aggregate == 'max':
+            return self.highs[0][1]
+        if aggregate == 'rate':
+            (t0, v0), (t1, v1) = self.samples[0], self.samples[-1]
+            return (v1 - v0) / (t1 - t0) if t1 > t0 else None
+        # pNN
+        rank = max(1, math.ceil(float(aggregate[1:]) / 100 * len(self.ordered)))
+        return self.ordered[rank - 1]
+
+
+def _parse_aggregate(value):
+    aggregate = str(value or 'avg').lower()
+    if aggregate in _AGGREGATES:
+        return aggregate
+    if aggregate.startswith('p'):
+        try:
+            if 0 < float(aggregate[1:]) <= 100:
+                return aggregate
+        except ValueError:
+            pass
+    raise RuleError(f"aggregate must be one of {', '.join(_AGGREGATES)} or a percentile such as p95")
+
+
+class AlertRule:
+    """One declarative rule, e.g. "avg of *.load over 30s > 80 for 10s".
+
+    `signal` names a flattened metric ("amf.load", "latency_ms"); a `*`
+    NF wildcard ("*.load") makes one instance per matching NF. The alert
+    fires once the condition has held for `for` seconds, escalates to
+    critical past `critical`, and resolves only when the value crosses
+    back past `clear` (hysteresis; defaults to the threshold).
+    """
+
+    def __init__(self, spec, repeat_seconds):
+        try:
+            self.name = str(spec['name'])
+            self.signal = str(spec['signal'])
+            self.op = str(spec.get('op', '>'))
+            self.threshold = float(spec['threshold'])
+        except KeyError as exc:
+            raise RuleError(f'rule is missing {exc.args[0]!r}')
+        except (TypeError, ValueError):
+            raise RuleError(f"rule {spec.get('name')!r}: threshold must be a number")
+        if self.op not in _OPERATORS:
+            raise RuleError(f"rule {self.name!r}: op must be one of {', '.join(_OPERATORS)}")
+        self.compare = _OPERATORS[self.op]
+        try:
+            self.aggregate = _parse_aggregate(spec.get('aggregate'))
+        except RuleError as exc:
+            raise RuleError(f'rule {self.name!r}: {exc}')
+        try:
+            self.window = float(spec.get('window', 0))
+            self.hold = float(spec.get('for', 0))
+            self.repeat = float(spec.get('repeat', repeat_seconds))
+            self.clear = float(spec['clear']) if spec.get('clear') is not None else self.threshold
+            self.critical = float(spec['critical']) if spec.get('critical') is not None else None
+        except (TypeError, ValueError):
+            raise RuleError(f'rule {self.name!r}: window, for, repeat, clear and critical must be numbers')
+        if self.aggregate == 'rate' and self.window <= 0:
+            raise RuleError(f'rule {self.name!r}: rate needs a window')
+        self.type = str(spec.get('type', self.name))
+        self.group = str(spec.get('group', self.type))
+        self.severity = str(spec.get('severity', 'warning'))
+        self.message = str(spec.get('message', '{rule}: {signal} {aggregate} is {value:.2f} ({op} {threshold})'))
+
+    def matches(self, key):
+        """Labels for a flattened signal key this rule applies to, or None."""
+        if '*' not in self.signal:
+            return {} if key == self.signal else None
+        prefix, _, suffix = self.signal.partition('*')
+        if key.startswith(prefix) and key.endswith(suffix) and len(key) > len(prefix) + len(suffix):
+            return {'nf': key[len(prefix):len(key) - len(suffix)]}
+        return None
+
+    def to_dict(self):
+        return {
+            'name': self.name, 'type': self.type, 'group': self.group, 'signal': self.signal,
+            'aggregate': self.aggregate, 'window': self.window, 'op': self.op,
+            'threshold': self.threshold, 'clear': self.clear, 'critical': self.critical,
+            'for': self.hold, 'repeat': self.repeat, 'severity': self.severity,
+        }
+
+
+class _Instance:
+    __slots__ = ('rule', 'key', 'labels', 'window', 'fingerprint', 'status', 'since', 'severity',
+                 'notified_at', 'value')
+
+    def __init__(self, rule, key, labels, window):
+        self.rule = rule
+        self.key = key
+        self.labels = labels
+        self.window = window
+        self.fingerprint = rule.name + ''.join(f',{k}={v}' for k, v in sorted(labels.items()))
+        self.status = 'ok'
+        self.since = None
+        self.severity = None
+        self.notified_at = 0.0
+        self.value = None
+
+
+def load_rules(path, defaults, repeat_seconds):
+    """Rules from a JSON file (a list, or {"rules": [...]}) or `defaults`; invalid rules are skipped."""
+    specs = defaults
+    if path:
+        try:
+            with open(path, encoding='utf-8') as handle:
+                loaded = json.load(handle)
+            specs = loaded.get('rules', []) if isinstance(loaded, dict) else loaded
+        except (OSError, ValueError) as e:
+            print(f"⚠ Could not load alert rules from {path}: {e}; using defaults")
+    rules = []
+    for spec in specs:
+        try:
+            rules.append(AlertRule(spec, repeat_seconds))
+        except RuleError as e:
+            print(f"⚠ Skipping alert rule: {e}")
+    return rules
+
+
+class AlertEventLog:
+    """Newest-first alert events in a bounded deque, optionally persisted as NDJSON.
+
+    Events are appended to the file as they happen and the last
+    `maxlen` are reloaded on start. The file is rewritten from the deque
+    once it holds several times `maxlen` lines.
+    """
+
+    def __init__(self, maxlen=ALERT_EVENT_LOG_SIZE, path=ALERT_EVENT_LOG):
+        self.path = path or None
+        self._events = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._lines = 0
+        if self.path:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as handle:
+                for line in handle:
+                    self._lines += 1
+                    try:
+                        self._events.appendleft(json.loads(line))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠ Could not read alert event log {self.path}: {e}")
+
+    def add(self, event):
+        with self._lock:
+            self._events.appendleft(event)
+            if self.path:
+                self._persist(event)
+
+    def _persist(self, event):
+        try:
+            if self._lines >= 4 * self._events.maxlen:
+                tmp_path = f'{self.path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as handle:
+                    handle.writelines(json.dumps(e, separators=(',', ':')) + '\n' for e in reversed(self._events))
+                os.replace(tmp_path, self.path)
+                self._lines = len(self._events)
+            else:
+                with open(self.path, 'a', encoding='utf-8') as handle:
+                    handle.write(json.dumps(event, separators=(',', ':')) + '\n')
+                self._lines += 1
+        except OSError as e:
+            print(f"⚠ Could not persist alert event: {e}")
+
+    def list(self, limit=None):
+        with self._lock:
+            events = list(self._events)
+        return events[:limit] if limit is not None else events
+
+    def mirror(self, events):
+        """Replace the contents with another process's events; returns the ones not seen before."""
+        with self._lock:
+            known = {event.get('id') for event in self._events}
+            self._events.clear()
+            self._events.extend(events[:self._events.maxlen])
+        return [event for event in events if event.get('id') not in known]
+
+
+class AlertEngine:
+    """Evaluate alert rules over sliding windows once per collector tick.
+
+    Rules that watch the same signal over the same window share one
+    window, so each tick costs one push per distinct (signal, window)
+    plus an O(1) comparison per rule instance. An instance notifies when
+    it starts firing, when it escalates, every `repeat` seconds while it
+    keeps firing, and once when it resolves.
+    """
+
+    def __init__(self, rules, event_log, on_event=None):
+        self.rules = rules
+        self.event_log = event_log
+        self.on_event = on_event
+        self._windows = {}
+        self._instances = {}
+        self._resolved_keys = set()
+
+    def _instances_for(self, key):
+        instances = []
+        for rule in self.rules:
+            labels = rule.matches(key)
+            if labels is None:
+                continue
+            window_key = (key, rule.window)
+            window = self._windows.get(window_key)
+            if window is None:
+                window = self._windows[window_key] = _Window(rule.window)
+            if rule.aggregate.startswith('p'):
+                window.track_percentiles()
+            instances.append(_Instance(rule, key, labels, window))
+        return instances
+
+    def evaluate(self, signals, now=None):
+        """Feed one sample per signal and return the events raised this tick."""
+        now = time.time() if now is None else now
+        for key in signals.keys() - self._resolved_keys:
+            self._instances[key] = self._instances_for(key)
+            self._resolved_keys.add(key)
+
+        pushed = set()
+        events = []
+        for key, value in signals.items():
+            instances = self._instances[key]
+            if not instances or value is None:
+                continue
+            for instance in instances:
+                window = instance.window
+                if id(window) not in pushed:
+                    window.push(now, float(value))
+                    pushed.add(id(window))
+                event = self._step(instance, now)
+                if event is not None:
+                    events.append(event)
+
+        for event in events:
+            self.event_log.add(event)
+            if self.on_event is not None:
+                self.on_event(event)
+        return events
+
+    def _step(self, instance, now):
+        rule = instance.rule
+        value = instance.window.value(rule.aggregate)
+        if value is None:
+            return None
+        instance.value = value
+
+        if instance.status == 'firing':
+            if not rule.compare(value, rule.clear):
+                instance.status, instance.since = 'ok', None
+                return self._event(instance, now, 'resolved', 'info')
+            severity = self._severity(rule, value)
+            escalated = severity == 'critical' and instance.severity != 'critical'
+            if escalated or (rule.repeat > 0 and now - instance.notified_at >= rule.repeat):
+                instance.severity = severity
+                return self._event(instance, now, 'firing', severity)
+            return None
+
+        if not rule.compare(value, rule.threshold):
+            instance.status, instance.since = 'ok', None
+            return None
+        if instance.status == 'ok':
+            instance.status, instance.since = 'pending', now
+        if now - instance.since < rule.hold:
+            return None
+        instance.status = 'firing'
+        instance.severity = self._severity(rule, value)
+        return self._event(instance, now, 'firing', instance.severity)
+
+    @staticmethod
+    def _severity(rule, value):
+        if rule.critical is not None and rule.compare(value, rule.critical):
+            return 'critical'
+        return rule.severity
+
+    def _event(self, instance, now, status, severity):
+        rule = instance.rule
+        instance.notified_at = now
+        fields = dict(instance.labels, rule=rule.name, signal=instance.key, aggregate=rule.aggregate,
+                      value=instance.value, op=rule.op, threshold=rule.threshold,
+                      NF=instance.labels.get('nf', '').upper())
+        try:
+            message = rule.message.format(**fields)
+        except (KeyError, IndexError, ValueError):
+            message = f'{rule.name}: {instance.key} is {instance.value:.2f}'
+        if status == 'resolved':
+            message = f'Resolved: {message}'
+        return {
+            'id': uuid.uuid4().hex[:16],
+            'type': rule.type,
+            'message': message,
+            'severity': severity,
+            'status': status,
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now)),
+            'rule': rule.name,
+            'group': rule.group,
+            'fingerprint': instance.fingerprint,
+            'metadata': dict(instance.labels, value=round(instance.value, 4), aggregate=rule.aggregate,
+                             window=rule.window, threshold=rule.threshold),
+        }
+
+    def active(self):
+        """Firing and pending instances grouped by rule group."""
+        groups = {}
+        for instances in self._instances.values():
+            for instance in instances:
+                if instance.status == 'ok':
+                    continue
+                groups.setdefault(instance.rule.group, []).append({
+                    'rule': instance.rule.name,
+                    'fingerprint': instance.fingerprint,
+                    'status': instance.status,
+                    'severity': instance.severity,
+                    'since': instance.since,
+                    'value': round(instance.value, 4),
+                    'labels': instance.labels,
+                })
+        return groups
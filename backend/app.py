@@ -1,40 +1,96 @@
 import csv
+import hmac
 import io
+import json
 import os
+import atexit
+from contextlib import nullcontext
 import time
 import threading
+import zlib
 
-import requests
-from flask import Flask, jsonify, request, Response, g, send_file
+from flask import Flask, jsonify, request, Response, g, has_request_context, send_file, stream_with_context
 from flask_cors import CORS
-from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
-from pymongo import MongoClient
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+
+from alert_rules import ALERT_RULES_FILE, AlertEngine, AlertEventLog, load_rules
+from collector import COLLECTOR_CYCLE, COLLECTOR_ERRORS, COLLECTOR_LAST_SUCCESS, collector_sleep_interval
+from cores import ClusterCollector, CoreRegistry, aggregate_metrics
+from coordination import CollectorLock, SharedSnapshot
+from database import DatabaseConnector
+from deregistration import (
+    DEREGISTER_SYNC_LIMIT, SessionDeregistrar, iter_selected_imsis, parse_selection, run_deregistration
+)
+from event_stream import EventBroadcaster, format_sse
+from export_formats import (
+    ARROW_FORMATS, EXTENSIONS, METRICS_HISTORY_SCHEMA, MIMETYPES, SUBSCRIBER_SCHEMA, ImportFormatError,
+    MissingDependencyError, iter_arrow, iter_arrow_records, iter_ndjson, iter_ndjson_records, resolve_format,
+    subscriber_document_from_record, subscriber_record
+)
+from instrumentation import REQUEST_LATENCY_BUCKETS, PhaseTimer, SlowRequestProfiler
+from jobs import JobRegistry
+from key_material import KeyMaterialStage, parse_op
+from log_ingest import LOG_QUERY_MAX_LIMIT, LogStore, LogTailer, parse_level, parse_since, to_dict as log_entry_dict
+from metrics_history import TIER_SECONDS, MetricsHistory
+from nf_metrics import NFMetricsCollector
+from provisioning import ImportErrorSink, SubscriberBulkWriter, resolve_chunk_size
+from provisioning_jobs import JOB_LEASE_SECONDS, ProvisioningJobs
+from response_cache import VersionedResponseCache, cached_json_response, json_body_response
+from restconf_query import apply_depth, apply_fields, fields_to_projection, parse_list_query
+from subscriber_cache import CachedSubscriberStore
+from subscriber_store import InMemorySubscriberStore, MongoSubscriberStore
 
 app = Flask(__name__)
 CORS(app)
 
-# MongoDB connection - Using in-memory storage for local development
-try:
-    mongo_client = MongoClient('mongodb://localhost:27017/', serverSelectionTimeoutMS=2000)
-    db = mongo_client['open5gs']
-    # Test connection
-    mongo_client.server_info()
-    print("✓ MongoDB connected successfully")
-except Exception as e:
-    print(f"⚠ MongoDB connection failed: {e}")
-    print("⚠ Using in-memory storage instead")
-    db = None
-
-# In-memory storage fallback
-_in_memory_subscribers = []
-
-# Cache for metrics
-metrics_cache = {
+
+def subscriber_resource(doc):
+    """RESTCONF representation of one subscriber."""
+    return {'open5gs:subscriber': [doc]}
+
+
+# MongoDB is connected in the background by get_app() (see _attach_database);
+# until it answers, subscribers live in the indexed in-memory store. Both sit
+# behind a read cache for single-subscriber lookups that is invalidated on write.
+db = None
+subscriber_store = CachedSubscriberStore(InMemorySubscriberStore(), subscriber_resource)
+
+# Open5GS cores managed by this backend; one core (the primary database) unless CORES/CORES_FILE is set
+core_registry = CoreRegistry.from_config()
+DEFAULT_NF_METRICS = {
     'amf': {'status': 'active', 'load': 45, 'sessions': 127, 'registered_ues': 3},
     'smf': {'status': 'active', 'load': 62, 'sessions': 89, 'pdu_sessions': 89},
     'upf': {'status': 'active', 'throughput': 1240, 'packets': 45632}
 }
 
+# NF metrics as an immutable snapshot: each collection cycle builds new dicts and
+# swaps the reference, so readers take `metrics_snapshot` once and see one
+# consistent cycle. `data` aggregates every core and `cores` holds each core's
+# own state. The version only moves when a value changes, so serialized
+# responses can be cached and revalidated per version.
+_initial_cores = {
+    core.id: {'status': 'unknown', 'metrics': DEFAULT_NF_METRICS, 'error': None, 'labels': core.labels}
+    for core in core_registry
+}
+metrics_snapshot = {
+    'version': 1,
+    'data': aggregate_metrics(_initial_cores, DEFAULT_NF_METRICS),
+    'cores': _initial_cores,
+}
+response_cache = VersionedResponseCache()
+event_broadcaster = EventBroadcaster()
+metrics_history = MetricsHistory()
+job_registry = JobRegistry()
+provisioning_jobs = ProvisioningJobs(
+    lambda: subscriber_store,
+    lambda entry: build_subscriber_document(entry),
+    lambda record: subscriber_document_from_record(record, build_subscriber_document),
+)
+slow_request_profiler = SlowRequestProfiler()
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '').strip()
+
 ALERT_CONFIG = {
     'sla_target': float(os.getenv('SLA_TARGET', '99.0')),
     'latency_threshold_ms': float(os.getenv('LATENCY_THRESHOLD_MS', '150')),
@@ -42,56 +98,88 @@ ALERT_CONFIG = {
     'webhook_url': os.getenv('ALERT_WEBHOOK_URL', '').strip(),
     'cooldown_seconds': int(os.getenv('ALERT_COOLDOWN_SECONDS', '120')),
 }
-_alert_events = []
-_last_alert_ts = {}
+
+# Webhook delivery runs on its own worker pool so a slow endpoint never stalls the collector
+alert_dispatcher = None
+
+# Open5GS log lines, tailed by every worker into its own bounded store
+log_store = LogStore()
+log_broadcaster = EventBroadcaster()
+
+# Background services are started by get_app(), not at import time
+netconf_server = None
+log_tailer = None
+collector_lock = CollectorLock()
+shared_snapshot = SharedSnapshot()
+_shutdown = threading.Event()
+_background_lock = threading.Lock()
+_background_started = False
 
 # Prometheus instrumentation
 REQUEST_LATENCY = Histogram(
     'restconf_request_latency_seconds',
     'Latency for RESTCONF/management API requests',
-    ['endpoint', 'method']
+    ['endpoint', 'method'],
+    buckets=REQUEST_LATENCY_BUCKETS
 )
 REQUEST_COUNTER = Counter(
     'restconf_requests_total',
     'Total RESTCONF/management API requests',
     ['endpoint', 'method', 'status_class']
 )
-NF_STATUS = Gauge('nf_status', 'Network function status (1 active, 0 down)', ['nf'])
-NF_LOAD = Gauge('nf_load_percent', 'Network function load percentage', ['nf'])
-NF_SESSIONS = Gauge('nf_sessions_total', 'Sessions handled per NF', ['nf'])
-REGISTERED_UES = Gauge('registered_ues_total', 'Total registered UEs')
-UPF_THROUGHPUT = Gauge('upf_throughput_mbps', 'UPF throughput Mbps')
-UPF_PACKETS = Gauge('upf_packets_total', 'UPF packet count')
-
-
-def _update_nf_gauges():
-    """Push latest cache values to Prometheus gauges."""
-    NF_STATUS.labels(nf='amf').set(1 if metrics_cache['amf']['status'] == 'active' else 0)
-    NF_STATUS.labels(nf='smf').set(1 if metrics_cache['smf']['status'] == 'active' else 0)
-    NF_STATUS.labels(nf='upf').set(1 if metrics_cache['upf']['status'] == 'active' else 0)
+# NF gauges are read per core from the current snapshot at scrape time
+nf_metrics_collector = NFMetricsCollector(lambda: metrics_snapshot['cores'])
+REGISTRY.register(nf_metrics_collector)
+
+
+def publish_metrics_snapshot(data, cores=None):
+    """Swap in `data` (and per-core `cores`) as the new snapshot if any value changed.
+
+    Both must be freshly built; published snapshots are never mutated.
+    """
+    global metrics_snapshot
+    previous = metrics_snapshot
+    cores = previous['cores'] if cores is None else cores
+    if data != previous['data'] or cores != previous['cores']:
+        metrics_snapshot = {'version': previous['version'] + 1, 'data': data, 'cores': cores}
+        event_broadcaster.publish('metrics', {
+            'version': previous['version'] + 1,
+            'changes': _metrics_diff(previous['data'], data),
+            'observability': _observability(data),
+        })
 
-    NF_LOAD.labels(nf='amf').set(metrics_cache['amf']['load'])
-    NF_LOAD.labels(nf='smf').set(metrics_cache['smf']['load'])
-    NF_LOAD.labels(nf='upf').set(metrics_cache['upf'].get('throughput', 0) / 10)
 
-    NF_SESSIONS.labels(nf='amf').set(metrics_cache['amf']['sessions'])
-    NF_SESSIONS.labels(nf='smf').set(metrics_cache['smf']['pdu_sessions'])
+def _metrics_diff(previous, current):
+    """Per-NF fields whose values differ between two metrics snapshots."""
+    changes = {}
+    for nf, values in current.items():
+        before = previous.get(nf, {})
+        changed = {key: value for key, value in values.items() if before.get(key) != value}
+        if changed:
+            changes[nf] = changed
+    return changes
 
-    REGISTERED_UES.set(metrics_cache['amf']['registered_ues'])
-    UPF_THROUGHPUT.set(metrics_cache['upf']['throughput'])
-    UPF_PACKETS.set(metrics_cache['upf']['packets'])
 
-def _estimate_latency():
-    load = max(metrics_cache['amf'].get('load', 0), metrics_cache['smf'].get('load', 0))
+def _estimate_latency(metrics):
+    load = max(metrics['amf'].get('load', 0), metrics['smf'].get('load', 0))
     return 80 + load * 0.6
 
 
-def _estimate_sla_score():
-    load = max(metrics_cache['amf'].get('load', 0), metrics_cache['smf'].get('load', 0))
+def _estimate_sla_score(metrics):
+    load = max(metrics['amf'].get('load', 0), metrics['smf'].get('load', 0))
     latency_penalty = max(0, load - 70) * 0.4
     return max(90.0, 100 - latency_penalty)
 
 
+def _observability(metrics):
+    """SLA and latency estimates shown on the dashboard's observability tab."""
+    return {
+        'sla_target': ALERT_CONFIG['sla_target'],
+        'sla_estimate_percent': _estimate_sla_score(metrics),
+        'latency_estimate_ms': _estimate_latency(metrics),
+    }
+
+
 def build_subscriber_document(data: dict) -> dict:
     imsi = str(data.get('imsi', '')).strip()
     if not imsi:
@@ -129,134 +217,340 @@ def build_subscriber_document(data: dict) -> dict:
 
 
 def get_subscribers_from_db():
-    if db is None:
-        return _in_memory_subscribers
-    return list(db.subscribers.find({}, {'_id': 0}))
+    return subscriber_store.list()
+
+
+def query_subscribers(args):
+    """Apply RFC 8040 depth/fields, paging and filters; returns (subscribers, next_cursor)."""
+    if not args:
+        with request_phase('db'):
+            return get_subscribers_from_db(), None
+
+    params = parse_list_query(args)
+    fields = params['fields']
+    with request_phase('db'):
+        page = subscriber_store.query(
+            imsi_prefix=params['imsi_prefix'],
+            msisdn=params['msisdn'],
+            dnn=params['dnn'],
+            cursor=params['cursor'],
+            offset=params['offset'],
+            limit=params['limit'],
+            projection=fields_to_projection(fields) if fields else None,
+        )
+    next_cursor = None
+    if params['limit'] is not None and len(page) == params['limit']:
+        next_cursor = page[-1]['imsi']
+    with request_phase('build'):
+        if fields:
+            page = [apply_fields(doc, fields) for doc in page]
+        if params['depth'] is not None:
+            page = [apply_depth(doc, params['depth']) for doc in page]
+    return page, next_cursor
+
+
+def request_phases():
+    """PhaseTimer of the current request, or None outside a request."""
+    return g.get('phase_timer') if has_request_context() else None
+
+
+def request_phase(name):
+    """Context manager charging its block to a phase of the current request."""
+    timer = request_phases()
+    return timer.phase(name) if timer is not None else nullcontext()
 
 
 def save_subscriber(doc):
-    if db is not None:
-        try:
-            db.subscribers.update_one({'imsi': doc['imsi']}, {'$set': doc}, upsert=True)
-        except Exception as exc:
-            print(f"Error writing subscriber {doc['imsi']}: {exc}")
-    else:
-        # In-memory storage
-        existing = next((i for i, s in enumerate(_in_memory_subscribers) if s.get('imsi') == doc['imsi']), None)
-        if existing is not None:
-            _in_memory_subscribers[existing] = doc
-        else:
-            _in_memory_subscribers.append(doc)
+    try:
+        with request_phase('db'):
+            subscriber_store.upsert(doc)
+    except Exception as exc:
+        print(f"Error writing subscriber {doc['imsi']}: {exc}")
+
+
+def _default_alert_rules():
+    """The built-in latency, SLA and NF load rules, parameterized by ALERT_CONFIG."""
+    latency = ALERT_CONFIG['latency_threshold_ms']
+    sla_target = ALERT_CONFIG['sla_target']
+    load = ALERT_CONFIG['load_threshold_percent']
+    return [
+        {
+            'name': 'latency-high', 'type': 'latency', 'signal': 'latency_ms', 'aggregate': 'avg', 'window': 30,
+            'op': '>', 'threshold': latency, 'clear': latency * 0.95, 'critical': latency * 1.2,
+            'message': 'Request latency reached {value:.0f}ms (threshold {threshold}ms)',
+        },
+        {
+            'name': 'sla-breach', 'type': 'sla', 'signal': 'sla_percent', 'aggregate': 'avg', 'window': 60,
+            'op': '<', 'threshold': sla_target, 'critical': sla_target - 2,
+            'message': 'SLA compliance dropped to {value:.2f}% (target {threshold}%)',
+        },
+        {
+            'name': 'nf-load-high', 'type': 'capacity', 'signal': '*.load', 'aggregate': 'avg', 'window': 30,
+            'op': '>', 'threshold': load, 'clear': load - 5, 'critical': load + 10,
+            'message': '{NF} load is {value:.0f}% (threshold {threshold}%)',
+        },
+    ]
 
 
-def record_alert(event_type, message, severity='warning', metadata=None):
-    event = {
-        'type': event_type,
-        'message': message,
-        'severity': severity,
-        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-        'metadata': metadata or {},
+def _alert_signals(metrics):
+    """Flatten a metrics snapshot into the signals alert rules refer to ("amf.load", "latency_ms", ...)."""
+    signals = {
+        f'{nf}.{field}': value
+        for nf, values in metrics.items()
+        for field, value in values.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
     }
-    _alert_events.insert(0, event)
-    if len(_alert_events) > 50:
-        _alert_events.pop()
+    signals['latency_ms'] = _estimate_latency(metrics)
+    signals['sla_percent'] = _estimate_sla_score(metrics)
+    return signals
 
-    webhook_url = ALERT_CONFIG['webhook_url']
-    if webhook_url:
-        try:
-            requests.post(
-                webhook_url,
-                json={'text': f"[{severity.upper()}] {event_type}: {message}", 'payload': event},
-                timeout=3,
-            )
-        except Exception as exc:
-            print(f"Alert webhook delivery failed: {exc}")
 
+def _deliver_alert(event):
+    event_broadcaster.publish('alert', event)
+    if alert_dispatcher is not None:
+        alert_dispatcher.submit(event)
 
-def evaluate_alerts():
-    now = time.time()
-    cooldown = ALERT_CONFIG['cooldown_seconds']
-    load_threshold = ALERT_CONFIG['load_threshold_percent']
-    sla_target = ALERT_CONFIG['sla_target']
 
-    latency = _estimate_latency()
-    sla_score = _estimate_sla_score()
-
-    if latency > ALERT_CONFIG['latency_threshold_ms']:
-        last = _last_alert_ts.get('latency', 0)
-        if now - last > cooldown:
-            record_alert(
-                'latency',
-                f'Request latency reached {latency:.0f}ms (threshold {ALERT_CONFIG["latency_threshold_ms"]}ms)',
-                severity='warning' if latency < ALERT_CONFIG['latency_threshold_ms'] * 1.2 else 'critical',
-                metadata={'latency_ms': latency},
-            )
-            _last_alert_ts['latency'] = now
-
-    if sla_score < sla_target:
-        last = _last_alert_ts.get('sla', 0)
-        if now - last > cooldown:
-            record_alert(
-                'sla',
-                f'SLA compliance dropped to {sla_score:.2f}% (target {sla_target}%)',
-                severity='critical' if sla_score < sla_target - 2 else 'warning',
-                metadata={'sla': sla_score},
-            )
-            _last_alert_ts['sla'] = now
-
-    for nf in ('amf', 'smf'):
-        load = metrics_cache[nf].get('load', 0)
-        if load > load_threshold:
-            key = f'{nf}_load'
-            last = _last_alert_ts.get(key, 0)
-            if now - last > cooldown:
-                severity = 'critical' if load > load_threshold + 10 else 'warning'
-                record_alert(
-                    'capacity',
-                    f'{nf.upper()} load is {load:.0f}% (threshold {load_threshold}%)',
-                    severity=severity,
-                    metadata={'nf': nf, 'load': load},
-                )
-                _last_alert_ts[key] = now
+alert_log = AlertEventLog()
+alert_engine = AlertEngine(
+    load_rules(ALERT_RULES_FILE, _default_alert_rules(), ALERT_CONFIG['cooldown_seconds']),
+    alert_log,
+    on_event=_deliver_alert,
+)
+# Firing/pending alerts grouped by rule group, as seen by the collector
+active_alerts = {}
+
+
+def _core_metrics(metrics, counts):
+    """New NF metrics for one core from its (subscribers, active_sessions) counts."""
+    metrics = metrics or DEFAULT_NF_METRICS
+    if counts is None:
+        return metrics
+    subscribers, sessions = counts
+    return dict(
+        metrics,
+        amf=dict(
+            metrics['amf'],
+            registered_ues=subscribers,
+            sessions=sessions,
+            load=min(95, (sessions / 100) * 80) if sessions > 0 else 45,
+        ),
+        smf=dict(
+            metrics['smf'],
+            pdu_sessions=sessions,
+            load=min(95, (sessions / 80) * 75) if sessions > 0 else 62,
+        ),
+    )
+
+
+cluster_collector = ClusterCollector(core_registry, _core_metrics)
+
+
+def _collect_once():
+    global active_alerts
+    start = time.perf_counter()
+    cores = cluster_collector.collect(metrics_snapshot['cores'])
+    failed = {core_id: state['error'] for core_id, state in cores.items() if state['status'] != 'up'}
+    if len(failed) < len(cores):
+        COLLECTOR_LAST_SUCCESS.set_to_current_time()
+    if failed:
+        COLLECTOR_ERRORS.inc()
+        for core_id, error in failed.items():
+            print(f"Error fetching metrics from core {core_id}: {error}")
+
+    publish_metrics_snapshot(aggregate_metrics(cores, DEFAULT_NF_METRICS), cores)
+    metrics = metrics_snapshot['data']
+    metrics_history.record(metrics)
+    alert_engine.evaluate(_alert_signals(metrics))
+    active_alerts = alert_engine.active()
+    COLLECTOR_CYCLE.observe(time.perf_counter() - start)
+    shared_snapshot.write({
+        'metrics': metrics,
+        'cores': metrics_snapshot['cores'],
+        'alerts': alert_log.list(),
+        'active': active_alerts,
+    })
+
+
+def _follow_once():
+    """Mirror the elected collector's published state in a non-collecting worker."""
+    global active_alerts
+    try:
+        state = shared_snapshot.read_if_changed()
+    except (OSError, ValueError) as e:
+        print(f"Error reading shared metrics snapshot: {e}")
+        return
+    if state is None:
+        return
+
+    metrics = dict(metrics_snapshot['data'])
+    for nf, values in state['metrics'].items():
+        metrics[nf] = dict(metrics.get(nf, {}), **values)
+    publish_metrics_snapshot(metrics, state.get('cores'))
+    metrics_history.record(metrics_snapshot['data'])
+
+    for alert in reversed(alert_log.mirror(state['alerts'])):
+        event_broadcaster.publish('alert', alert)
+    active_alerts = state.get('active', {})
+
+
+def _become_collector():
+    """Start the services that must run in exactly one process."""
+    global netconf_server
+    # NETCONF shares the subscriber store and metrics snapshot with the RESTCONF routes
+    if os.getenv('NETCONF_ENABLED', 'false').lower() == 'true':
+        from netconf_server import NetconfServer  # lxml is only loaded when NETCONF is enabled
+
+        netconf_server = NetconfServer(
+            port=int(os.getenv('NETCONF_PORT', '830')),
+            subscriber_store=subscriber_store,
+            metrics_provider=lambda: metrics_snapshot['data'],
+            document_builder=build_subscriber_document,
+        )
+        netconf_server.start()
 
 
 def fetch_open5gs_metrics():
-    """Background thread to fetch metrics from Open5GS"""
-    while True:
-        try:
-            if db is not None:
-                subscribers = db.subscribers.count_documents({})
-                sessions = db.sessions.count_documents({'state': 'ACTIVE'})
-                
-                metrics_cache['amf']['registered_ues'] = subscribers
-                metrics_cache['amf']['sessions'] = sessions
-                metrics_cache['smf']['pdu_sessions'] = sessions
-                
-                metrics_cache['amf']['load'] = min(95, (sessions / 100) * 80) if sessions > 0 else 45
-                metrics_cache['smf']['load'] = min(95, (sessions / 80) * 75) if sessions > 0 else 62
-        except Exception as e:
-            print(f"Error fetching metrics: {e}")
-        
-        _update_nf_gauges()
-        evaluate_alerts()
-        time.sleep(2)
+    """Background thread to fetch metrics from Open5GS
+
+    With several worker processes only the worker holding the collector
+    lock queries MongoDB; the others follow its published snapshot.
+    """
+    leader = False
+    jobs_checked = 0.0
+    while not _shutdown.is_set():
+        if not leader and collector_lock.acquire():
+            leader = True
+            print(f"Metrics collector elected in process {os.getpid()}")
+            _become_collector()
+
+        if leader:
+            _collect_once()
+            # Provisioning jobs left behind by a restarted worker are picked up once their lease runs out
+            if time.time() - jobs_checked >= JOB_LEASE_SECONDS:
+                jobs_checked = time.time()
+                try:
+                    provisioning_jobs.resume_stale()
+                except Exception as e:
+                    print(f"⚠ Could not resume provisioning jobs: {e}")
+        else:
+            _follow_once()
+        _shutdown.wait(collector_sleep_interval())
 
-# Start metrics collection thread
-threading.Thread(target=fetch_open5gs_metrics, daemon=True).start()
+
+def _attach_database(database):
+    """Move subscriber storage and the default core onto MongoDB once it answers.
+
+    Subscribers written to the in-memory store while MongoDB was
+    unreachable are copied over after the switch.
+    """
+    global db, subscriber_store
+    store = MongoSubscriberStore(database)
+    try:
+        store.ensure_indexes()
+        SessionDeregistrar(database.sessions, store).ensure_indexes()
+    except Exception as e:
+        print(f"⚠ Could not create subscriber indexes: {e}")
+
+    previous = subscriber_store
+    subscriber_store = CachedSubscriberStore(store, subscriber_resource)
+    db = database
+    if core_registry.default is not None:
+        core_registry.default.attach(database)
+    if netconf_server is not None:
+        netconf_server.subscriber_store = subscriber_store
+    if not _shutdown.is_set():
+        subscriber_store.watch(database.subscribers)
+
+    pending = previous.list()
+    if pending:
+        failures = subscriber_store.upsert_many(pending)
+        print(f"Copied {len(pending) - len(failures)} subscribers written before MongoDB connected")
+
+
+database_connector = DatabaseConnector(_attach_database)
+
+
+def start_background_services():
+    """Start the database connector, collector, webhook delivery and (when elected) NETCONF once per process."""
+    global alert_dispatcher, log_tailer, _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+
+    database_connector.start()
+    job_registry.start()
+
+    if ALERT_CONFIG['webhook_url']:
+        from alert_delivery import WebhookDispatcher  # requests is only loaded when webhooks are configured
+
+        alert_dispatcher = WebhookDispatcher(ALERT_CONFIG['webhook_url'])
+        alert_dispatcher.start()
+
+    log_tailer = LogTailer(
+        log_store,
+        on_entries=lambda entries: log_broadcaster.publish('logs', [log_entry_dict(entry) for entry in entries])
+    )
+    log_tailer.start()
+
+    # Start metrics collection thread
+    threading.Thread(target=fetch_open5gs_metrics, name='metrics-collector', daemon=True).start()
+    atexit.register(shutdown_background_services)
+
+
+def shutdown_background_services():
+    """Stop background threads and release the collector lock (idempotent)."""
+    if _shutdown.is_set():
+        return
+    _shutdown.set()
+    database_connector.stop()
+    event_broadcaster.close()
+    log_broadcaster.close()
+    if log_tailer is not None:
+        log_tailer.stop()
+    subscriber_store.stop()
+    cluster_collector.stop()
+    core_registry.stop()
+    if netconf_server is not None:
+        netconf_server.stop()
+    if alert_dispatcher is not None:
+        alert_dispatcher.stop()
+    job_registry.shutdown()
+    provisioning_jobs.stop()
+    collector_lock.release()
+
+
+def get_app(start_background=True):
+    """Return the module-level app, starting its background services unless told not to.
+
+    There is one app per process; this is not a factory and every call
+    returns the same object.
+    """
+    if start_background:
+        start_background_services()
+    return app
 
 
 @app.before_request
 def _start_timer():
     g.request_start_time = time.perf_counter()
+    g.phase_timer = PhaseTimer()
+    g.profile = slow_request_profiler.start()
 
 
 @app.after_request
 def _record_metrics(response):
     start = getattr(g, 'request_start_time', None)
+    if start is None:
+        return response
     endpoint = request.endpoint or 'unknown'
     method = request.method
+    path = request.full_path.rstrip('?')
+    timer = g.phase_timer
+    profile = g.pop('profile', None)
 
-    if start is not None:
+    def record():
         elapsed = time.perf_counter() - start
         REQUEST_LATENCY.labels(endpoint=endpoint, method=method).observe(elapsed)
         REQUEST_COUNTER.labels(
@@ -264,16 +558,38 @@ def _record_metrics(response):
             method=method,
             status_class=str(response.status_code // 100)
         ).inc()
+        timer.observe(endpoint)
+        if profile is not None:
+            slow_request_profiler.finish(profile, elapsed, {
+                'endpoint': endpoint,
+                'method': method,
+                'path': path,
+                'status': response.status_code,
+                'phases_ms': {name: round(sec * 1000, 3) for name, sec in timer.phases.items()},
+            })
+
+    # Streamed bodies (exports, NDJSON imports) are timed until the last chunk is sent;
+    # long-lived event streams are not.
+    if response.is_streamed and response.mimetype != 'text/event-stream':
+        response.call_on_close(record)
+    else:
+        record()
     return response
 
+
+@app.teardown_request
+def _discard_profile(exc):
+    # after_request is skipped when a handler raises; don't leave the profiler running.
+    profile = g.pop('profile', None)
+    if profile is not None:
+        slow_request_profiler.discard(profile)
+
 # ============================================
 # RESTCONF API Endpoints (RFC 8040)
 # ============================================
 
-@app.route('/restconf/data/open5gs:core/amf', methods=['GET'])
-def get_amf_config():
-    """RESTCONF GET - Retrieve AMF configuration"""
-    amf_config = {
+def _amf_config(metrics):
+    return {
         'open5gs:amf': {
             'id': 'AMF-01',
             'guami': {
@@ -287,44 +603,128 @@ def get_amf_config():
                 'tac': '0001'
             },
             'ngap': {'addr': '0.0.0.0', 'port': 7777},
-            'metrics': metrics_cache['amf']
+            'metrics': metrics['amf']
         }
     }
-    return jsonify(amf_config), 200
 
-@app.route('/restconf/data/open5gs:core/smf', methods=['GET'])
-def get_smf_config():
-    """RESTCONF GET - Retrieve SMF configuration"""
-    smf_config = {
+
+def _smf_config(metrics):
+    return {
         'open5gs:smf': {
             'id': 'SMF-01',
             'pfcp': {'addr': '0.0.0.0', 'port': 8805},
             'subnet': [
                 {'dnn': 'internet', 'cidr': '10.45.0.0/16'}
             ],
-            'metrics': metrics_cache['smf']
+            'metrics': metrics['smf']
         }
     }
-    return jsonify(smf_config), 200
 
-@app.route('/restconf/data/open5gs:core/upf', methods=['GET'])
-def get_upf_config():
-    """RESTCONF GET - Retrieve UPF configuration"""
-    upf_config = {
+
+def _upf_config(metrics):
+    return {
         'open5gs:upf': {
             'id': 'UPF-01',
             'pfcp': {'addr': '0.0.0.0', 'port': 8805},
             'gtpu': {'addr': '0.0.0.0', 'port': 2152},
-            'metrics': metrics_cache['upf']
+            'metrics': metrics['upf']
         }
     }
-    return jsonify(upf_config), 200
+
+
+def _snapshot_response(key, build):
+    snapshot = metrics_snapshot
+    with request_phase('serialize'):
+        return cached_json_response(response_cache, key, snapshot['version'], lambda: build(snapshot['data']))
+
+
+@app.route('/restconf/data/open5gs:core/amf', methods=['GET'])
+def get_amf_config():
+    """RESTCONF GET - Retrieve AMF configuration"""
+    return _snapshot_response('amf', _amf_config)
+
+@app.route('/restconf/data/open5gs:core/smf', methods=['GET'])
+def get_smf_config():
+    """RESTCONF GET - Retrieve SMF configuration"""
+    return _snapshot_response('smf', _smf_config)
+
+@app.route('/restconf/data/open5gs:core/upf', methods=['GET'])
+def get_upf_config():
+    """RESTCONF GET - Retrieve UPF configuration"""
+    return _snapshot_response('upf', _upf_config)
+
+
+NF_CONFIG_BUILDERS = {'amf': _amf_config, 'smf': _smf_config, 'upf': _upf_config}
+
+
+def _core_entry(core_id, state, include_metrics=True):
+    entry = {
+        'id': core_id,
+        'status': state['status'],
+        'error': state.get('error'),
+        'labels': state.get('labels') or {},
+    }
+    if include_metrics:
+        entry['metrics'] = state['metrics']
+    return entry
+
+
+def _core_snapshot_response(core_id, key, build):
+    snapshot = metrics_snapshot
+    state = snapshot['cores'].get(core_id)
+    if state is None:
+        return jsonify({'error': f'Unknown core {core_id}'}), 404
+    with request_phase('serialize'):
+        return cached_json_response(
+            response_cache, f'core={core_id}/{key}', snapshot['version'], lambda: build(state)
+        )
+
+
+@app.route('/restconf/data/open5gs:cores', methods=['GET'])
+def get_cores():
+    """RESTCONF GET - Managed cores with their collection status
+
+    The open5gs:core/* paths aggregate every core; open5gs:cores/core=<id>/*
+    address one of them.
+    """
+    snapshot = metrics_snapshot
+    with request_phase('serialize'):
+        return cached_json_response(response_cache, 'cores', snapshot['version'], lambda: {
+            'open5gs:cores': {'core': [
+                _core_entry(core_id, state, include_metrics=False) for core_id, state in snapshot['cores'].items()
+            ]}
+        })
+
+
+@app.route('/restconf/data/open5gs:cores/core=<core_id>', methods=['GET'])
+def get_core(core_id):
+    """RESTCONF GET - One core's status and NF metrics"""
+    return _core_snapshot_response(core_id, 'core', lambda state: {'open5gs:core': _core_entry(core_id, state)})
+
+
+@app.route('/restconf/data/open5gs:cores/core=<core_id>/<nf>', methods=['GET'])
+def get_core_nf_config(core_id, nf):
+    """RESTCONF GET - AMF/SMF/UPF configuration of one core"""
+    build = NF_CONFIG_BUILDERS.get(nf)
+    if build is None:
+        return jsonify({'error': f'Unknown network function {nf}'}), 404
+    return _core_snapshot_response(core_id, nf, lambda state: build(state['metrics']))
 
 @app.route('/restconf/data/open5gs:subscribers', methods=['GET'])
 def get_subscribers():
-    """RESTCONF GET - List all subscribers (UEs)"""
-    subscribers = get_subscribers_from_db()
-    return jsonify({'open5gs:subscribers': {'subscriber': subscribers}}), 200
+    """RESTCONF GET - List subscribers (UEs)
+
+    Supports depth, fields, limit/offset, cursor (keyset on IMSI) and the
+    imsi-prefix, msisdn and dnn filters.
+    """
+    try:
+        subscribers, next_cursor = query_subscribers(request.args)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    headers = {'X-Next-Cursor': next_cursor} if next_cursor else {}
+    with request_phase('serialize'):
+        body = jsonify({'open5gs:subscribers': {'subscriber': subscribers}})
+    return body, 200, headers
 
 @app.route('/restconf/data/open5gs:subscribers', methods=['POST'])
 def create_subscriber():
@@ -335,29 +735,54 @@ def create_subscriber():
         return jsonify({'error': 'IMSI is required'}), 400
     
     try:
-        subscriber = build_subscriber_document(data)
+        with request_phase('build'):
+            subscriber = build_subscriber_document(data)
         save_subscriber(subscriber)
-        return jsonify({'status': 'created', 'subscriber': subscriber}), 201
+        with request_phase('serialize'):
+            body = jsonify({'status': 'created', 'subscriber': subscriber})
+        return body, 201
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+@app.route('/restconf/data/open5gs:subscribers/subscriber=<imsi>', methods=['GET'])
+def get_subscriber(imsi):
+    """RESTCONF GET - One subscriber
+
+    Served from the subscriber cache as a pre-serialized body with an
+    ETag; depth and fields are applied to the cached document instead.
+    """
+    try:
+        params = parse_list_query(request.args)
     except ValueError as exc:
         return jsonify({'error': str(exc)}), 400
 
+    if params['fields'] or params['depth'] is not None:
+        with request_phase('db'):
+            doc = subscriber_store.get(imsi)
+        if doc is None:
+            return jsonify({'error': 'Subscriber not found'}), 404
+        with request_phase('build'):
+            if params['fields']:
+                doc = apply_fields(doc, params['fields'])
+            if params['depth'] is not None:
+                doc = apply_depth(doc, params['depth'])
+        with request_phase('serialize'):
+            body = jsonify(subscriber_resource(doc))
+        return body, 200
+
+    with request_phase('db'):
+        cached = subscriber_store.get_body(imsi)
+    if cached is None:
+        return jsonify({'error': 'Subscriber not found'}), 404
+    return json_body_response(cached)
+
 @app.route('/restconf/data/open5gs:subscribers/subscriber=<imsi>', methods=['DELETE'])
 def delete_subscriber(imsi):
     """RESTCONF DELETE - Remove subscriber"""
     try:
-        if db is not None:
-            result = db.subscribers.delete_one({'imsi': imsi})
-            if result.deleted_count > 0:
-                return jsonify({'status': 'deleted', 'imsi': imsi}), 200
-            return jsonify({'error': 'Subscriber not found'}), 404
-        else:
-            # In-memory storage
-            global _in_memory_subscribers
-            original_len = len(_in_memory_subscribers)
-            _in_memory_subscribers = [s for s in _in_memory_subscribers if s.get('imsi') != imsi]
-            if len(_in_memory_subscribers) < original_len:
-                return jsonify({'status': 'deleted', 'imsi': imsi}), 200
-            return jsonify({'error': 'Subscriber not found'}), 404
+        if subscriber_store.delete(imsi):
+            return jsonify({'status': 'deleted', 'imsi': imsi}), 200
+        return jsonify({'error': 'Subscriber not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -387,39 +812,190 @@ def deregister_ue():
         }
     }), 200
 
+@app.route('/restconf/operations/open5gs:deregister-ues', methods=['POST'])
+def deregister_ues():
+    """RESTCONF RPC - Deregister many UEs in one call
+
+    Input is an `imsi` list or imsi-prefix/dnn/sst selectors. Sessions are
+    updated in chunks and the output reports a result per IMSI. With
+    ?async=true the RPC runs as a job that can be polled at /api/jobs/<id>;
+    its result holds counts and a sample of failed UEs instead.
+    """
+    data = request.json or {}
+    try:
+        selection = parse_selection(data.get('input') or {})
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    store = subscriber_store
+    deregistrar = SessionDeregistrar(db.sessions if db is not None else None, store)
+
+    if request.args.get('async', '').lower() == 'true':
+        def run(job):
+            total = len(selection['imsis']) if 'imsis' in selection else None
+            job_registry.update(job, processed=0, total=total)
+            return run_deregistration(
+                deregistrar, iter_selected_imsis(store, selection),
+                on_progress=lambda processed, counts: job_registry.update(job, processed=processed, **counts),
+                per_ue=False
+            )
+
+        job = job_registry.submit('deregister-ues', run)
+        location = f'/api/jobs/{job.id}'
+        return jsonify({'output': {'job-id': job.id, 'status': job.status, 'location': location}}), 202, {
+            'Location': location
+        }
+
+    # Resolve the whole selection before writing so an oversized request changes nothing.
+    chunks = []
+    selected = 0
+    for chunk in iter_selected_imsis(store, selection):
+        selected += len(chunk)
+        if selected > DEREGISTER_SYNC_LIMIT:
+            return jsonify({
+                'error': f'Selection exceeds {DEREGISTER_SYNC_LIMIT} UEs; retry with ?async=true'
+            }), 413
+        chunks.append(chunk)
+    return jsonify({'output': run_deregistration(deregistrar, chunks)}), 200
+
 # ============================================
 # Additional REST API for dashboard
 # ============================================
 
 @app.route('/api/metrics', methods=['GET'])
 def get_metrics():
-    """Get all NF metrics"""
-    return jsonify(metrics_cache), 200
+    """Get all NF metrics, aggregated across cores or for one ?core="""
+    core_id = request.args.get('core')
+    if core_id:
+        return _core_snapshot_response(core_id, 'metrics', lambda state: state['metrics'])
+    return _snapshot_response('metrics', lambda metrics: metrics)
+
+
+@app.route('/api/metrics/history', methods=['GET'])
+def get_metrics_history():
+    """Time series for one NF metric: ?nf=&metric=&from=&to=&step= (unix seconds)."""
+    nf = request.args.get('nf', '').lower()
+    metric = request.args.get('metric', '')
+    if not nf or not metric:
+        return jsonify({'error': 'nf and metric are required', 'available': metrics_history.available()}), 400
+
+    try:
+        t_to = float(request.args.get('to', time.time()))
+        t_from = float(request.args.get('from', t_to - 3600))
+        step = float(request.args['step']) if request.args.get('step') else None
+    except ValueError:
+        return jsonify({'error': 'from, to and step must be numbers'}), 400
+    if t_from > t_to or (step is not None and step <= 0):
+        return jsonify({'error': 'invalid range or step'}), 400
+
+    result = metrics_history.query(nf, metric, t_from, t_to, step)
+    if result is None:
+        return jsonify({'error': f'Unknown series {nf}.{metric}', 'available': metrics_history.available()}), 404
+    result.update({'nf': nf, 'metric': metric, 'from': t_from, 'to': t_to})
+    return jsonify(result), 200
+
+
+@app.route('/api/metrics/history/export', methods=['GET'])
+def export_metrics_history():
+    """Every stored history point as ?format=ndjson (default), parquet or arrow; ?tier= limits it."""
+    tier = request.args.get('tier') or None
+    if tier is not None and tier not in TIER_SECONDS:
+        return jsonify({'error': f"tier must be one of {', '.join(TIER_SECONDS)}"}), 400
+    compress = request.args.get('compress', '').lower() == 'gzip'
+    try:
+        fmt = resolve_format(request.args.get('format'), default='ndjson')
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    except MissingDependencyError as exc:
+        return jsonify({'error': str(exc)}), 501
+    if fmt == 'csv':
+        return jsonify({'error': 'Use ndjson, parquet or arrow for metrics history'}), 400
+
+    if fmt == 'ndjson':
+        encode = lambda rows: iter_ndjson(rows, EXPORT_CHUNK_ROWS, compress)
+    else:
+        encode = lambda rows: iter_arrow(rows, METRICS_HISTORY_SCHEMA, fmt)
+    return _export_response(fmt, compress, 'metrics_history', metrics_history.iter_rows(tier), encode)
+
+
+@app.route('/api/events', methods=['GET'])
+def api_event_stream():
+    """Server-Sent Events push of metrics diffs and new alerts.
+
+    The first frame is a full snapshot; later `metrics` frames only carry
+    changed fields (plus the observability estimates derived from them)
+    and `alert` frames carry new alert events.
+    """
+    subscriber = event_broadcaster.subscribe()
+    if subscriber is None:
+        return jsonify({'error': 'Too many event stream clients'}), 503
+
+    def snapshot():
+        current = metrics_snapshot
+        return format_sse('snapshot', {
+            'version': current['version'],
+            'metrics': current['data'],
+            'observability': _observability(current['data']),
+            'alerts': alert_log.list(10),
+        })
+
+    return Response(
+        event_broadcaster.stream(subscriber, snapshot),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 
 @app.route('/api/subscribers', methods=['GET'])
 def api_list_subscribers():
     """Simplified subscribers listing for dashboard automation workflows."""
-    return jsonify({'subscribers': get_subscribers_from_db()}), 200
+    try:
+        subscribers, next_cursor = query_subscribers(request.args)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    with request_phase('serialize'):
+        body = jsonify({'subscribers': subscribers, 'next_cursor': next_cursor})
+    return body, 200
 
 
 @app.route('/api/subscribers/batch', methods=['POST'])
 def api_batch_subscribers():
-    """Create or update multiple subscribers in one payload."""
+    """Create or update multiple subscribers in one payload.
+
+    Key material is validated (and OPc derived from a per-row or
+    payload-wide `op`) for the whole batch before anything is written.
+    With ?async=true the batch runs as a resumable job polled at
+    /api/jobs/<id>.
+    """
     payload = request.json or {}
     subscribers = payload.get('subscribers')
     if not isinstance(subscribers, list):
         return jsonify({'error': 'subscribers must be an array'}), 400
-
-    summary = {'processed': 0, 'created': 0, 'errors': []}
-    for entry in subscribers:
-        summary['processed'] += 1
-        try:
-            doc = build_subscriber_document(entry or {})
-            save_subscriber(doc)
-            summary['created'] += 1
-        except ValueError as exc:
-            summary['errors'].append({'entry': entry, 'error': str(exc)})
+    try:
+        op = parse_op(payload.get('op'))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    except MissingDependencyError as exc:
+        return jsonify({'error': str(exc)}), 501
+
+    chunk_size = resolve_chunk_size(request.args.get('chunk_size'))
+    if request.args.get('async', '').lower() == 'true':
+        job_id = provisioning_jobs.submit_batch(subscribers, chunk_size, op.hex() if op else None)
+        return _job_accepted(job_id)
+
+    with request_phase('build'):
+        docs, rejected = KeyMaterialStage(op).prepare(subscribers, build_subscriber_document)
+    writer = SubscriberBulkWriter(subscriber_store, chunk_size)
+    summary = {'processed': len(subscribers), 'created': 0, 'errors': []}
+    summary['errors'].extend({'entry': entry, 'error': message} for _, entry, message in rejected)
+    with request_phase('db'):
+        for doc in docs:
+            writer.add(doc)
+        writer.flush()
+
+    summary['created'] = writer.written
+    summary['errors'].extend(writer.errors)
+    summary.update(writer.stats())
     return jsonify(summary), 200
 
 
@@ -432,105 +1008,355 @@ def api_batch_delete_subscribers():
         return jsonify({'error': 'imsis must be an array'}), 400
 
     deleted = 0
-    if db is not None and imsis:
+    imsi_set = {str(i).strip() for i in imsis if i}
+    if imsi_set:
         try:
-            result = db.subscribers.delete_many({'imsi': {'$in': [str(i).strip() for i in imsis if i]}})
-            deleted = result.deleted_count
+            deleted = subscriber_store.delete_many(imsi_set)
         except Exception as exc:
             return jsonify({'error': str(exc)}), 500
-    else:
-        # In-memory storage
-        global _in_memory_subscribers
-        imsi_set = {str(i).strip() for i in imsis if i}
-        original_len = len(_in_memory_subscribers)
-        _in_memory_subscribers = [s for s in _in_memory_subscribers if s.get('imsi') not in imsi_set]
-        deleted = original_len - len(_in_memory_subscribers)
 
     return jsonify({'requested': len(imsis), 'deleted': deleted}), 200
 
 
+def _import_progress(rows, writer, errors):
+    progress = {'rows': rows, 'created': writer.written, 'error_count': errors.count}
+    progress.update(writer.stats())
+    return progress
+
+
+def _import_document(record):
+    return subscriber_document_from_record(record, build_subscriber_document)
+
+
+def _import_chunk(chunk, first_row, stage, writer, errors, timer):
+    with timer.phase('build'):
+        docs, rejected = stage.prepare(chunk, _import_document, first_row)
+    for _, record, message in rejected:
+        errors.append({'row': record, 'error': message})
+    with timer.phase('db'):
+        for doc in docs:
+            writer.add(doc)
+        writer.flush()
+
+
+def _import_rows(records, writer, errors, stage):
+    """Validate and bulk-write imported records, yielding progress after every chunk."""
+    timer = request_phases() or PhaseTimer()
+    rows = 0
+    chunk = []
+    for row in timer.timed_iter('parse', records):
+        rows += 1
+        chunk.append(row)
+        if len(chunk) >= writer.chunk_size:
+            _import_chunk(chunk, rows - len(chunk) + 1, stage, writer, errors, timer)
+            chunk = []
+            yield _import_progress(rows, writer, errors)
+    _import_chunk(chunk, rows - len(chunk) + 1, stage, writer, errors, timer)
+    yield _import_progress(rows, writer, errors)
+
+
 @app.route('/api/subscribers/import', methods=['POST'])
 def api_import_subscribers():
-    """Import subscribers from a CSV upload."""
+    """Import subscribers from a CSV, NDJSON, Parquet or Arrow upload.
+
+    The format comes from ?format= or the file extension (CSV by default).
+    The upload is decoded incrementally and written in bounded chunks;
+    an `op` form field derives OPc for rows that have none. With
+    ?stream=true the response is NDJSON: one progress record per chunk
+    followed by a final summary record. With ?async=true the upload is
+    spooled and imported as a resumable job polled at /api/jobs/<id>.
+    """
     if 'file' not in request.files:
         return jsonify({'error': 'file is required'}), 400
 
     upload = request.files['file']
     try:
-        stream = io.StringIO(upload.stream.read().decode('utf-8'))
-        reader = csv.DictReader(stream)
-    except Exception as exc:
-        return jsonify({'error': f'Invalid CSV: {exc}'}), 400
+        fmt = resolve_format(request.args.get('format'), upload.filename)
+        op = parse_op(request.form.get('op'))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    except MissingDependencyError as exc:
+        return jsonify({'error': str(exc)}), 501
 
-    summary = {'rows': 0, 'created': 0, 'errors': []}
-    for row in reader:
-        summary['rows'] += 1
-        try:
-            doc = build_subscriber_document(row)
-            save_subscriber(doc)
-            summary['created'] += 1
-        except ValueError as exc:
-            summary['errors'].append({'row': row, 'error': str(exc)})
+    chunk_size = resolve_chunk_size(request.args.get('chunk_size'))
+    if request.args.get('async', '').lower() == 'true':
+        job_id = provisioning_jobs.submit_import(upload.stream, fmt, chunk_size, op.hex() if op else None)
+        return _job_accepted(job_id)
 
-    return jsonify(summary), 200
+    text = None
+    if fmt in ARROW_FORMATS:
+        records = iter_arrow_records(upload.stream, fmt)
+    else:
+        text = io.TextIOWrapper(upload.stream, encoding='utf-8', newline='')
+        records = csv.DictReader(text) if fmt == 'csv' else iter_ndjson_records(text)
+    invalid_errors = (UnicodeDecodeError, csv.Error, ImportFormatError)
+    errors = ImportErrorSink(spill=request.args.get('spill_errors', '').lower() == 'true')
+    writer = SubscriberBulkWriter(subscriber_store, chunk_size, errors=errors)
+    stage = KeyMaterialStage(op)
+
+    if request.args.get('stream', '').lower() == 'true':
+        def generate():
+            progress = _import_progress(0, writer, errors)
+            try:
+                for progress in _import_rows(records, writer, errors, stage):
+                    yield json.dumps(dict(progress, event='progress')) + '\n'
+            except invalid_errors as exc:
+                writer.flush()
+                progress = _import_progress(progress['rows'], writer, errors)
+                yield json.dumps({'event': 'error', 'error': f'Invalid {fmt.upper()}: {exc}'}) + '\n'
+            finally:
+                errors.close()
+                if text is not None:
+                    text.detach()
+            progress.update(errors.summary())
+            yield json.dumps(dict(progress, event='summary')) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
+    try:
+        for progress in _import_rows(records, writer, errors, stage):
+            pass
+    except invalid_errors as exc:
+        return jsonify({'error': f'Invalid {fmt.upper()}: {exc}'}), 400
+    finally:
+        errors.close()
+        if text is not None:
+            text.detach()
+
+    progress.update(errors.summary())
+    return jsonify(progress), 200
+
+
+EXPORT_FIELDNAMES = ['imsi', 'msisdn', 'k', 'opc', 'amf', 'dnn']
+EXPORT_PROJECTION = {
+    'imsi': 1, 'msisdn': 1, 'security.k': 1, 'security.opc': 1, 'security.amf': 1, 'slice.session.name': 1
+}
+EXPORT_CHUNK_ROWS = int(os.getenv('SUBSCRIBER_EXPORT_CHUNK_ROWS', '1000'))
 
-@app.route('/api/subscribers/export', methods=['GET'])
-def api_export_subscribers():
-    """Export subscribers as CSV for automation workflows."""
-    subscribers = get_subscribers_from_db()
-    fieldnames = ['imsi', 'msisdn', 'k', 'opc', 'amf', 'dnn']
+
+def _export_row(sub):
+    sec = sub.get('security', {})
+    slices = sub.get('slice') or []
+    sessions = slices[0].get('session') if slices else None
+    session = sessions[0] if sessions else {}
+    return {
+        'imsi': sub.get('imsi', ''),
+        'msisdn': sub.get('msisdn', ''),
+        'k': sec.get('k', ''),
+        'opc': sec.get('opc', ''),
+        'amf': sec.get('amf', ''),
+        'dnn': session.get('name', 'internet')
+    }
+
+
+def _iter_export_csv(documents, compress=False):
+    """Yield the CSV export in chunks of EXPORT_CHUNK_ROWS rows, optionally gzipped."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
     buffer = io.StringIO()
-    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDNAMES)
     writer.writeheader()
 
-    for sub in subscribers:
-        sec = sub.get('security', {})
-        slices = sub.get('slice') or []
-        sessions = slices[0].get('session') if slices else None
-        session = sessions[0] if sessions else {}
-        writer.writerow({
-            'imsi': sub.get('imsi', ''),
-            'msisdn': sub.get('msisdn', ''),
-            'k': sec.get('k', ''),
-            'opc': sec.get('opc', ''),
-            'amf': sec.get('amf', ''),
-            'dnn': session.get('name', 'internet')
-        })
-
-    csv_data = buffer.getvalue()
-    buffer.close()
+    def drain():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    rows = 0
+    for sub in documents:
+        writer.writerow(_export_row(sub))
+        rows += 1
+        if rows % EXPORT_CHUNK_ROWS == 0:
+            chunk = drain()
+            if chunk:
+                yield chunk
+
+    chunk = drain()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def _export_stream(documents, encode):
+    """Yield `encode(documents)` chunks, timing the export phases of the request.
+
+    Fetching documents is charged to 'db'; the rest of the time the generator
+    runs (not waiting on the client) is encoding and compression ('serialize').
+    """
+    timer = request_phases() or PhaseTimer()
+    db_before = timer.phases.get('db', 0.0)
+    chunks = encode(timer.timed_iter('db', documents))
+    busy = 0.0
+    while True:
+        resumed = time.perf_counter()
+        chunk = next(chunks, None)
+        busy += time.perf_counter() - resumed
+        if chunk is None:
+            break
+        yield chunk
+    timer.add('serialize', busy - (timer.phases.get('db', 0.0) - db_before))
+
+
+def _export_response(fmt, compress, name, documents, encode):
+    compress = compress and fmt not in ARROW_FORMATS  # Parquet/Arrow compress internally
+    filename = f'{name}.{EXTENSIONS[fmt]}' + ('.gz' if compress else '')
     return Response(
-        csv_data,
-        mimetype='text/csv',
-        headers={'Content-Disposition': 'attachment; filename=\"subscribers.csv\"'}
+        stream_with_context(_export_stream(documents, encode)),
+        mimetype='application/gzip' if compress else MIMETYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
     )
 
+
+@app.route('/api/subscribers/export', methods=['GET'])
+def api_export_subscribers():
+    """Export subscribers for automation and analytics workflows.
+
+    ?format=csv (default) writes the flat dashboard columns; ndjson writes
+    full documents; parquet and arrow (pyarrow required) use the fixed
+    SUBSCRIBER_SCHEMA including slices and sessions. Rows are streamed from
+    one batched cursor pass; ?compress=gzip gzips CSV and NDJSON.
+    """
+    compress = request.args.get('compress', '').lower() == 'gzip'
+    try:
+        fmt = resolve_format(request.args.get('format'))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    except MissingDependencyError as exc:
+        return jsonify({'error': str(exc)}), 501
+
+    if fmt == 'csv':
+        documents = subscriber_store.iter_documents(EXPORT_PROJECTION, batch_size=EXPORT_CHUNK_ROWS)
+        encode = lambda docs: _iter_export_csv(docs, compress)
+    else:
+        documents = subscriber_store.iter_documents(batch_size=EXPORT_CHUNK_ROWS)
+        if fmt == 'ndjson':
+            encode = lambda docs: iter_ndjson(docs, EXPORT_CHUNK_ROWS, compress)
+        else:
+            encode = lambda docs: iter_arrow((subscriber_record(doc) for doc in docs), SUBSCRIBER_SCHEMA, fmt)
+    return _export_response(fmt, compress, 'subscribers', documents, encode)
+
+def _job_accepted(job_id):
+    location = f'/api/jobs/{job_id}'
+    return jsonify({'job-id': job_id, 'status': 'queued', 'location': location}), 202, {'Location': location}
+
+
+@app.route('/api/jobs', methods=['GET'])
+def api_list_jobs():
+    """Recent background jobs, newest first (without results)."""
+    return jsonify({'jobs': job_registry.list(), 'provisioning': provisioning_jobs.list()}), 200
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_get_job(job_id):
+    """Status, progress and (once finished) result of a background job."""
+    job = job_registry.get(job_id) or provisioning_jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job), 200
+
+
+@app.route('/api/jobs/<job_id>/resume', methods=['POST'])
+def api_resume_job(job_id):
+    """Restart a failed or interrupted provisioning job from its last finished chunk."""
+    if provisioning_jobs.resume(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(provisioning_jobs.status(job_id)), 202
+
+
+@app.route('/api/admin/profiles', methods=['GET', 'DELETE'])
+def api_slow_request_profiles():
+    """Slowest sampled requests with their cProfile output (DELETE clears them).
+
+    Enabled with PROFILE_SLOW_REQUESTS=<N>; profiles are kept per worker
+    process. The endpoint only exists when ADMIN_TOKEN is configured, and
+    the token must be sent as X-Admin-Token.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Not found'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({'error': 'Forbidden'}), 403
+    if request.method == 'DELETE':
+        slow_request_profiler.reset()
+        return jsonify({'status': 'cleared'}), 200
+    include_profile = request.args.get('profile', 'true').lower() != 'false'
+    return jsonify({
+        'enabled': slow_request_profiler.enabled,
+        'keep': slow_request_profiler.keep,
+        'sample_rate': slow_request_profiler.sample_rate,
+        'sampled': slow_request_profiler.sampled,
+        'requests': slow_request_profiler.slowest(include_profile),
+    }), 200
+
+
 @app.route('/api/logs', methods=['GET'])
 def get_logs():
-    """Get recent system logs"""
-    logs = [
-        {'time': '14:32:15', 'level': 'INFO', 'nf': 'AMF', 'message': 'UE registration complete'},
-        {'time': '14:31:48', 'level': 'INFO', 'nf': 'SMF', 'message': 'PDU session established'},
-        {'time': '14:30:22', 'level': 'WARNING', 'nf': 'AMF', 'message': 'High CPU load detected'}
-    ]
+    """Get recent Open5GS log lines, newest first
+
+    Filters: nf (comma-separated), level (minimum severity), since (epoch
+    seconds, a duration such as 15m, or ISO 8601), q (substring) and limit.
+    """
+    try:
+        min_level = parse_level(request.args.get('level'))
+        since = parse_since(request.args.get('since'))
+        limit = int(request.args.get('limit', 100))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    limit = max(1, min(limit, LOG_QUERY_MAX_LIMIT))
+
+    logs = log_store.query(
+        nf=request.args.get('nf'), min_level=min_level, since=since, q=request.args.get('q'), limit=limit
+    )
     return jsonify(logs), 200
 
 
+@app.route('/api/logs/stream', methods=['GET'])
+def stream_logs():
+    """Server-Sent Events push of new log lines (`logs` frames, one per read)."""
+    subscriber = log_broadcaster.subscribe()
+    if subscriber is None:
+        return jsonify({'error': 'Too many event stream clients'}), 503
+
+    return Response(
+        log_broadcaster.stream(subscriber, lambda: format_sse('snapshot', {'logs': log_store.recent()})),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/api/logs/stats', methods=['GET'])
+def get_log_stats():
+    """Size of the in-memory log store and the read position of each tailed file."""
+    return jsonify({
+        'store': log_store.stats(),
+        'sources': log_tailer.sources if log_tailer is not None else {},
+    }), 200
+
+
 @app.route('/api/alerts', methods=['GET'])
 def get_alerts():
     """Expose recent alert events and config."""
+    metrics = metrics_snapshot['data']
     return jsonify({
-        'alerts': _alert_events,
+        'alerts': alert_log.list(),
+        'active': active_alerts,
+        'rules': [rule.to_dict() for rule in alert_engine.rules],
         'config': ALERT_CONFIG,
-        'latency_estimate_ms': _estimate_latency(),
-        'sla_estimate_percent': _estimate_sla_score(),
+        'latency_estimate_ms': _estimate_latency(metrics),
+        'sla_estimate_percent': _estimate_sla_score(metrics),
+        'webhook': alert_dispatcher.stats() if alert_dispatcher is not None else None,
     }), 200
 
 
 @app.route('/metrics', methods=['GET'])
 def prometheus_metrics():
     """Prometheus scrape endpoint."""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        # Aggregate counters/histograms written by every worker process
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(nf_metrics_collector)
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
     return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
 
 @app.route('/health', methods=['GET'])
@@ -539,9 +1365,25 @@ def health_check():
     return jsonify({
         'status': 'healthy', 
         'services': ['AMF', 'SMF', 'UPF'],
-        'database': 'connected' if db is not None else 'disconnected'
+        'database': database_connector.state,
+        'cores': {core_id: state['status'] for core_id, state in metrics_snapshot['cores'].items()},
+        'subscriber_cache': subscriber_store.stats(),
     }), 200
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 503 until background services run and MongoDB (when configured) answers
+
+    Unlike /health, which only says the process is serving, this tells a
+    load balancer or orchestrator when to route traffic to the worker.
+    """
+    checks = {
+        'background_services': _background_started,
+        'database': database_connector.status(),
+    }
+    ready = _background_started and database_connector.ready
+    return jsonify({'status': 'ready' if ready else 'not-ready', 'checks': checks}), 200 if ready else 503
+
 @app.route('/', methods=['GET'])
 def index():
     """Root endpoint"""
@@ -560,9 +1402,13 @@ if __name__ == '__main__':
     print("  GET  /restconf/data/open5gs:core/amf")
     print("  GET  /restconf/data/open5gs:core/smf")
     print("  GET  /restconf/data/open5gs:core/upf")
+    print("  GET  /restconf/data/open5gs:cores/core=<id>/{amf,smf,upf}")
     print("  GET  /restconf/data/open5gs:subscribers")
     print("  POST /restconf/data/open5gs:subscribers")
+    print("  GET  /restconf/data/open5gs:subscribers/subscriber=<imsi>")
     print("  DEL  /restconf/data/open5gs:subscribers/subscriber=<imsi>")
     print("  POST /restconf/operations/open5gs:deregister-ue")
+    print("  GET  /health, /ready")
     print("=" * 60)
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    get_app()
+    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
\ No newline at end of file
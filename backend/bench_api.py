@@ -0,0 +1,391 @@
+"""Benchmark the subscriber and metrics management API in-process.
+
+Drives the Flask app through its test client against a fresh subscriber
+store per run, so results measure the API and store code rather than the
+network. Example:
+
+    python bench_api.py --counts 1000,10000,100000 --output bench.json
+    python bench_api.py --counts 1000,10000,100000 --baseline bench.json
+
+The cold_start scenario times `import app` and the first /health request
+in fresh interpreters, so it covers import-time work the in-process
+scenarios never see again after the first request.
+
+Each subscriber count runs in its own process, so peak RSS is per count
+rather than the high-water mark of everything run before it; each
+scenario also reports how much it raised that peak (rss_delta_mb).
+
+With --baseline the run fails (exit code 1) when a scenario's p95 latency
+grows, or its throughput drops, by more than --threshold. A baseline
+recorded with different settings is refused (exit code 2).
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+
+# Keep request metrics in-process; multiprocess mode would write them to disk per sample
+os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+
+import app as api
+from provisioning import SubscriberBulkWriter
+from subscriber_cache import CachedSubscriberStore
+from subscriber_store import InMemorySubscriberStore, MongoSubscriberStore
+
+SCENARIOS = [
+    'api_batch_subscribers',
+    'get_subscribers',
+    'get_subscriber',
+    'get_metrics',
+    'create_subscriber',
+    'api_export_subscribers',
+    'api_import_subscribers',
+    'cold_start',
+]
+# Settings that change what a scenario measures; a baseline must match them to be comparable
+COMPARABLE_SETTINGS = ('store', 'counts', 'requests', 'repeat', 'batch_size', 'page_size')
+IMSI_BASE = 1010000000000
+MSISDN_BASE = 10000000000
+
+# Runs in a fresh interpreter; background services stay off so only import and request work is timed
+COLD_START_SCRIPT = """
+import json, resource, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.get_app(start_background=False).test_client()
+response = client.get('/health')
+response.get_data()
+print(json.dumps({
+    'import': imported - start,
+    'first_health': time.perf_counter() - imported,
+    'status': response.status_code,
+    'maxrss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+"""
+
+
+def make_store(kind):
+    if kind == 'mongomock':
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit('--store mongomock requires the mongomock package')
+        store = MongoSubscriberStore(mongomock.MongoClient()['open5gs_bench'])
+        store.ensure_indexes()
+    else:
+        store = InMemorySubscriberStore()
+    return CachedSubscriberStore(store, api.subscriber_resource)
+
+
+def subscriber_entry(index):
+    return {
+        'imsi': f'{IMSI_BASE + index:015d}',
+        'msisdn': str(MSISDN_BASE + index),
+        'dnn': 'internet' if index % 4 else 'ims',
+        'sst': 1,
+    }
+
+
+def seed(store, count):
+    writer = SubscriberBulkWriter(store)
+    for index in range(count):
+        writer.add(api.build_subscriber_document(subscriber_entry(index)))
+    writer.flush()
+
+
+def csv_upload(count):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=['imsi', 'msisdn', 'dnn', 'sst'])
+    writer.writeheader()
+    for index in range(count):
+        writer.writerow(subscriber_entry(index))
+    return buffer.getvalue().encode('utf-8')
+
+
+def peak_rss_mb():
+    return rss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def rss_mb(maxrss):
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    rank = fraction * (len(ordered) - 1)
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+class Timer:
+    """Collect per-request latencies and the rows they moved for one scenario."""
+
+    def __init__(self):
+        self.samples = []
+        self.rows = 0
+        self.failures = 0
+        self.rss_before = peak_rss_mb()
+
+    def call(self, send, rows=0):
+        start = time.perf_counter()
+        response = send()
+        response.get_data()  # drain streamed bodies inside the timed region
+        self.samples.append(time.perf_counter() - start)
+        response.close()
+        if response.status_code >= 400:
+            self.failures += 1
+        self.rows += rows
+        return response
+
+    def result(self):
+        ordered = sorted(self.samples)
+        elapsed = sum(ordered)
+        peak = peak_rss_mb()
+        result = {
+            'requests': len(ordered),
+            'failures': self.failures,
+            'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+            'mean_ms': round(elapsed / len(ordered) * 1000, 3) if ordered else 0.0,
+            'requests_per_second': round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+            'peak_rss_mb': peak,
+            'rss_delta_mb': round(peak - self.rss_before, 1),
+        }
+        if self.rows:
+            result['rows_per_second'] = round(self.rows / elapsed, 1) if elapsed else 0.0
+        return result
+
+
+def run_count(client, count, options):
+    """Run every selected scenario against `count` subscribers; returns {scenario: result}."""
+    selected = options.scenarios
+    results = {}
+
+    # Batch creation doubles as the seeding step for the read scenarios.
+    api.subscriber_store = make_store(options.store)
+    if 'api_batch_subscribers' in selected:
+        timer = Timer()
+        for start in range(0, count, options.batch_size):
+            entries = [subscriber_entry(i) for i in range(start, min(start + options.batch_size, count))]
+            timer.call(lambda: client.post('/api/subscribers/batch', json={'subscribers': entries}), len(entries))
+        results['api_batch_subscribers'] = timer.result()
+    else:
+        seed(api.subscriber_store, count)
+
+    rng = random.Random(count)
+    if 'get_subscribers' in selected:
+        timer = Timer()
+        for _ in range(options.requests):
+            cursor = f'{IMSI_BASE + rng.randrange(count):015d}'
+            timer.call(lambda: client.get(
+                '/restconf/data/open5gs:subscribers',
+                query_string={'limit': options.page_size, 'cursor': cursor},
+            ), options.page_size)
+        results['get_subscribers'] = timer.result()
+
+    if 'get_subscriber' in selected:
+        # Reads concentrate on a hot set of up to 1000 subscribers, as dashboards and lookups do
+        timer = Timer()
+        for _ in range(options.requests):
+            imsi = f'{IMSI_BASE + rng.randrange(min(count, 1000)):015d}'
+            timer.call(lambda: client.get(f'/restconf/data/open5gs:subscribers/subscriber={imsi}'))
+        results['get_subscriber'] = timer.result()
+
+    if 'get_metrics' in selected:
+        timer = Timer()
+        for _ in range(options.requests):
+            timer.call(lambda: client.get('/api/metrics'))
+        results['get_metrics'] = timer.result()
+
+    if 'api_export_subscribers' in selected:
+        timer = Timer()
+        for _ in range(options.repeat):
+            timer.call(lambda: client.get('/api/subscribers/export'), count)
+        results['api_export_subscribers'] = timer.result()
+
+    if 'create_subscriber' in selected:
+        timer = Timer()
+        for index in range(count, count + options.requests):
+            entry = subscriber_entry(index)
+            timer.call(lambda: client.post('/restconf/data/open5gs:subscribers', json=entry), 1)
+        results['create_subscriber'] = timer.result()
+
+    if 'api_import_subscribers' in selected:
+        upload = csv_upload(count)
+        timer = Timer()
+        for _ in range(options.repeat):
+            api.subscriber_store = make_store(options.store)
+            timer.call(lambda: client.post(
+                '/api/subscribers/import',
+                data={'file': (io.BytesIO(upload), 'subscribers.csv')},
+                content_type='multipart/form-data',
+            ), count)
+        results['api_import_subscribers'] = timer.result()
+        del upload
+
+    api.subscriber_store = make_store(options.store)
+    return results
+
+
+def run_cold_start(options):
+    """Time `import app` and the first /health request in `options.repeat` fresh processes."""
+    env = dict(os.environ, MONGO_URI='')
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    imports, requests = Timer(), Timer()
+    peak = 0
+    for _ in range(options.repeat):
+        run = subprocess.run([sys.executable, '-c', COLD_START_SCRIPT], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             env=env, capture_output=True, text=True, check=True)
+        sample = json.loads(run.stdout.strip().splitlines()[-1])
+        imports.samples.append(sample['import'])
+        requests.samples.append(sample['first_health'])
+        requests.failures += sample['status'] >= 400
+        peak = max(peak, sample['maxrss'])
+    results = {'cold_start_import': imports.result(), 'cold_start_first_health': requests.result()}
+    for result in results.values():
+        result['peak_rss_mb'] = result['rss_delta_mb'] = rss_mb(peak)
+    return results
+
+
+def run_count_process(count, scenarios, options):
+    """run_count() in a fresh interpreter, so its RSS is not inflated by earlier counts."""
+    command = [
+        sys.executable, os.path.abspath(__file__), '--count-worker',
+        '--counts', str(count), '--scenarios', ','.join(scenarios), '--store', options.store,
+        '--requests', str(options.requests), '--repeat', str(options.repeat),
+        '--batch-size', str(options.batch_size), '--page-size', str(options.page_size),
+    ]
+    run = subprocess.run(command, capture_output=True, text=True)
+    if run.returncode != 0:
+        sys.exit(f'Benchmark for {count} subscribers failed:\n{run.stderr}')
+    # The app may print status lines on import; the results are the last line
+    return json.loads(run.stdout.strip().splitlines()[-1])
+
+
+def setting_mismatches(meta, baseline_meta):
+    """Settings in COMPARABLE_SETTINGS that differ between this run and the baseline."""
+    return [
+        f'{name}: baseline {baseline_meta.get(name)!r}, this run {meta[name]!r}'
+        for name in COMPARABLE_SETTINGS if baseline_meta.get(name) != meta[name]
+    ]
+
+
+def compare(results, baseline, threshold):
+    """Return regressions of `results` against `baseline` beyond the relative threshold."""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+            regressions.append(f"{key}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        rate = 'rows_per_second' if 'rows_per_second' in current else 'requests_per_second'
+        if previous.get(rate) and current[rate] < previous[rate] * (1 - threshold):
+            regressions.append(f'{key}: {rate} {previous[rate]} -> {current[rate]}')
+    return regressions
+
+
+def print_table(results):
+    print(f"{'scenario':<36}{'reqs':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'rows/s':>12}"
+          f"{'rss MB':>9}{'+rss MB':>9}")
+    for key, r in results.items():
+        rows = r.get('rows_per_second', '')
+        print(f"{key:<36}{r['requests']:>7}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}"
+              f"{r['requests_per_second']:>10}{rows:>12}{r['peak_rss_mb']:>9}{r['rss_delta_mb']:>9}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--counts', default='1000,10000',
+                        help='comma-separated subscriber counts, e.g. 1000,100000,1000000')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--store', choices=['memory', 'mongomock'], default='memory')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='requests per latency scenario (get_subscribers, get_metrics, create_subscriber)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs of the full import/export per count, and of cold_start')
+    parser.add_argument('--batch-size', type=int, default=1000, help='subscribers per batch request')
+    parser.add_argument('--page-size', type=int, default=100, help='limit for paged subscriber reads')
+    parser.add_argument('--output', help='write results JSON to this path')
+    parser.add_argument('--baseline', help='results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed relative regression against the baseline (default 0.2)')
+    # Internal: run one count and print its results as JSON (see run_count_process)
+    parser.add_argument('--count-worker', action='store_true', help=argparse.SUPPRESS)
+    options = parser.parse_args(argv)
+    options.counts = [int(c) for c in options.counts.split(',') if c.strip()]
+    options.scenarios = [s.strip() for s in options.scenarios.split(',') if s.strip()]
+    unknown = set(options.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return options
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    if options.count_worker:
+        print(json.dumps(run_count(api.app.test_client(), options.counts[0], options)))
+        return 0
+
+    results = {}
+    if 'cold_start' in options.scenarios:
+        print(f'Timing cold start in {options.repeat} fresh processes...', file=sys.stderr)
+        results.update(run_cold_start(options))
+    per_count = [scenario for scenario in options.scenarios if scenario != 'cold_start']
+    for count in options.counts if per_count else []:
+        print(f'Running {len(per_count)} scenarios with {count} subscribers...', file=sys.stderr)
+        for scenario, result in run_count_process(count, per_count, options).items():
+            results[f'{scenario}@{count}'] = result
+
+    meta = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'store': options.store,
+        'counts': options.counts,
+        'requests': options.requests,
+        'repeat': options.repeat,
+        'batch_size': options.batch_size,
+        'page_size': options.page_size,
+    }
+    report = {'meta': meta, 'results': results}
+    print_table(results)
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, indent=2)
+        print(f'Results written to {options.output}')
+
+    if options.baseline:
+        with open(options.baseline, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+        mismatches = setting_mismatches(meta, baseline.get('meta', {}))
+        if mismatches:
+            print(f'Not comparing against {options.baseline}, it was recorded with different settings:')
+            for line in mismatches:
+                print(f'  {line}')
+            return 2
+        regressions = compare(results, baseline.get('results', {}), options.threshold)
+        if regressions:
+            print(f'{len(regressions)} regression(s) against {options.baseline}:')
+            for line in regressions:
+                print(f'  {line}')
+            return 1
+        print(f'No regressions against {options.baseline} (threshold {options.threshold:.0%})')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,184 @@
+import os
+import random
+import threading
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+METRICS_INTERVAL_SECONDS = float(os.getenv('METRICS_INTERVAL_SECONDS', '2'))
+METRICS_JITTER_SECONDS = float(os.getenv('METRICS_JITTER_SECONDS', '0.5'))
+RECONCILE_INTERVAL_SECONDS = float(os.getenv('COLLECTOR_RECONCILE_SECONDS', '300'))
+# Minimum time between active-session recounts triggered by session change events
+SESSION_RECOUNT_SECONDS = float(os.getenv('COLLECTOR_SESSION_RECOUNT_SECONDS', '10'))
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+COLLECTOR_CYCLE = Histogram('metrics_collector_cycle_seconds', 'Duration of one metrics collection cycle')
+COLLECTOR_LAST_SUCCESS = Gauge(
+    'metrics_collector_last_success_timestamp_seconds',
+    'Unix time of the last successful metrics collection',
+    multiprocess_mode='max'
+)
+COLLECTOR_ERRORS = Counter('metrics_collector_errors_total', 'Failed metrics collection cycles')
+COLLECTOR_RECONCILIATIONS = Counter(
+    'metrics_collector_reconciliations_total',
+    'Exact recounts of subscribers and active sessions'
+)
+CHANGE_STREAM_ACTIVE = Gauge(
+    'metrics_collector_change_stream_active',
+    'Whether the change stream for a collection is being followed (1) or polled (0)',
+    ['core', 'collection'],
+    multiprocess_mode='livemax'
+)
+CHANGE_STREAM_EVENTS = Counter(
+    'metrics_collector_change_events_total',
+    'Change stream events applied to the incremental counts',
+    ['core', 'collection']
+)
+
+
+def collector_sleep_interval():
+    """Configured collection interval plus random jitter so workers and cores don't align."""
+    return METRICS_INTERVAL_SECONDS + random.uniform(0, METRICS_JITTER_SECONDS)
+
+
+class IncrementalCounter:
+    """Subscriber and active-session counts kept current without full scans per cycle.
+
+    Each change stream is opened before its collection is counted, and
+    events at or before the count's operation time are skipped, so no
+    write between the count and the stream is missed or applied twice.
+    Subscriber inserts/deletes then adjust the total directly, and
+    session changes mark the active-session count dirty so it is re-read
+    through the `state` index, at most every `session_recount` seconds.
+    Without a replica set (no change streams) the counter falls back to
+    `estimated_document_count` and the indexed session count. Both modes
+    are reconciled with exact counts every RECONCILE_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, db, reconcile_interval=RECONCILE_INTERVAL_SECONDS, core='default',
+                 session_recount=SESSION_RECOUNT_SECONDS):
+        self._db = db
+        self._core = core
+        self._reconcile_interval = reconcile_interval
+        self._session_recount = session_recount
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._subscribers = 0
+        self._sessions = 0
+        self._sessions_dirty = False
+        self._sessions_counted = 0.0
+        self._streaming = {'subscribers': False, 'sessions': False}
+        # Operation time of the latest exact count per collection; older change events are already in it
+        self._counted_at = {'subscribers': None, 'sessions': None}
+        self._last_reconcile = 0.0
+        self._threads = []
+
+    def start(self):
+        # pymongo is only needed once there is a database to count
+        from pymongo import ASCENDING
+        from pymongo.errors import PyMongoError
+
+        try:
+            self._db.sessions.create_index([('state', ASCENDING)])
+        except PyMongoError as exc:
+            print(f"⚠ Could not create sessions.state index: {exc}")
+        # Each watch thread counts its collection once the stream is open (see _watch)
+        for name in ('subscribers', 'sessions'):
+            thread = threading.Thread(target=self._watch, args=(name,), name=f'watch-{name}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+
+    def reconcile(self):
+        for collection in ('subscribers', 'sessions'):
+            self._recount(collection)
+        self._last_reconcile = time.monotonic()
+        COLLECTOR_RECONCILIATIONS.inc()
+
+    def _recount(self, collection):
+        """Exact count of one collection, remembering the operation time it reflects."""
+        query = {} if collection == 'subscribers' else {'state': 'ACTIVE'}
+        with self._db.client.start_session() as session:
+            count = self._db[collection].count_documents(query, session=session)
+            counted_at = session.operation_time
+        with self._lock:
+            if collection == 'subscribers':
+                self._subscribers = count
+            else:
+                self._sessions = count
+                self._sessions_dirty = False
+                self._sessions_counted = time.monotonic()
+            self._counted_at[collection] = counted_at
+
+    def counts(self):
+        """Return (subscribers, active_sessions), refreshing only what is stale."""
+        if time.monotonic() - self._last_reconcile >= self._reconcile_interval:
+            self.reconcile()
+            return self._subscribers, self._sessions
+
+        if not self._streaming['subscribers']:
+            subscribers = self._db.subscribers.estimated_document_count()
+            with self._lock:
+                self._subscribers = subscribers
+        if not self._streaming['sessions'] or (
+            self._sessions_dirty and time.monotonic() - self._sessions_counted >= self._session_recount
+        ):
+            self._recount('sessions')
+        return self._subscribers, self._sessions
+
+    def _apply(self, collection, change):
+        operation = change.get('operationType')
+        with self._lock:
+            counted_at = self._counted_at[collection]
+            if counted_at is not None and change.get('clusterTime') is not None and change['clusterTime'] <= counted_at:
+                return
+            if collection == 'subscribers':
+                if operation == 'insert':
+                    self._subscribers += 1
+                elif operation == 'delete':
+                    self._subscribers -= 1
+            else:
+                self._sessions_dirty = True
+        CHANGE_STREAM_EVENTS.labels(core=self._core, collection=collection).inc()
+
+    def _watch(self, collection):
+        from pymongo.errors import OperationFailure, PyMongoError
+
+        resume_token = None
+        pipeline = [{'$match': {'operationType': {'$in': ['insert', 'update', 'replace', 'delete']}}}]
+        while not self._stop.is_set():
+            try:
+                with self._db[collection].watch(pipeline, resume_after=resume_token, max_await_time_ms=1000) as stream:
+                    if resume_token is None:
+                        # Count only once the stream is open, so writes from here on reach one or the other
+                        self._recount(collection)
+                    self._streaming[collection] = True
+                    CHANGE_STREAM_ACTIVE.labels(core=self._core, collection=collection).set(1)
+                    while not self._stop.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is not None:
+                            self._apply(collection, change)
+                        resume_token = stream.resume_token
+            except OperationFailure as exc:
+                self._set_polling(collection)
+                if exc.code == CHANGE_STREAM_UNSUPPORTED:
+                    # Standalone servers do not support change streams; stay on polling counts.
+                    print(f"Change stream unavailable for {collection}, polling counts instead")
+                    return
+                # e.g. the resume token fell off the oplog: start over from a fresh count.
+                print(f"Change stream for {collection} restarted: {exc}")
+                resume_token = None
+                self._last_reconcile = 0.0
+                self._stop.wait(1)
+            except PyMongoError as exc:
+                print(f"Change stream for {collection} interrupted: {exc}")
+                self._set_polling(collection)
+                self._stop.wait(5)
+
+    def _set_polling(self, collection):
+        self._streaming[collection] = False
+        CHANGE_STREAM_ACTIVE.labels(core=self._core, collection=collection).set(0)
+        with self._lock:
+            self._sessions_dirty = True
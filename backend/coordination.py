@@ -0,0 +1,75 @@
+import fcntl
+import json
+import os
+
+# Shared directory for the collector lock and published state. Only set when
+# several worker processes serve the app; a single process always collects.
+COLLECTOR_STATE_DIR = os.getenv('COLLECTOR_STATE_DIR', os.getenv('PROMETHEUS_MULTIPROC_DIR', '')).strip()
+
+
+class CollectorLock:
+    """Elect one collector across worker processes with a non-blocking flock.
+
+    The lock is held for the life of the process, so when the leader exits
+    the kernel releases it and the next worker to try takes over.
+    """
+
+    def __init__(self, state_dir=COLLECTOR_STATE_DIR):
+        self.path = os.path.join(state_dir, 'collector.lock') if state_dir else None
+        self._fd = None
+
+    def acquire(self):
+        if self.path is None or self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class SharedSnapshot:
+    """JSON state published by the elected collector and read by the other workers."""
+
+    def __init__(self, state_dir=COLLECTOR_STATE_DIR):
+        self.path = os.path.join(state_dir, 'metrics_snapshot.json') if state_dir else None
+        self._seen = None
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def write(self, state):
+        if self.path is None:
+            return
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            json.dump(state, handle, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def read_if_changed(self):
+        """Return the published state if it changed since the last read, else None."""
+        if self.path is None:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        marker = (stat.st_ino, stat.st_mtime_ns)
+        if marker == self._seen:
+            return None
+        with open(self.path, encoding='utf-8') as handle:
+            state = json.load(handle)
+        self._seen = marker
+        return state
@@ -0,0 +1,235 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from collector import IncrementalCounter
+
+CORE_ID = os.getenv('CORE_ID', 'default').strip() or 'default'
+CORES_FILE = os.getenv('CORES_FILE', '').strip()
+CORES = os.getenv('CORES', '').strip()
+CORE_COLLECT_TIMEOUT_SECONDS = float(os.getenv('CORE_COLLECT_TIMEOUT_SECONDS', '1.5'))
+CORE_COLLECT_WORKERS = int(os.getenv('CORE_COLLECT_WORKERS', '16'))
+CORE_MONGO_POOL_SIZE = int(os.getenv('CORE_MONGO_POOL_SIZE', '4'))
+
+# Fields summed across cores when aggregating; other numeric fields are averaged
+ADDITIVE_FIELDS = {'sessions', 'registered_ues', 'pdu_sessions', 'throughput', 'packets'}
+
+CORE_COLLECT_SECONDS = Histogram('core_collect_seconds', 'Duration of one collection from a core', ['core'])
+CORE_COLLECT_TIMEOUTS = Counter(
+    'core_collect_timeouts_total', 'Collections that did not finish within the per-core timeout', ['core']
+)
+CORE_COLLECT_ERRORS = Counter('core_collect_errors_total', 'Collections from a core that failed', ['core'])
+CORE_LAST_SUCCESS = Gauge(
+    'core_last_success_timestamp_seconds',
+    'Unix time of the last successful collection from a core',
+    ['core'],
+    multiprocess_mode='max'
+)
+
+
+def parse_cores(value):
+    """Parse 'id=mongodb://...,id=mongodb://...' into core specs."""
+    specs = []
+    for part in (value or '').split(','):
+        if '=' not in part:
+            continue
+        core_id, uri = part.split('=', 1)
+        if core_id.strip() and uri.strip():
+            specs.append({'id': core_id.strip(), 'mongo_uri': uri.strip()})
+    return specs
+
+
+def load_core_specs(path=CORES_FILE, value=CORES):
+    """Core specs from CORES_FILE (JSON list of {id, mongo_uri, labels}) or CORES; [] for single-core mode."""
+    if path:
+        try:
+            with open(path, encoding='utf-8') as handle:
+                loaded = json.load(handle)
+            specs = loaded.get('cores', []) if isinstance(loaded, dict) else loaded
+            return [spec for spec in specs if spec.get('id') and spec.get('mongo_uri')]
+        except (OSError, ValueError) as e:
+            print(f"⚠ Could not load cores from {path}: {e}")
+    return parse_cores(value)
+
+
+class Core:
+    """One Open5GS core: its MongoDB connection pool and incremental counters.
+
+    The client is created on first use with a small pool and timeouts
+    bounded by the collection timeout, so an unreachable core fails fast
+    instead of holding a collector thread.
+    """
+
+    def __init__(self, core_id, mongo_uri=None, db=None, labels=None, timeout=CORE_COLLECT_TIMEOUT_SECONDS):
+        self.id = core_id
+        self.mongo_uri = mongo_uri
+        self.labels = labels or {}
+        self.timeout = timeout
+        self._db = db
+        self._client = None
+        self._counter = None
+        self._lock = threading.Lock()
+
+    @property
+    def db(self):
+        if self._db is None and self.mongo_uri:
+            with self._lock:
+                if self._db is None:
+                    from mongo_client import open_client
+
+                    timeout_ms = int(self.timeout * 1000)
+                    self._client = open_client(
+                        self.mongo_uri,
+                        maxPoolSize=CORE_MONGO_POOL_SIZE,
+                        serverSelectionTimeoutMS=timeout_ms,
+                        connectTimeoutMS=timeout_ms,
+                        socketTimeoutMS=timeout_ms * 2,
+                    )
+                    self._db = self._client.get_default_database('open5gs')
+        return self._db
+
+    def counts(self):
+        """(subscribers, active_sessions) for this core, or None without a database."""
+        db = self.db
+        if db is None:
+            return None
+        if self._counter is None:
+            counter = IncrementalCounter(db, core=self.id)
+            counter.start()
+            self._counter = counter
+        return self._counter.counts()
+
+    def attach(self, db):
+        """Use `db` from now on; for the default core once the primary connection is up."""
+        with self._lock:
+            if self._db is None:
+                self._db = db
+
+    def stop(self):
+        if self._counter is not None:
+            self._counter.stop()
+        if self._client is not None:
+            self._client.close()
+
+
+class CoreRegistry:
+    """The cores this backend manages, in configuration order."""
+
+    def __init__(self, cores, default=None):
+        self._cores = {core.id: core for core in cores}
+        self.default = default
+
+    @classmethod
+    def from_config(cls, default_db=None):
+        specs = load_core_specs()
+        if not specs:
+            # Single-core mode: the core behind the primary MongoDB connection
+            core = Core(CORE_ID, db=default_db)
+            return cls([core], default=core)
+        return cls([Core(spec['id'], spec['mongo_uri'], labels=spec.get('labels')) for spec in specs])
+
+    def get(self, core_id):
+        return self._cores.get(core_id)
+
+    def ids(self):
+        return list(self._cores)
+
+    def __iter__(self):
+        return iter(self._cores.values())
+
+    def __len__(self):
+        return len(self._cores)
+
+    def stop(self):
+        for core in self:
+            core.stop()
+
+
+class ClusterCollector:
+    """Collect from every core in parallel with a per-core timeout.
+
+    Each cycle waits at most `timeout` for all cores. A core that has not
+    answered keeps its last metrics, is marked `timeout`, and is not sent
+    another request until the one in flight returns, so one slow core
+    neither stalls the cycle nor piles up threads.
+    """
+
+    def __init__(self, registry, build, timeout=CORE_COLLECT_TIMEOUT_SECONDS, workers=CORE_COLLECT_WORKERS):
+        self.registry = registry
+        self.timeout = timeout
+        self._build = build
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, min(workers, len(registry))), thread_name_prefix='core-collector'
+        )
+        self._inflight = {}
+
+    def collect(self, previous):
+        """New per-core states from `previous` ({core_id: {status, metrics, error, labels}})."""
+        for core in self.registry:
+            if core.id not in self._inflight:
+                self._inflight[core.id] = self._executor.submit(self._collect_core, core)
+        wait(list(self._inflight.values()), timeout=self.timeout)
+
+        states = {}
+        for core in self.registry:
+            last = previous.get(core.id, {})
+            future = self._inflight[core.id]
+            state = {'status': last.get('status', 'unknown'), 'metrics': last.get('metrics'),
+                     'error': None, 'labels': core.labels}
+            if not future.done():
+                CORE_COLLECT_TIMEOUTS.labels(core=core.id).inc()
+                state.update(status='timeout', error=f'no response within {self.timeout}s')
+            else:
+                del self._inflight[core.id]
+                try:
+                    state.update(status='up', metrics=self._build(last.get('metrics'), future.result()))
+                    CORE_LAST_SUCCESS.labels(core=core.id).set_to_current_time()
+                except Exception as exc:
+                    CORE_COLLECT_ERRORS.labels(core=core.id).inc()
+                    state.update(status='down', error=str(exc))
+            states[core.id] = state
+        return states
+
+    def _collect_core(self, core):
+        start = time.perf_counter()
+        try:
+            return core.counts()
+        finally:
+            CORE_COLLECT_SECONDS.labels(core=core.id).observe(time.perf_counter() - start)
+
+    def stop(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def aggregate_metrics(cores, template):
+    """Cluster-wide NF metrics: counters summed, loads averaged over cores that have metrics.
+
+    NF status is `active` when every contributing core reports it active,
+    `degraded` when only some do and `down` when none do.
+    """
+    contributing = [state['metrics'] for state in cores.values()
+                    if state.get('metrics') and state.get('status') != 'down']
+    if not contributing:
+        return template
+    aggregate = {}
+    for nf, fields in template.items():
+        values = [metrics.get(nf, {}) for metrics in contributing]
+        merged = {}
+        for field, default in fields.items():
+            samples = [v[field] for v in values if field in v]
+            if field == 'status':
+                active = sum(1 for sample in samples if sample == 'active')
+                merged[field] = 'active' if active == len(samples) else ('degraded' if active else 'down')
+            elif samples and all(isinstance(s, (int, float)) and not isinstance(s, bool) for s in samples):
+                if len(samples) == 1 or field in ADDITIVE_FIELDS:
+                    merged[field] = sum(samples)
+                else:
+                    merged[field] = round(sum(samples) / len(samples), 2)
+            else:
+                merged[field] = samples[0] if samples else default
+        aggregate[nf] = merged
+    return aggregate
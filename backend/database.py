@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+
+from prometheus_client import Gauge
+
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/').strip()
+# Database used when MONGO_URI does not name one
+MONGO_DB = os.getenv('MONGO_DB', 'open5gs').strip() or 'open5gs'
+MONGO_TIMEOUT_MS = int(os.getenv('MONGO_TIMEOUT_MS', '2000'))
+MONGO_RETRY_SECONDS = float(os.getenv('MONGO_RETRY_SECONDS', '1'))
+MONGO_RETRY_MAX_SECONDS = float(os.getenv('MONGO_RETRY_MAX_SECONDS', '30'))
+MONGO_PING_SECONDS = float(os.getenv('MONGO_PING_SECONDS', '10'))
+
+MONGO_CONNECTED = Gauge(
+    'mongodb_connected', 'Whether MongoDB answered the last connection check', multiprocess_mode='livemax'
+)
+
+
+class DatabaseConnector:
+    """Connect to MongoDB in the background instead of blocking startup.
+
+    A daemon thread pings the server, retrying with exponential backoff
+    (MONGO_RETRY_SECONDS up to MONGO_RETRY_MAX_SECONDS) until it answers,
+    then calls `on_connect(db)` once. After that the driver reconnects on
+    its own; the thread keeps pinging every MONGO_PING_SECONDS so `state`
+    reflects outages for readiness checks. With an empty MONGO_URI the
+    connector is disabled and the backend stays on in-memory storage.
+    """
+
+    def __init__(self, on_connect, uri=MONGO_URI, name=MONGO_DB, timeout_ms=MONGO_TIMEOUT_MS,
+                 retry=MONGO_RETRY_SECONDS, retry_max=MONGO_RETRY_MAX_SECONDS, ping_interval=MONGO_PING_SECONDS):
+        self.uri = uri
+        self.name = name
+        self.timeout_ms = timeout_ms
+        self.retry = retry
+        self.retry_max = retry_max
+        self.ping_interval = ping_interval
+        self.state = 'connecting' if uri else 'disabled'
+        self.error = None
+        self.attempts = 0
+        self.connected_at = None
+        self.db = None
+        self._on_connect = on_connect
+        self._client = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self.state in ('connected', 'disabled')
+
+    def start(self):
+        if not self.uri or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='mongo-connector', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._client is not None:
+            self._client.close()
+
+    def status(self):
+        return {
+            'state': self.state,
+            'error': self.error,
+            'attempts': self.attempts,
+            'connected_at': self.connected_at,
+        }
+
+    def _run(self):
+        delay = self.retry
+        while not self._stop.is_set():
+            try:
+                if self._client is None:
+                    from mongo_client import open_client
+
+                    self._client = open_client(
+                        self.uri, serverSelectionTimeoutMS=self.timeout_ms, connectTimeoutMS=self.timeout_ms
+                    )
+                self._client.admin.command('ping')
+            except Exception as e:
+                self.attempts += 1
+                if self.error is None or self.state == 'connected':
+                    print(f"⚠ MongoDB unavailable ({e}); retrying in the background")
+                self.state = 'connecting' if self.db is None else 'disconnected'
+                self.error = str(e)
+                MONGO_CONNECTED.set(0)
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.retry_max)
+                continue
+
+            delay = self.retry
+            if self.state != 'connected':
+                self.error = None
+                if self.db is None:
+                    self.db = self._client.get_default_database(self.name)
+                    try:
+                        self._on_connect(self.db)
+                    except Exception as e:
+                        print(f"⚠ MongoDB connected but setup failed: {e}")
+                    self.connected_at = time.time()
+                    print("✓ MongoDB connected successfully")
+                else:
+                    print("✓ MongoDB connection restored")
+                self.state = 'connected'
+                MONGO_CONNECTED.set(1)
+            self._stop.wait(self.ping_interval)
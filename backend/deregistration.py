@@ -0,0 +1,159 @@
+import os
+
+from subscriber_store import _subscriber_dnn_sst_keys
+
+DEREGISTER_CHUNK_SIZE = int(os.getenv('DEREGISTER_CHUNK_SIZE', '1000'))
+DEREGISTER_SYNC_LIMIT = int(os.getenv('DEREGISTER_SYNC_LIMIT', '10000'))
+# Failed UEs kept in an async job's result; the rest are only counted
+DEREGISTER_FAILURE_SAMPLE = int(os.getenv('DEREGISTER_FAILURE_SAMPLE', '100'))
+DEREGISTERED = 'DEREGISTERED'
+OUTCOMES = ('deregistered', 'already-deregistered', 'not-found', 'failed')
+
+
+def parse_selection(data):
+    """Validate deregister-ues input: an `imsi` list or imsi-prefix/dnn/sst selectors."""
+    imsis = data.get('imsi')
+    selectors = {
+        'imsi_prefix': data.get('imsi-prefix'),
+        'dnn': data.get('dnn'),
+        'sst': data.get('sst'),
+    }
+    has_selectors = any(value not in (None, '') for value in selectors.values())
+    if imsis is not None:
+        if has_selectors:
+            raise ValueError('Use either an imsi list or selectors, not both')
+        if not isinstance(imsis, list) or not imsis:
+            raise ValueError('imsi must be a non-empty array')
+        unique = list(dict.fromkeys(str(i).strip() for i in imsis if str(i).strip()))
+        if not unique:
+            raise ValueError('imsi must be a non-empty array')
+        return {'imsis': unique}
+    if not has_selectors:
+        raise ValueError('An imsi list or at least one of imsi-prefix, dnn, sst is required')
+    if selectors['sst'] not in (None, ''):
+        try:
+            selectors['sst'] = int(selectors['sst'])
+        except (TypeError, ValueError):
+            raise ValueError('sst must be an integer')
+    else:
+        selectors['sst'] = None
+    selectors['imsi_prefix'] = str(selectors['imsi_prefix']).strip() if selectors['imsi_prefix'] else None
+    selectors['dnn'] = str(selectors['dnn']).strip() if selectors['dnn'] else None
+    return selectors
+
+
+def iter_selected_imsis(store, selection, chunk_size=DEREGISTER_CHUNK_SIZE):
+    """Yield the selected IMSIs in chunks, paging selectors through the subscriber store."""
+    if 'imsis' in selection:
+        imsis = selection['imsis']
+        for start in range(0, len(imsis), chunk_size):
+            yield imsis[start:start + chunk_size]
+        return
+
+    dnn, sst = selection['dnn'], selection['sst']
+    cursor = None
+    while True:
+        page = store.query(
+            imsi_prefix=selection['imsi_prefix'], dnn=dnn, cursor=cursor, limit=chunk_size,
+            projection={'slice.sst': 1, 'slice.session.name': 1},
+        )
+        if not page:
+            return
+        cursor = page[-1]['imsi']
+        if sst is None:
+            chunk = [doc['imsi'] for doc in page]
+        else:
+            chunk = [
+                doc['imsi'] for doc in page
+                if any(key_sst == sst and (dnn is None or key_dnn == dnn)
+                       for key_dnn, key_sst in _subscriber_dnn_sst_keys(doc))
+            ]
+        if chunk:
+            yield chunk
+        if len(page) < chunk_size:
+            return
+
+
+class SessionDeregistrar:
+    """Mark the sessions of many UEs DEREGISTERED with one update_many per chunk.
+
+    Without a sessions collection (in-memory demo mode) there is no session
+    state to change, so provisioned subscribers report `deregistered`, as
+    the single-UE deregister-ue RPC does.
+    """
+
+    def __init__(self, sessions, subscriber_store):
+        self._sessions = sessions
+        self._subscriber_store = subscriber_store
+
+    def ensure_indexes(self):
+        if self._sessions is not None:
+            from pymongo import ASCENDING
+
+            self._sessions.create_index([('imsi', ASCENDING)])
+
+    def deregister(self, imsis):
+        """Deregister one chunk, returning a {'imsi', 'result'[, 'error']} entry per IMSI."""
+        if self._sessions is None:
+            return [
+                {'imsi': imsi, 'result': 'deregistered' if self._subscriber_store.get(imsi) else 'not-found'}
+                for imsi in imsis
+            ]
+
+        from pymongo.errors import PyMongoError
+
+        try:
+            states = {}
+            for doc in self._sessions.find({'imsi': {'$in': imsis}}, {'_id': 0, 'imsi': 1, 'state': 1}):
+                states.setdefault(doc['imsi'], set()).add(doc.get('state'))
+            active = [imsi for imsi, seen in states.items() if seen - {DEREGISTERED}]
+            if active:
+                self._sessions.update_many(
+                    {'imsi': {'$in': active}, 'state': {'$ne': DEREGISTERED}},
+                    {'$set': {'state': DEREGISTERED}}
+                )
+        except PyMongoError as exc:
+            print(f"Error deregistering {len(imsis)} UEs: {exc}")
+            return [{'imsi': imsi, 'result': 'failed', 'error': str(exc)} for imsi in imsis]
+
+        active = set(active)
+        results = []
+        for imsi in imsis:
+            if imsi in active:
+                outcome = 'deregistered'
+            elif imsi in states:
+                outcome = 'already-deregistered'
+            else:
+                outcome = 'not-found'
+            results.append({'imsi': imsi, 'result': outcome})
+        return results
+
+
+def run_deregistration(deregistrar, chunks, on_progress=None, per_ue=True, failure_sample=DEREGISTER_FAILURE_SAMPLE):
+    """Deregister every chunk and build the RPC output.
+
+    With `per_ue` the output lists a result per IMSI (`ue`). Without it,
+    as for async jobs whose selection is unbounded, only the counts and
+    the first `failure_sample` failed UEs (`failed-ue`) are kept.
+    """
+    output = {outcome: 0 for outcome in OUTCOMES}
+    if per_ue:
+        output['ue'] = []
+    else:
+        output['failed-ue'] = []
+    processed = 0
+    for chunk in chunks:
+        for entry in deregistrar.deregister(chunk):
+            processed += 1
+            output[entry['result']] += 1
+            if per_ue:
+                output['ue'].append(entry)
+            elif entry['result'] == 'failed' and len(output['failed-ue']) < failure_sample:
+                output['failed-ue'].append(entry)
+        if on_progress is not None:
+            on_progress(processed, {outcome: output[outcome] for outcome in OUTCOMES})
+    output['requested'] = processed
+    if not per_ue:
+        output['failed-ue-truncated'] = output['failed'] > len(output['failed-ue'])
+    output['result'] = 'success' if not output['failed'] else 'partial-failure'
+    return output
@@ -0,0 +1,132 @@
+import json
+import os
+import queue
+import threading
+
+from prometheus_client import Counter, Gauge
+
+EVENT_STREAM_QUEUE_SIZE = int(os.getenv('EVENT_STREAM_QUEUE_SIZE', '64'))
+# Each open stream holds one gthread worker thread, so by default half the threads stay free for API requests
+EVENT_STREAM_MAX_CLIENTS = int(os.getenv(
+    'EVENT_STREAM_MAX_CLIENTS', str(max(1, int(os.getenv('GUNICORN_THREADS', '16')) // 2))
+))
+EVENT_STREAM_KEEPALIVE_SECONDS = 15
+
+STREAM_CLIENTS = Gauge('event_stream_clients', 'Connected Server-Sent Events clients', multiprocess_mode='livesum')
+STREAM_DROPPED = Counter('event_stream_dropped_events_total', 'Events dropped for slow SSE clients')
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class StreamSlots:
+    """Per-process budget of open SSE connections, shared by every broadcaster."""
+
+    def __init__(self, limit=EVENT_STREAM_MAX_CLIENTS):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.used -= 1
+
+
+stream_slots = StreamSlots()
+
+
+class _Subscriber:
+    __slots__ = ('queue', 'lagging')
+
+    def __init__(self, size):
+        self.queue = queue.Queue(maxsize=size)
+        self.lagging = False
+
+
+class EventBroadcaster:
+    """Fan out events to Server-Sent Events clients through per-client bounded queues.
+
+    Each event is serialized once. A client whose queue is full is not
+    allowed to block the publisher: its backlog is dropped and it is sent
+    a fresh full snapshot instead of the missed diffs.
+    """
+
+    def __init__(self, queue_size=EVENT_STREAM_QUEUE_SIZE, slots=stream_slots):
+        self.queue_size = queue_size
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._closed = False
+
+    def subscribe(self):
+        """Register a client, or return None when the process has no stream slot left."""
+        with self._lock:
+            if self._closed or not self.slots.acquire():
+                return None
+            subscriber = _Subscriber(self.queue_size)
+            self._subscribers.add(subscriber)
+            STREAM_CLIENTS.set(self.slots.used)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+                self.slots.release()
+            STREAM_CLIENTS.set(self.slots.used)
+
+    def close(self):
+        """End every open stream, e.g. on worker shutdown."""
+        with self._lock:
+            self._closed = True
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            with subscriber.queue.mutex:
+                subscriber.queue.queue.clear()
+            subscriber.queue.put_nowait(None)
+
+    def publish(self, event, data):
+        if not self._subscribers:
+            return
+        frame = format_sse(event, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(frame)
+            except queue.Full:
+                with subscriber.queue.mutex:
+                    dropped = len(subscriber.queue.queue)
+                    subscriber.queue.queue.clear()
+                subscriber.lagging = True
+                STREAM_DROPPED.inc(dropped + 1)
+
+    def stream(self, subscriber, snapshot):
+        """Yield SSE frames for one client; `snapshot()` returns the full-state frame."""
+        try:
+            yield 'retry: 3000\n\n'
+            yield snapshot()
+            while True:
+                try:
+                    frame = subscriber.queue.get(timeout=EVENT_STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    frame = ': keepalive\n\n'
+                if frame is None:
+                    return
+                if subscriber.lagging:
+                    # The backlog was discarded; resynchronize with the full state.
+                    subscriber.lagging = False
+                    with subscriber.queue.mutex:
+                        subscriber.queue.queue.clear()
+                    frame = snapshot()
+                yield frame
+        finally:
+            self.unsubscribe(subscriber)
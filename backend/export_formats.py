@@ -0,0 +1,277 @@
+import io
+import json
+import os
+import zlib
+
+EXPORT_ARROW_BATCH_ROWS = int(os.getenv('SUBSCRIBER_EXPORT_ARROW_BATCH_ROWS', '10000'))
+PARQUET_COMPRESSION = os.getenv('PARQUET_COMPRESSION', 'zstd')
+ARROW_FORMATS = ('parquet', 'arrow')
+MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+EXTENSIONS = {'csv': 'csv', 'ndjson': 'ndjson', 'parquet': 'parquet', 'arrow': 'arrows'}
+
+# Schemas accepted by iter_arrow, built on first use
+SUBSCRIBER_SCHEMA = 'subscriber'
+METRICS_HISTORY_SCHEMA = 'metrics_history'
+
+# pyarrow takes longer to import than the rest of the backend, so it is loaded on first Arrow/Parquet use
+_pyarrow = None
+_schemas = {}
+
+
+def _arrow():
+    """(pyarrow, pyarrow.parquet), or (None, None) when pyarrow is not installed."""
+    global _pyarrow
+    if _pyarrow is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+            _pyarrow = (pyarrow, pyarrow.parquet)
+        except ImportError:  # Arrow/Parquet formats are optional
+            _pyarrow = (None, None)
+    return _pyarrow
+
+
+def arrow_schema(name):
+    """The pyarrow schema registered under `name`."""
+    schema = _schemas.get(name)
+    if schema is not None:
+        return schema
+    pa, _ = _arrow()
+    if name == SUBSCRIBER_SCHEMA:
+        # Fixed layout of a subscriber document as written by build_subscriber_document
+        schema = pa.schema([
+            ('imsi', pa.string()),
+            ('msisdn', pa.string()),
+            ('security', pa.struct([('k', pa.string()), ('opc', pa.string()), ('amf', pa.string())])),
+            ('slice', pa.list_(pa.struct([
+                ('sst', pa.int32()),
+                ('default_indicator', pa.bool_()),
+                ('session', pa.list_(pa.struct([
+                    ('name', pa.string()),
+                    ('type', pa.string()),
+                    ('ambr', pa.struct([('uplink', pa.string()), ('downlink', pa.string())])),
+                    ('qos', pa.struct([
+                        ('index', pa.int32()),
+                        ('arp', pa.struct([('priority', pa.int32())])),
+                    ])),
+                ]))),
+            ]))),
+        ])
+    elif name == METRICS_HISTORY_SCHEMA:
+        schema = pa.schema([
+            ('nf', pa.string()),
+            ('metric', pa.string()),
+            ('tier', pa.string()),
+            ('ts', pa.float64()),
+            ('avg', pa.float64()),
+            ('min', pa.float64()),
+            ('max', pa.float64()),
+            ('count', pa.int64()),
+        ])
+    else:
+        raise KeyError(name)
+    _schemas[name] = schema
+    return schema
+
+
+class MissingDependencyError(Exception):
+    """A requested feature needs an optional package that is not installed."""
+
+
+class ImportFormatError(ValueError):
+    """The uploaded file could not be decoded in the requested format."""
+
+
+def resolve_format(value, filename=None, default='csv'):
+    """Pick a format from an explicit ?format= value or the upload's file extension."""
+    if value:
+        fmt = value.lower()
+    else:
+        extension = filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else ''
+        fmt = {'jsonl': 'ndjson', 'arrows': 'arrow', 'ipc': 'arrow'}.get(extension, extension)
+        if fmt not in MIMETYPES:
+            fmt = default
+    if fmt not in MIMETYPES:
+        raise ValueError(f"Unsupported format '{fmt}' (use {', '.join(MIMETYPES)})")
+    if fmt in ARROW_FORMATS and _arrow()[0] is None:
+        raise MissingDependencyError(f'The {fmt} format requires pyarrow')
+    return fmt
+
+
+def _str(value):
+    return None if value is None else str(value)
+
+
+def _int(value):
+    try:
+        return None if value is None else int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def subscriber_record(doc):
+    """Shape a subscriber document to SUBSCRIBER_SCHEMA (missing fields become None)."""
+    security = doc.get('security') or {}
+    slices = []
+    for slice_ in doc.get('slice') or []:
+        sessions = []
+        for session in slice_.get('session') or []:
+            ambr = session.get('ambr') or {}
+            qos = session.get('qos') or {}
+            arp = qos.get('arp') or {}
+            sessions.append({
+                'name': _str(session.get('name')),
+                'type': _str(session.get('type')),
+                'ambr': {'uplink': _str(ambr.get('uplink')), 'downlink': _str(ambr.get('downlink'))},
+                'qos': {'index': _int(qos.get('index')), 'arp': {'priority': _int(arp.get('priority'))}},
+            })
+        slices.append({
+            'sst': _int(slice_.get('sst')),
+            'default_indicator': slice_.get('default_indicator'),
+            'session': sessions,
+        })
+    return {
+        'imsi': _str(doc.get('imsi')),
+        'msisdn': _str(doc.get('msisdn')),
+        'security': {
+            'k': _str(security.get('k')),
+            'opc': _str(security.get('opc')),
+            'amf': _str(security.get('amf')),
+        },
+        'slice': slices,
+    }
+
+
+def _prune(value):
+    """Drop None fields, and structs left empty by that, from a schema-shaped record."""
+    if isinstance(value, dict):
+        pruned = {key: _prune(item) for key, item in value.items() if item is not None}
+        return {key: item for key, item in pruned.items() if item != {}}
+    if isinstance(value, list):
+        return [_prune(item) for item in value]
+    return value
+
+
+def subscriber_document_from_record(record, build):
+    """Turn an imported record into a subscriber document.
+
+    Full documents (NDJSON/Arrow exports) are normalized to the export
+    schema; flat rows such as CSV columns go through `build`.
+    """
+    if isinstance(record.get('security'), dict) or isinstance(record.get('slice'), list):
+        imsi = str(record.get('imsi') or '').strip()
+        if not imsi:
+            raise ValueError('IMSI is required')
+        doc = _prune(subscriber_record(record))
+        doc['imsi'] = imsi
+        return doc
+    return build(record)
+
+
+def iter_ndjson(records, chunk_rows, compress=False):
+    """Yield NDJSON bytes in chunks of `chunk_rows` records, optionally gzipped."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record, separators=(',', ':')))
+        if len(lines) >= chunk_rows:
+            data = ('\n'.join(lines) + '\n').encode('utf-8')
+            lines.clear()
+            data = compressor.compress(data) if compressor else data
+            if data:
+                yield data
+    data = ('\n'.join(lines) + '\n').encode('utf-8') if lines else b''
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose contents are handed out chunk by chunk."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_arrow(records, schema, fmt, batch_rows=EXPORT_ARROW_BATCH_ROWS):
+    """Yield a Parquet file or Arrow IPC stream in one pass, one record batch at a time.
+
+    `schema` names a schema from arrow_schema().
+    """
+    pa, pq = _arrow()
+    schema = arrow_schema(schema)
+    sink = _ChunkSink()
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(sink, schema, compression=PARQUET_COMPRESSION)
+    else:
+        writer = pa.ipc.new_stream(sink, schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+
+    rows = []
+    for record in records:
+        rows.append(record)
+        if len(rows) >= batch_rows:
+            writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+            rows.clear()
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    if rows:
+        writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+    writer.close()
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
+
+
+def parquet_row_count(path):
+    """Number of rows in a Parquet file, read from its footer."""
+    _, pq = _arrow()
+    return pq.ParquetFile(path).metadata.num_rows
+
+
+def iter_ndjson_records(text):
+    """Yield one dict per non-blank NDJSON line."""
+    for number, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            raise ImportFormatError(f'line {number}: {exc}')
+        if not isinstance(record, dict):
+            raise ImportFormatError(f'line {number}: expected a JSON object')
+        yield record
+
+
+def iter_arrow_records(stream, fmt, batch_rows=EXPORT_ARROW_BATCH_ROWS):
+    """Yield dicts from a Parquet file or Arrow IPC stream, one record batch at a time."""
+    pa, pq = _arrow()
+    try:
+        if fmt == 'parquet':
+            batches = pq.ParquetFile(stream).iter_batches(batch_size=batch_rows)
+        else:
+            batches = pa.ipc.open_stream(stream)
+        for batch in batches:
+            yield from batch.to_pylist()
+    except (pa.ArrowException, OSError) as exc:
+        raise ImportFormatError(str(exc))
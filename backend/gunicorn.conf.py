@@ -0,0 +1,35 @@
+import glob
+import multiprocessing
+import os
+import tempfile
+
+# Multiprocess metrics must be configured before any worker imports prometheus_client
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), '5gc-prometheus'))
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+from prometheus_client import multiprocess  # noqa: E402
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', str(multiprocessing.cpu_count())))
+# Each Server-Sent Events client holds one thread for its whole connection;
+# event_stream caps streams at half of GUNICORN_THREADS per worker (503 beyond
+# that) so the remaining threads keep serving API requests.
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '20'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+
+
+def on_starting(server):
+    """Drop metric files left behind by a previous run."""
+    for path in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+        os.remove(path)
+
+
+def worker_exit(server, worker):
+    from app import shutdown_background_services
+    shutdown_background_services()
+
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
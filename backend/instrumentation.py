@@ -0,0 +1,167 @@
+import cProfile
+import heapq
+import io
+import itertools
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram
+
+
+def parse_buckets(value, default=Histogram.DEFAULT_BUCKETS):
+    """Parse a comma-separated list of histogram bucket bounds (seconds)."""
+    if not value or not value.strip():
+        return default
+    try:
+        bounds = sorted({float(part) for part in value.split(',') if part.strip()})
+    except ValueError:
+        print(f"⚠ Ignoring invalid histogram buckets: {value!r}")
+        return default
+    return tuple(bounds) if bounds else default
+
+
+REQUEST_LATENCY_BUCKETS = parse_buckets(os.getenv('REQUEST_LATENCY_BUCKETS'))
+PHASE_LATENCY_BUCKETS = parse_buckets(os.getenv('PHASE_LATENCY_BUCKETS'), REQUEST_LATENCY_BUCKETS)
+MONGO_LATENCY_BUCKETS = parse_buckets(
+    os.getenv('MONGO_LATENCY_BUCKETS'),
+    (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+PROFILE_SLOW_REQUESTS = int(os.getenv('PROFILE_SLOW_REQUESTS', '0'))
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0.1'))
+PROFILE_TOP_FUNCTIONS = int(os.getenv('PROFILE_TOP_FUNCTIONS', '30'))
+
+PHASE_LATENCY = Histogram(
+    'restconf_request_phase_seconds',
+    'Time spent per request in each handler phase (db, build, serialize)',
+    ['endpoint', 'phase'],
+    buckets=PHASE_LATENCY_BUCKETS
+)
+MONGO_COMMAND_LATENCY = Histogram(
+    'mongodb_command_latency_seconds',
+    'MongoDB command round-trip latency reported by the driver',
+    ['command'],
+    buckets=MONGO_LATENCY_BUCKETS
+)
+MONGO_COMMAND_FAILURES = Counter(
+    'mongodb_command_failures_total',
+    'MongoDB commands that returned an error',
+    ['command']
+)
+
+
+class PhaseTimer:
+    """Accumulate wall time per named phase over one request."""
+
+    def __init__(self):
+        self.phases = {}
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def timed_iter(self, name, iterable):
+        """Yield from `iterable`, charging only the time spent fetching items to `name`."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(name, time.perf_counter() - start)
+                return
+            self.add(name, time.perf_counter() - start)
+            yield item
+
+    def observe(self, endpoint):
+        for name, seconds in self.phases.items():
+            PHASE_LATENCY.labels(endpoint=endpoint, phase=name).observe(seconds)
+
+
+class SlowRequestProfiler:
+    """cProfile a sample of requests and keep the `keep` slowest profiles.
+
+    Only one request is profiled at a time, which keeps the overhead
+    bounded and avoids clashing profilers on interpreters where profiling
+    is process-wide. Profiles are rendered to text only when they make
+    the slowest-N list.
+    """
+
+    def __init__(self, keep=PROFILE_SLOW_REQUESTS, sample_rate=PROFILE_SAMPLE_RATE,
+                 top_functions=PROFILE_TOP_FUNCTIONS):
+        self.keep = keep
+        self.sample_rate = sample_rate
+        self.top_functions = top_functions
+        self.sampled = 0
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+        self._heap = []
+        self._sequence = itertools.count()
+
+    @property
+    def enabled(self):
+        return self.keep > 0 and self.sample_rate > 0
+
+    def start(self):
+        """Begin profiling the current request if it is sampled; returns the profile or None."""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        if not self._busy.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            self._busy.release()
+            return None
+        return profile
+
+    def finish(self, profile, duration, details):
+        profile.disable()
+        self._busy.release()
+        with self._lock:
+            self.sampled += 1
+            if len(self._heap) >= self.keep and duration <= self._heap[0][0]:
+                return
+        entry = dict(details, duration_ms=round(duration * 1000, 3),
+                     recorded_at=time.strftime('%Y-%m-%d %H:%M:%S'), profile=self._render(profile))
+        with self._lock:
+            item = (duration, next(self._sequence), entry)
+            if len(self._heap) < self.keep:
+                heapq.heappush(self._heap, item)
+            elif duration > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def discard(self, profile):
+        profile.disable()
+        self._busy.release()
+
+    def slowest(self, include_profile=True):
+        with self._lock:
+            entries = [entry for _, _, entry in sorted(self._heap, reverse=True)]
+        if not include_profile:
+            entries = [{k: v for k, v in entry.items() if k != 'profile'} for entry in entries]
+        return entries
+
+    def reset(self):
+        with self._lock:
+            self._heap = []
+            self.sampled = 0
+
+    def _render(self, profile):
+        out = io.StringIO()
+        stats = pstats.Stats(profile, stream=out)
+        stats.sort_stats('cumulative').print_stats(self.top_functions)
+        return out.getvalue()
+
@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from coordination import COLLECTOR_STATE_DIR
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_RETENTION = int(os.getenv('JOB_RETENTION', '100'))
+
+
+class Job:
+    """State of one background operation, updated by the function running it."""
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = {}
+        self.result = None
+        self.error = None
+
+    def to_dict(self, include_result=True):
+        state = {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'progress': dict(self.progress),
+            'error': self.error,
+        }
+        if include_result:
+            state['result'] = self.result
+        return state
+
+
+class JobRegistry:
+    """Run long operations on a small thread pool and keep their state for polling.
+
+    Finished jobs are kept up to `retention`, oldest first out. When a
+    shared state dir is configured (multi-worker deployments), job state
+    is also written there so any worker can answer a poll.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, retention=JOB_RETENTION, state_dir=COLLECTOR_STATE_DIR):
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._state_dir = os.path.join(state_dir, 'jobs') if state_dir else None
+
+    def start(self):
+        """Create the shared state dir; kept out of __init__ so importing the app writes nothing."""
+        if self._state_dir:
+            os.makedirs(self._state_dir, exist_ok=True)
+
+    def submit(self, kind, target):
+        """Schedule `target(job)`; its return value becomes the job result."""
+        job = Job(kind)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict()
+        self._publish(job)
+        self._executor.submit(self._run, job, target)
+        return job
+
+    def update(self, job, **progress):
+        job.progress.update(progress)
+        self._publish(job, include_result=False)
+
+    def get(self, job_id):
+        """Job state as a dict, from this process or the shared state dir; None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self._state_dir and all(c in '0123456789abcdef' for c in job_id):
+            try:
+                with open(os.path.join(self._state_dir, f'{job_id}.json'), encoding='utf-8') as handle:
+                    return json.load(handle)
+            except (FileNotFoundError, ValueError):
+                return None
+        return None
+
+    def list(self):
+        with self._lock:
+            return [job.to_dict(include_result=False) for job in reversed(self._jobs.values())]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job, target):
+        job.status = 'running'
+        job.started_at = time.time()
+        self._publish(job, include_result=False)
+        try:
+            job.result = target(job)
+            job.status = 'completed'
+        except Exception as exc:
+            print(f"Job {job.id} ({job.kind}) failed: {exc}")
+            job.error = str(exc)
+            job.status = 'failed'
+        job.finished_at = time.time()
+        self._publish(job)
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(self._jobs) - self.retention)]:
+            del self._jobs[job_id]
+            if self._state_dir:
+                try:
+                    os.remove(os.path.join(self._state_dir, f'{job_id}.json'))
+                except FileNotFoundError:
+                    pass
+
+    def _publish(self, job, include_result=True):
+        if not self._state_dir:
+            return
+        path = os.path.join(self._state_dir, f'{job.id}.json')
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            json.dump(job.to_dict(include_result), handle, separators=(',', ':'))
+        os.replace(tmp_path, path)
@@ -0,0 +1,174 @@
+import os
+import re
+from collections import OrderedDict
+
+from export_formats import MissingDependencyError
+
+KEY_CIPHER_CACHE_SIZE = int(os.getenv('KEY_CIPHER_CACHE_SIZE', '1024'))
+
+_HEX128 = re.compile(r'[0-9a-fA-F]{32}')
+_HEX16 = re.compile(r'[0-9a-fA-F]{4}')
+_FIELDS = (('k', _HEX128, 32), ('opc', _HEX128, 32), ('amf', _HEX16, 4))
+_SECRETS = ('k', 'opc', 'op')
+
+# cryptography (OpenSSL bindings) is only needed to derive OPc, so it is loaded on first use
+_primitives = None
+
+
+def _aes():
+    """(Cipher, algorithms, modes) from cryptography, or None when it is not installed."""
+    global _primitives
+    if _primitives is None:
+        try:
+            from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+            _primitives = (Cipher, algorithms, modes)
+        except ImportError:  # OPc derivation is optional
+            _primitives = ()
+    return _primitives or None
+
+
+def parse_op(value):
+    """Validate a batch-wide OP (32 hex digits); returns bytes or None when unset."""
+    if value is None or not str(value).strip():
+        return None
+    value = str(value).strip()
+    if not _HEX128.fullmatch(value):
+        raise ValueError('op must be 32 hex digits')
+    if _aes() is None:
+        raise MissingDependencyError('OPc derivation from OP requires the cryptography package')
+    return bytes.fromhex(value)
+
+
+def _supplied(entry, field):
+    """Value of `field` given in a flat row or under `security` of a full document."""
+    value = entry.get(field)
+    if value is None and isinstance(entry.get('security'), dict):
+        value = entry['security'].get(field)
+    value = str(value).strip() if value is not None else ''
+    return value or None
+
+
+def redact(entry):
+    """Copy of a raw entry without K, OPc and OP, safe to echo in error reports and job state."""
+    entry = {key: value for key, value in entry.items() if key not in _SECRETS}
+    if isinstance(entry.get('security'), dict):
+        entry['security'] = {key: value for key, value in entry['security'].items() if key not in _SECRETS}
+    return entry
+
+
+class KeyMaterialStage:
+    """Validate and complete subscriber key material for one provisioning batch.
+
+    `prepare()` runs per chunk and, before anything is written:
+    - derives OPc = AES-128_K(OP) XOR OP for rows that carry an OP (per row
+      or batch-wide) but no OPc;
+    - checks K/OPc (32 hex digits) and AMF (4 hex digits);
+    - rejects rows whose IMSI or MSISDN already appeared earlier in the batch.
+
+    The AES key schedule depends on K, not OP, so ciphers are cached per K
+    and every OP block for the same K goes through one ECB call. Operator
+    batches share one OP but have a distinct K per subscriber, so most rows
+    still need their own key schedule.
+    """
+
+    def __init__(self, op=None, cache_size=KEY_CIPHER_CACHE_SIZE):
+        self.op = op
+        self.cache_size = cache_size
+        self._ciphers = OrderedDict()
+        self._imsis = {}
+        self._msisdns = {}
+
+    def prepare(self, entries, build, first_row=1):
+        """Build and check a chunk of raw entries.
+
+        Returns (docs, rejected) where `rejected` is a list of
+        (row_number, entry, message) tuples; rejected entries are
+        redacted of key material.
+        """
+        built = []
+        rejected = []
+        derive = []
+        for offset, entry in enumerate(entries):
+            row = first_row + offset
+            entry = entry or {}
+            op = _supplied(entry, 'op')
+            try:
+                if op is not None and not _HEX128.fullmatch(op):
+                    raise ValueError('op must be 32 hex digits')
+                doc = build(entry)
+            except ValueError as exc:
+                rejected.append((row, redact(entry), str(exc)))
+                continue
+            if _supplied(entry, 'opc') is None and (op is not None or self.op is not None):
+                k = doc.setdefault('security', {}).get('k') or ''
+                derive.append((len(built), str(k), bytes.fromhex(op) if op else self.op))
+            built.append((row, entry, doc))
+
+        failed = self._derive(built, derive)
+
+        docs = []
+        for index, (row, entry, doc) in enumerate(built):
+            message = failed.get(index) or self._check(doc, row)
+            if message:
+                rejected.append((row, redact(entry), message))
+                continue
+            docs.append(doc)
+        rejected.sort(key=lambda item: item[0])
+        return docs, rejected
+
+    def _derive(self, built, derive):
+        """Fill in derived OPc values in place; returns {index: error} for rows that failed."""
+        failed = {}
+        if not derive:
+            return failed
+        if _aes() is None:
+            for index, _, _ in derive:
+                failed[index] = 'OPc derivation from OP requires the cryptography package'
+            return failed
+
+        by_key = {}
+        for index, k, op in derive:
+            if not _HEX128.fullmatch(k):
+                failed[index] = 'k must be 32 hex digits'
+                continue
+            by_key.setdefault(k.lower(), []).append((index, op))
+        for k, rows in by_key.items():
+            # ECB encrypts each 16-byte block independently, so one call covers every OP for this K.
+            encrypted = self._cipher(k).update(b''.join(op for _, op in rows))
+            for position, (index, op) in enumerate(rows):
+                block = encrypted[position * 16:(position + 1) * 16]
+                opc = (int.from_bytes(block, 'big') ^ int.from_bytes(op, 'big')).to_bytes(16, 'big')
+                built[index][2]['security']['opc'] = opc.hex()
+        return failed
+
+    def _cipher(self, k):
+        encryptor = self._ciphers.get(k)
+        if encryptor is not None:
+            self._ciphers.move_to_end(k)
+            return encryptor
+        # An ECB encryptor has no chaining state, so it can be reused for later chunks.
+        Cipher, algorithms, modes = _aes()
+        encryptor = Cipher(algorithms.AES(bytes.fromhex(k)), modes.ECB()).encryptor()
+        self._ciphers[k] = encryptor
+        if len(self._ciphers) > self.cache_size:
+            self._ciphers.popitem(last=False)
+        return encryptor
+
+    def _check(self, doc, row):
+        security = doc.get('security') or {}
+        for field, pattern, digits in _FIELDS:
+            value = security.get(field)
+            if not isinstance(value, str) or not pattern.fullmatch(value):
+                return f'{field} must be {digits} hex digits'
+
+        imsi = doc['imsi']
+        first = self._imsis.setdefault(imsi, row)
+        if first != row:
+            return f'duplicate IMSI {imsi} in batch (first at row {first})'
+        msisdn = doc.get('msisdn')
+        if msisdn:
+            first = self._msisdns.setdefault(msisdn, row)
+            if first != row:
+                del self._imsis[imsi]
+                return f'duplicate MSISDN {msisdn} in batch (first at row {first})'
+        return None
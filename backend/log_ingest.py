@@ -0,0 +1,326 @@
+import heapq
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+LOG_FILES = os.getenv(
+    'LOG_FILES',
+    'amf=/var/log/open5gs/amf.log,smf=/var/log/open5gs/smf.log,upf=/var/log/open5gs/upf.log'
+)
+LOG_STORE_MAX_BYTES = int(os.getenv('LOG_STORE_MAX_BYTES', str(16 * 1024 * 1024)))
+LOG_BACKFILL_BYTES = int(os.getenv('LOG_BACKFILL_BYTES', str(256 * 1024)))
+LOG_POLL_INTERVAL = float(os.getenv('LOG_POLL_INTERVAL', '1.0'))
+LOG_READ_BYTES = 1024 * 1024
+LOG_MAX_LINE_BYTES = 8192
+LOG_QUERY_MAX_LIMIT = 1000
+
+LEVELS = ('TRACE', 'DEBUG', 'INFO', 'WARNING', 'ERROR', 'FATAL')
+_SEVERITY = {name: rank for rank, name in enumerate(LEVELS)}
+_SEVERITY['WARN'] = _SEVERITY['WARNING']
+
+# Open5GS format: "10/17 14:32:15.123: [gmm] INFO: UE registration complete (../src/amf/gmm-sm.c:1234)"
+_LINE = re.compile(r'(\d\d)/(\d\d) (\d\d):(\d\d):(\d\d)(\.\d+)?: \[([^\]]*)\] (\w+): (.*)')
+_DURATION = re.compile(r'(\d+(?:\.\d+)?)([smhd])')
+_DURATION_SECONDS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Approximate per-entry overhead on top of the message text: tuple, float, ints and two deque slots
+_ENTRY_OVERHEAD = 150
+
+
+def parse_log_files(value):
+    """Parse 'nf=path,nf=path' into {nf: path}."""
+    files = {}
+    for part in (value or '').split(','):
+        if '=' not in part:
+            continue
+        nf, path = part.split('=', 1)
+        if nf.strip() and path.strip():
+            files[nf.strip().lower()] = path.strip()
+    return files
+
+
+def parse_level(value):
+    """Minimum severity rank for a ?level= value; None when unset."""
+    if not value:
+        return None
+    rank = _SEVERITY.get(value.strip().upper())
+    if rank is None:
+        raise ValueError(f"Unknown level '{value}' (use {', '.join(LEVELS)})")
+    return rank
+
+
+def parse_since(value, now=None):
+    """Epoch seconds for ?since=: epoch seconds, a duration like 15m, or ISO 8601."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    match = _DURATION.fullmatch(value)
+    if match:
+        return (now or time.time()) - float(match.group(1)) * _DURATION_SECONDS[match.group(2)]
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        raise ValueError('since must be epoch seconds, a duration such as 15m, or ISO 8601')
+
+
+def _timestamp(month, day, hour, minute, second, fraction, now):
+    # Open5GS logs local time without a year; a date in the future belongs to last year.
+    current = time.localtime(now)
+    year = current.tm_year
+    ts = time.mktime((year, month, day, hour, minute, second, 0, 0, -1))
+    if ts > now + 86400:
+        ts = time.mktime((year - 1, month, day, hour, minute, second, 0, 0, -1))
+    return ts + (float(fraction) if fraction else 0.0)
+
+
+class LogStore:
+    """Bounded in-memory log store indexed by NF and level.
+
+    Entries are compact tuples (seq, ts, nf, level, component, message)
+    kept in ingestion order. Each (nf, level) pair has its own deque of
+    the same tuples, so a filtered query only walks matching entries,
+    newest first, and stops at `since`. The oldest entries are evicted
+    once the estimated size passes `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=LOG_STORE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._entries = deque()
+        self._index = {}
+        self._seq = 0
+
+    def add(self, entries):
+        """Append (ts, nf, level, component, message) tuples; returns the stored entries."""
+        stored = []
+        with self._lock:
+            for ts, nf, level, component, message in entries:
+                self._seq += 1
+                entry = (self._seq, ts, sys.intern(nf), level, sys.intern(component), message)
+                self._entries.append(entry)
+                self._index.setdefault((entry[2], level), deque()).append(entry)
+                self.bytes += len(message) + _ENTRY_OVERHEAD
+                stored.append(entry)
+            while self.bytes > self.max_bytes and self._entries:
+                oldest = self._entries.popleft()
+                self._index[(oldest[2], oldest[3])].popleft()
+                self.bytes -= len(oldest[5]) + _ENTRY_OVERHEAD
+                self.evicted += 1
+        return stored
+
+    def query(self, nf=None, min_level=None, since=None, q=None, limit=100):
+        """Newest-first entries matching every given filter (q is a case-insensitive substring)."""
+        nfs = {name.strip().lower() for name in nf.split(',')} if nf else None
+        needle = q.lower() if q else None
+        with self._lock:
+            keys = [
+                key for key in self._index
+                if (nfs is None or key[0] in nfs) and (min_level is None or key[1] >= min_level)
+            ]
+            newest_first = heapq.merge(*(reversed(self._index[key]) for key in keys),
+                                       key=lambda entry: entry[0], reverse=True)
+            # Timestamps only move forward within one NF's file, so once an NF drops
+            # below `since` none of its older entries can match.
+            remaining = {key[0] for key in keys}
+            results = []
+            for entry in newest_first:
+                if since is not None and entry[1] < since:
+                    remaining.discard(entry[2])
+                    if not remaining:
+                        break
+                    continue
+                if needle is not None and needle not in entry[5].lower() and needle not in entry[4]:
+                    continue
+                results.append(entry)
+                if len(results) >= limit:
+                    break
+        return [to_dict(entry) for entry in results]
+
+    def recent(self, limit=100):
+        return self.query(limit=limit)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'evicted': self.evicted,
+            }
+
+
+def to_dict(entry):
+    seq, ts, nf, level, component, message = entry
+    return {
+        'seq': seq,
+        'ts': round(ts, 3),
+        'time': time.strftime('%H:%M:%S', time.localtime(ts)),
+        'level': LEVELS[level],
+        'nf': nf.upper(),
+        'component': component,
+        'message': message,
+    }
+
+
+class _TailedFile:
+    """Read position in one log file, tracked by inode so rotation and truncation are noticed."""
+
+    def __init__(self, nf, path):
+        self.nf = nf
+        self.path = path
+        self.handle = None
+        self.inode = None
+        self.offset = 0
+        self.partial = b''
+        self.last_ts = None
+        self.last_level = _SEVERITY['INFO']
+
+    def open(self, backfill=None):
+        """Open the file at the last `backfill` bytes, or at the start when backfill is None."""
+        try:
+            handle = open(self.path, 'rb')
+        except OSError:
+            return False
+        info = os.fstat(handle.fileno())
+        self.handle, self.inode, self.partial = handle, info.st_ino, b''
+        self.offset = 0 if backfill is None else max(0, info.st_size - backfill)
+        handle.seek(self.offset)
+        if self.offset:
+            # Start on a line boundary
+            self.offset += len(handle.readline())
+        return True
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+        self.handle = None
+
+    def read(self):
+        """Complete lines appended since the last read."""
+        data = self.handle.read(LOG_READ_BYTES)
+        if not data:
+            return []
+        self.offset += len(data)
+        data = self.partial + data
+        lines = data.split(b'\n')
+        self.partial = lines.pop()
+        if len(self.partial) > LOG_MAX_LINE_BYTES:
+            lines.append(self.partial)
+            self.partial = b''
+        return lines
+
+
+class LogTailer:
+    """Follow Open5GS log files and feed parsed lines into a LogStore.
+
+    Each file is read from its current (inode, offset). When the path
+    points at a new inode (logrotate) the old file is drained before the
+    new one is read from the start; a file that shrinks below the offset
+    (copytruncate) is re-read from the start. On first open only the last
+    LOG_BACKFILL_BYTES are loaded. New entries are handed to `on_entries`.
+    """
+
+    def __init__(self, store, files=None, on_entries=None, interval=LOG_POLL_INTERVAL,
+                 backfill=LOG_BACKFILL_BYTES):
+        self.store = store
+        self.interval = interval
+        self.backfill = backfill
+        self.on_entries = on_entries
+        self._files = [_TailedFile(nf, path) for nf, path in (files or parse_log_files(LOG_FILES)).items()]
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def sources(self):
+        return {tailed.nf: {'path': tailed.path, 'inode': tailed.inode, 'offset': tailed.offset}
+                for tailed in self._files}
+
+    def start(self):
+        if not self._files:
+            return
+        self._thread = threading.Thread(target=self._run, name='log-tailer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        for tailed in self._files:
+            tailed.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"⚠ Log tailing failed: {e}")
+            self._stop.wait(self.interval)
+
+    def poll(self):
+        """Read every file once; returns the number of new entries."""
+        added = 0
+        for tailed in self._files:
+            added += self._poll_file(tailed)
+        return added
+
+    def _poll_file(self, tailed):
+        if tailed.handle is None and not tailed.open(self.backfill):
+            return 0
+        lines = []
+        try:
+            info = os.stat(tailed.path)
+        except OSError:
+            info = None
+        if info is not None and info.st_ino != tailed.inode:
+            lines.extend(self._drain(tailed))
+            tailed.close()
+            tailed.open()
+        elif info is not None and info.st_size < tailed.offset:
+            tailed.handle.seek(0)
+            tailed.offset = 0
+            tailed.partial = b''
+        if tailed.handle is not None:
+            lines.extend(self._drain(tailed))
+        if not lines:
+            return 0
+        stored = self.store.add(self._parse(tailed, lines))
+        if self.on_entries is not None and stored:
+            self.on_entries(stored)
+        return len(stored)
+
+    def _drain(self, tailed):
+        lines = []
+        while True:
+            chunk = tailed.read()
+            if not chunk:
+                return lines
+            lines.extend(chunk)
+
+    def _parse(self, tailed, lines):
+        now = time.time()
+        entries = []
+        for raw in lines:
+            line = raw.decode('utf-8', 'replace').rstrip('\r')
+            if not line.strip():
+                continue
+            match = _LINE.fullmatch(line)
+            if match is None:
+                # Continuation lines (banners, multi-line dumps) inherit the previous line's time and level
+                entries.append((tailed.last_ts or now, tailed.nf, tailed.last_level, '', line))
+                continue
+            month, day, hour, minute, second, fraction, component, level, message = match.groups()
+            ts = _timestamp(int(month), int(day), int(hour), int(minute), int(second), fraction, now)
+            rank = _SEVERITY.get(level.upper(), _SEVERITY['INFO'])
+            tailed.last_ts, tailed.last_level = ts, rank
+            entries.append((ts, tailed.nf, rank, component, message))
+        return entries
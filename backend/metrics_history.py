@@ -0,0 +1,223 @@
+import math
+import os
+import threading
+import time
+from array import array
+
+RAW_POINTS = int(os.getenv('METRICS_HISTORY_RAW_POINTS', '1800'))        # 1h of 2s samples
+MINUTE_POINTS = int(os.getenv('METRICS_HISTORY_MINUTE_POINTS', '1440'))  # 24h of 1m rollups
+HOUR_POINTS = int(os.getenv('METRICS_HISTORY_HOUR_POINTS', '720'))       # 30d of 1h rollups
+
+TIER_SECONDS = {'raw': 0, 'minute': 60, 'hour': 3600}
+
+
+class _Ring:
+    """Fixed-capacity ring of timestamped min/max/sum/count rows stored in flat arrays."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.ts = array('d', bytes(8 * capacity))
+        self.min = array('d', bytes(8 * capacity))
+        self.max = array('d', bytes(8 * capacity))
+        self.sum = array('d', bytes(8 * capacity))
+        self.count = array('l', bytes(array('l').itemsize * capacity))
+        self.start = 0
+        self.size = 0
+
+    def append(self, ts, lo, hi, total, count):
+        if self.size < self.capacity:
+            index = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            index = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.ts[index] = ts
+        self.min[index] = lo
+        self.max[index] = hi
+        self.sum[index] = total
+        self.count[index] = count
+
+    def oldest(self):
+        return self.ts[self.start] if self.size else None
+
+    def _ts_at(self, offset):
+        return self.ts[(self.start + offset) % self.capacity]
+
+    def _lower_bound(self, ts):
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._ts_at(mid) < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def rows(self, t_from, t_to):
+        """Yield (ts, min, max, sum, count) with t_from <= ts <= t_to in O(log n + k)."""
+        for offset in range(self._lower_bound(t_from), self.size):
+            index = (self.start + offset) % self.capacity
+            ts = self.ts[index]
+            if ts > t_to:
+                break
+            yield ts, self.min[index], self.max[index], self.sum[index], self.count[index]
+
+
+class _Rollup:
+    __slots__ = ('bucket', 'lo', 'hi', 'total', 'count')
+
+    def __init__(self):
+        self.bucket = None
+
+    def add(self, bucket, lo, hi, total, count):
+        if self.bucket != bucket:
+            self.bucket, self.lo, self.hi, self.total, self.count = bucket, lo, hi, total, count
+        else:
+            self.lo = min(self.lo, lo)
+            self.hi = max(self.hi, hi)
+            self.total += total
+            self.count += count
+
+
+class MetricSeries:
+    """Raw samples plus 1-minute and 1-hour min/max/avg tiers for one metric."""
+
+    def __init__(self, raw_points=RAW_POINTS, minute_points=MINUTE_POINTS, hour_points=HOUR_POINTS):
+        self.tiers = {
+            'raw': _Ring(raw_points),
+            'minute': _Ring(minute_points),
+            'hour': _Ring(hour_points),
+        }
+        self._minute = _Rollup()
+        self._hour = _Rollup()
+
+    def add(self, ts, value):
+        self.tiers['raw'].append(ts, value, value, value, 1)
+        self._roll(self._minute, 'minute', ts, value, value, value, 1)
+
+    def _roll(self, rollup, tier, ts, lo, hi, total, count):
+        bucket = math.floor(ts / TIER_SECONDS[tier]) * TIER_SECONDS[tier]
+        if rollup.bucket is not None and rollup.bucket != bucket:
+            # The previous bucket is complete: persist it and feed the next tier.
+            closed = (rollup.bucket, rollup.lo, rollup.hi, rollup.total, rollup.count)
+            self.tiers[tier].append(*closed)
+            if tier == 'minute':
+                self._roll(self._hour, 'hour', *closed)
+        rollup.add(bucket, lo, hi, total, count)
+
+    def pending(self, tier):
+        """Rows of `tier` not yet in its ring, oldest first; the last one is the open bucket."""
+        minute = self._minute
+        if tier == 'raw' or minute.bucket is None:
+            return []
+        open_minute = (minute.bucket, minute.lo, minute.hi, minute.total, minute.count)
+        if tier == 'minute':
+            return [open_minute]
+        hour, bucket = self._hour, math.floor(minute.bucket / 3600) * 3600
+        if hour.bucket is None:
+            return [(bucket,) + open_minute[1:]]
+        held = (hour.bucket, hour.lo, hour.hi, hour.total, hour.count)
+        if hour.bucket != bucket:
+            # The held hour is complete; it is persisted when the open minute closes.
+            return [held, (bucket,) + open_minute[1:]]
+        return [(bucket, min(hour.lo, minute.lo), max(hour.hi, minute.hi),
+                 hour.total + minute.total, hour.count + minute.count)]
+
+
+class MetricsHistory:
+    """Bounded in-memory history of every numeric NF metric in the metrics cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def record(self, metrics, ts=None):
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            for nf, values in metrics.items():
+                for name, value in values.items():
+                    if isinstance(value, bool) or not isinstance(value, (int, float)):
+                        continue
+                    series = self._series.get((nf, name))
+                    if series is None:
+                        series = self._series[(nf, name)] = MetricSeries()
+                    series.add(ts, float(value))
+
+    def available(self):
+        with self._lock:
+            return sorted(f'{nf}.{name}' for nf, name in self._series)
+
+    def iter_rows(self, tier=None):
+        """Yield every stored point as a dict, one series and tier at a time."""
+        tiers = (tier,) if tier else tuple(TIER_SECONDS)
+        with self._lock:
+            copied = [
+                (nf, name, t, list(series.tiers[t].rows(float('-inf'), float('inf'))))
+                for (nf, name), series in sorted(self._series.items())
+                for t in tiers
+            ]
+        for nf, name, t, rows in copied:
+            for ts, lo, hi, total, count in rows:
+                yield {
+                    'nf': nf, 'metric': name, 'tier': t, 'ts': ts,
+                    'avg': total / count, 'min': lo, 'max': hi, 'count': count,
+                }
+
+    def query(self, nf, metric, t_from, t_to, step=None):
+        """Return points [ts, avg, min, max] for the range, downsampled to `step` seconds.
+
+        The finest tier that still covers `t_from` (and is not finer than
+        `step`) is used. Minute and hour tiers include the still-open bucket
+        as the last point, in which case `partial` is true. Returns None for
+        an unknown series.
+        """
+        with self._lock:
+            series = self._series.get((nf, metric))
+            if series is None:
+                return None
+            tier = self._pick_tier(series, t_from, step)
+            rows = list(series.tiers[tier].rows(t_from, t_to))
+            pending = series.pending(tier)
+            rows.extend(row for row in pending if t_from <= row[0] <= t_to)
+            partial = bool(rows) and bool(pending) and rows[-1] is pending[-1]
+
+        if not step or step <= TIER_SECONDS[tier]:
+            points = [[ts, total / count, lo, hi] for ts, lo, hi, total, count in rows]
+        else:
+            points = []
+            current = None
+            for ts, lo, hi, total, count in rows:
+                bucket = math.floor(ts / step) * step
+                if current is None or current[0] != bucket:
+                    current = [bucket, lo, hi, total, count]
+                    points.append(current)
+                else:
+                    current[1] = min(current[1], lo)
+                    current[2] = max(current[2], hi)
+                    current[3] += total
+                    current[4] += count
+            points = [[bucket, total / count, lo, hi] for bucket, lo, hi, total, count in points]
+        return {'tier': tier, 'step': step or TIER_SECONDS[tier] or None, 'points': points, 'partial': partial}
+
+    @staticmethod
+    def _pick_tier(series, t_from, step):
+        if step and step >= TIER_SECONDS['hour']:
+            candidates = ('hour',)
+        elif step and step >= TIER_SECONDS['minute']:
+            candidates = ('minute', 'hour')
+        else:
+            candidates = ('raw', 'minute', 'hour')
+
+        def oldest(tier):
+            pending = series.pending(tier)
+            return series.tiers[tier].oldest() if series.tiers[tier].size else pending[0][0] if pending else None
+
+        for tier in candidates:
+            first = oldest(tier)
+            if first is not None and first <= t_from:
+                return tier
+        # Nothing reaches back to t_from: use whichever tier has the oldest data.
+        populated = [t for t in ('raw', 'minute', 'hour') if oldest(t) is not None]
+        if not populated:
+            return candidates[0]
+        return min(populated, key=oldest)
@@ -0,0 +1,27 @@
+from pymongo import MongoClient, monitoring
+
+from instrumentation import MONGO_COMMAND_FAILURES, MONGO_COMMAND_LATENCY
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Feed driver-reported command latency into Prometheus."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_LATENCY.labels(command=event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_COMMAND_LATENCY.labels(command=event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.labels(command=event.command_name).inc()
+
+
+def open_client(uri, **options):
+    """MongoClient for `uri` reporting command latency to Prometheus.
+
+    This is the only module that imports pymongo at import time; the rest
+    of the backend imports it on first use so startup and CLI tools do not
+    load the driver when no database is involved.
+    """
+    return MongoClient(uri, event_listeners=[MongoCommandMetrics()], **options)
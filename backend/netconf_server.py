@@ -1,57 +1,561 @@
-import socket
+import asyncio
+import itertools
+import os
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from lxml import etree
-from prometheus_client import Counter
+from prometheus_client import Counter, Gauge, Histogram
+
+BASE_NS = 'urn:ietf:params:xml:ns:netconf:base:1.0'
+OPEN5GS_NS = 'urn:open5gs:params:xml:ns:yang:open5gs'
+CAP_BASE_10 = 'urn:ietf:params:netconf:base:1.0'
+CAP_BASE_11 = 'urn:ietf:params:netconf:base:1.1'
+EOM = b']]>]]>'
+MAX_CHUNK_SIZE = 4294967295
+
+NETCONF_MAX_SESSIONS = int(os.getenv('NETCONF_MAX_SESSIONS', '500'))
+NETCONF_MAX_MESSAGE_BYTES = int(os.getenv('NETCONF_MAX_MESSAGE_BYTES', str(16 * 1024 * 1024)))
+NETCONF_RPC_WORKERS = int(os.getenv('NETCONF_RPC_WORKERS', '8'))
+NETCONF_IDLE_TIMEOUT_SECONDS = float(os.getenv('NETCONF_IDLE_TIMEOUT_SECONDS', '600'))
 
 NETCONF_SESSIONS = Counter('netconf_sessions_total', 'Total NETCONF sessions accepted')
+NETCONF_ACTIVE_SESSIONS = Gauge('netconf_active_sessions', 'Open NETCONF sessions', multiprocess_mode='livesum')
+NETCONF_REJECTED_SESSIONS = Counter('netconf_rejected_sessions_total', 'Sessions refused at the session limit')
+NETCONF_RPC_LATENCY = Histogram('netconf_rpc_latency_seconds', 'NETCONF RPC latency', ['operation'])
+NETCONF_RPC_ERRORS = Counter('netconf_rpc_errors_total', 'NETCONF RPCs answered with rpc-error', ['operation'])
+
+
+class FramingError(Exception):
+    pass
+
+
+class RpcError(Exception):
+    def __init__(self, tag, message, error_type='application'):
+        super().__init__(message)
+        self.tag = tag
+        self.error_type = error_type
+
+
+class MessageFramer:
+    """Incremental NETCONF framing parser.
+
+    Starts in base:1.0 end-of-message mode (`]]>]]>`) and switches to
+    base:1.1 chunked framing once both peers advertised it. `feed()`
+    yields ('data', bytes) events as message content arrives and
+    ('end', None) at each message boundary, so callers can parse XML
+    without buffering whole messages.
+    """
+
+    def __init__(self):
+        self.chunked = False
+        self._buffer = b''
+        self._remaining = 0
+
+    def feed(self, data):
+        self._buffer += data
+        while self._buffer:
+            if self.chunked:
+                event = self._next_chunked()
+            else:
+                event = self._next_eom()
+            if event is None:
+                break
+            yield event
+
+    def _next_eom(self):
+        buffer = self._buffer
+        index = buffer.find(EOM)
+        if index == 0:
+            self._buffer = buffer[len(EOM):]
+            return ('end', None)
+        if index > 0:
+            self._buffer = buffer[index:]
+            return ('data', buffer[:index])
+        # Hold back a possible partial delimiter at the end of the buffer.
+        keep = len(EOM) - 1
+        if len(buffer) <= keep:
+            return None
+        self._buffer = buffer[-keep:]
+        return ('data', buffer[:-keep])
+
+    def _next_chunked(self):
+        buffer = self._buffer
+        if self._remaining:
+            data = buffer[:self._remaining]
+            self._remaining -= len(data)
+            self._buffer = buffer[len(data):]
+            return ('data', data)
+        if len(buffer) < 4:
+            return None
+        if not buffer.startswith(b'\n#'):
+            raise FramingError('expected chunk header')
+        if buffer[2:4] == b'#\n':
+            self._buffer = buffer[4:]
+            return ('end', None)
+        newline = buffer.find(b'\n', 2)
+        if newline < 0:
+            if len(buffer) > 13:
+                raise FramingError('chunk size too long')
+            return None
+        size = buffer[2:newline]
+        if not size.isdigit() or size.startswith(b'0') or int(size) > MAX_CHUNK_SIZE:
+            raise FramingError('invalid chunk size')
+        self._remaining = int(size)
+        self._buffer = buffer[newline + 1:]
+        return self._next_chunked() if self._buffer else None
+
+
+def encode_message(body, chunked):
+    if chunked:
+        return b'\n#%d\n' % len(body) + body + b'\n##\n'
+    return body + EOM
+
+
+def _local(tag):
+    return etree.QName(tag).localname if isinstance(tag, str) else None
+
+
+def _append_value(parent, name, value, namespace=OPEN5GS_NS):
+    """Serialize a JSON-style value as child elements (lists become repeated elements)."""
+    if isinstance(value, list):
+        for item in value:
+            _append_value(parent, name, item, namespace)
+    elif isinstance(value, dict):
+        element = etree.SubElement(parent, f'{{{namespace}}}{name}')
+        for key, child in value.items():
+            _append_value(element, key, child, namespace)
+    else:
+        element = etree.SubElement(parent, f'{{{namespace}}}{name}')
+        element.text = 'true' if value is True else 'false' if value is False else str(value)
+
+
+# Subscriber lists and the leaf that identifies an entry in each, so a merge
+# updates the matching entry instead of appending a duplicate
+_LIST_KEYS = {'slice': 'sst', 'session': 'name'}
+_INTEGER_LEAVES = {'sst', 'index', 'priority', 'pre_emption_capability', 'pre_emption_vulnerability',
+                   'schema_version', 'subscriber_status', 'network_access_mode'}
+_BOOLEAN_LEAVES = {'default_indicator'}
+# Flat build_subscriber_document leaves that live under `security` in the stored document
+_SECURITY_LEAVES = ('k', 'opc', 'amf')
+
+
+def _element_value(element):
+    """Parse a config element into the JSON shape of a stored subscriber (the inverse of _append_value)."""
+    if not len(element):
+        name = _local(element.tag)
+        text = (element.text or '').strip()
+        if name in _BOOLEAN_LEAVES:
+            return text == 'true'
+        if name in _INTEGER_LEAVES:
+            try:
+                return int(text)
+            except ValueError:
+                raise RpcError('invalid-value', f'{name} must be an integer')
+        return text
+    value = {}
+    for child in element:
+        name = _local(child.tag)
+        if name is None:
+            continue
+        item = _element_value(child)
+        if name in _LIST_KEYS:
+            value.setdefault(name, []).append(item)
+        elif name in value:
+            if not isinstance(value[name], list):
+                value[name] = [value[name]]
+            value[name].append(item)
+        else:
+            value[name] = item
+    return value
+
+
+def _subscriber_input(element):
+    """Parse a <subscriber> config element, keeping its security/slice/session nesting."""
+    data = _element_value(element)
+    return data if isinstance(data, dict) else {}
+
+
+def _merge_value(current, supplied):
+    """`supplied` applied leaf by leaf onto `current`; list entries are matched by their key leaf."""
+    if isinstance(current, dict) and isinstance(supplied, dict):
+        merged = dict(current)
+        for key, value in supplied.items():
+            if key in _LIST_KEYS and isinstance(merged.get(key), list) and isinstance(value, list):
+                merged[key] = _merge_list(merged[key], value, _LIST_KEYS[key])
+            else:
+                merged[key] = _merge_value(merged.get(key), value)
+        return merged
+    return supplied
+
+
+def _merge_list(current, supplied, key):
+    merged = list(current)
+    for item in supplied:
+        for index, existing in enumerate(merged):
+            if isinstance(existing, dict) and isinstance(item, dict) and existing.get(key) == item.get(key):
+                merged[index] = _merge_value(existing, item)
+                break
+        else:
+            merged.append(item)
+    return merged
+
+
+def _merge_paths(current, supplied, prefix=''):
+    """$set paths that merge `supplied` into `current`.
+
+    Nested containers become dotted paths so untouched sibling leaves
+    are never rewritten; a list that changes is set as a whole, merged
+    entry by entry with the existing one.
+    """
+    paths = {}
+    for key, value in supplied.items():
+        path = prefix + key
+        existing = current.get(key) if isinstance(current, dict) else None
+        if isinstance(value, dict) and isinstance(existing, dict):
+            paths.update(_merge_paths(existing, value, path + '.'))
+        elif key in _LIST_KEYS and isinstance(existing, list) and isinstance(value, list):
+            paths[path] = _merge_list(existing, value, _LIST_KEYS[key])
+        else:
+            paths[path] = value
+    return paths
+
+
+class _Session:
+    __slots__ = ('session_id', 'writer', 'chunked')
+
+    def __init__(self, session_id, writer):
+        self.session_id = session_id
+        self.writer = writer
+        self.chunked = False
+
 
 class NetconfServer:
+    """Asyncio NETCONF server (RFC 6241) over plain TCP.
+
+    Sessions share one event loop; RPC handlers that touch the subscriber
+    store run on a small thread pool so blocking MongoDB calls never stall
+    other sessions. `subscriber_store` is the same store the RESTCONF
+    routes use and `metrics_provider` returns the current NF metrics.
+    """
 
-    
-    def __init__(self, port=830):
+    def __init__(self, port=830, host='0.0.0.0', subscriber_store=None, metrics_provider=None,
+                 document_builder=None, max_sessions=NETCONF_MAX_SESSIONS):
         self.port = port
+        self.host = host
+        self.subscriber_store = subscriber_store
+        self.metrics_provider = metrics_provider or dict
+        self.document_builder = document_builder
+        self.max_sessions = max_sessions
         self.running = False
-        
+        self._session_ids = itertools.count(1)
+        self._sessions = {}
+        self._executor = ThreadPoolExecutor(max_workers=NETCONF_RPC_WORKERS, thread_name_prefix='netconf-rpc')
+        self._loop = None
+        self._server = None
+
     def start(self):
-        """Start NETCONF SSH server"""
+        """Start NETCONF server on a background event loop"""
         self.running = True
-        server_thread = threading.Thread(target=self._run_server, daemon=True)
+        server_thread = threading.Thread(target=self._run_server, name='netconf-server', daemon=True)
         server_thread.start()
         print(f"NETCONF server started on port {self.port}")
-        
+
+    def stop(self):
+        self.running = False
+        if self._loop is not None and self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+
     def _run_server(self):
         """Run the NETCONF server loop"""
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.bind(('0.0.0.0', self.port))
-        sock.listen(5)
-        
-        while self.running:
+        try:
+            asyncio.run(self.serve())
+        except Exception as e:
+            print(f"NETCONF server error: {e}")
+
+    async def serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(
+            self._handle_client, self.host, self.port, backlog=max(128, self.max_sessions)
+        )
+        async with self._server:
             try:
-                conn, addr = sock.accept()
-                threading.Thread(
-                    target=self._handle_client,
-                    args=(conn, addr),
-                    daemon=True
-                ).start()
-            except Exception as e:
-                print(f"NETCONF server error: {e}")
-                
-    def _handle_client(self, conn, addr):
+                await self._server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def _hello(self, session_id):
+        hello = etree.Element(f'{{{BASE_NS}}}hello', nsmap={None: BASE_NS})
+        capabilities = etree.SubElement(hello, f'{{{BASE_NS}}}capabilities')
+        for uri in (CAP_BASE_10, CAP_BASE_11, f'{OPEN5GS_NS}?module=open5gs'):
+            etree.SubElement(capabilities, f'{{{BASE_NS}}}capability').text = uri
+        etree.SubElement(hello, f'{{{BASE_NS}}}session-id').text = str(session_id)
+        return etree.tostring(hello, xml_declaration=True, encoding='UTF-8')
+
+    async def _send(self, session, body):
+        session.writer.write(encode_message(body, session.chunked))
+        await session.writer.drain()
+
+    async def _handle_client(self, reader, writer):
         """Handle NETCONF client connection"""
-        print(f"NETCONF client connected: {addr}")
+        if len(self._sessions) >= self.max_sessions:
+            NETCONF_REJECTED_SESSIONS.inc()
+            writer.close()
+            return
+
+        session = _Session(next(self._session_ids), writer)
+        self._sessions[session.session_id] = session
         NETCONF_SESSIONS.inc()
-        # Send NETCONF hello
-        hello = '''<?xml version="1.0" encoding="UTF-8"?>
-        <hello xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">
-            <capabilities>
-                <capability>urn:ietf:params:netconf:base:1.0</capability>
-                <capability>urn:ietf:params:netconf:base:1.1</capability>
-            </capabilities>
-        </hello>]]>]]>'''
-        
+        NETCONF_ACTIVE_SESSIONS.inc()
+        framer = MessageFramer()
+        parser = None
+        message_bytes = 0
+        hello_received = False
+
         try:
-            conn.send(hello.encode())
-            conn.close()
+            await self._send(session, self._hello(session.session_id))
+            while True:
+                data = await asyncio.wait_for(reader.read(65536), NETCONF_IDLE_TIMEOUT_SECONDS)
+                if not data:
+                    break
+                for kind, payload in framer.feed(data):
+                    if kind == 'data':
+                        if parser is None:
+                            payload = payload.lstrip()
+                            if not payload:
+                                continue
+                            parser = etree.XMLParser(resolve_entities=False, no_network=True)
+                        message_bytes += len(payload)
+                        if message_bytes > NETCONF_MAX_MESSAGE_BYTES:
+                            raise FramingError('message exceeds size limit')
+                        parser.feed(payload)
+                        continue
+
+                    if parser is None:
+                        continue
+                    root, parser, message_bytes = parser.close(), None, 0
+                    if not hello_received:
+                        hello_received = True
+                        session.chunked = framer.chunked = self._negotiate(root)
+                        continue
+                    if not await self._process_rpc(session, root):
+                        return
+        except (FramingError, etree.XMLSyntaxError) as e:
+            try:
+                await self._send(session, self._error_reply(None, RpcError('malformed-message', str(e), 'rpc')))
+            except Exception:
+                pass
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
         except Exception as e:
-            print(f"Error handling NETCONF client: {e}")
\ No newline at end of file
+            print(f"Error handling NETCONF client: {e}")
+        finally:
+            self._sessions.pop(session.session_id, None)
+            NETCONF_ACTIVE_SESSIONS.dec()
+            writer.close()
+
+    @staticmethod
+    def _negotiate(hello):
+        if _local(hello.tag) != 'hello':
+            raise FramingError('expected <hello>')
+        capabilities = {(c.text or '').strip() for c in hello.iter(f'{{{BASE_NS}}}capability')}
+        if not capabilities & {CAP_BASE_10, CAP_BASE_11}:
+            raise FramingError('no common base capability')
+        return CAP_BASE_11 in capabilities
+
+    async def _process_rpc(self, session, root):
+        """Dispatch one <rpc>; returns False when the session should end."""
+        operation = 'unknown'
+        start = time.perf_counter()
+        try:
+            if root.tag != f'{{{BASE_NS}}}rpc' or not len(root):
+                raise RpcError('malformed-message', 'expected <rpc> with an operation', 'rpc')
+            operation = _local(root[0].tag) or 'unknown'
+            if operation == 'close-session':
+                await self._send(session, self._ok_reply(root))
+                return False
+            if operation == 'kill-session':
+                self._kill_session(session, root[0])
+                body = self._ok_reply(root)
+            else:
+                loop = asyncio.get_running_loop()
+                body = await loop.run_in_executor(self._executor, self._dispatch, root, operation)
+        except RpcError as e:
+            NETCONF_RPC_ERRORS.labels(operation=operation).inc()
+            body = self._error_reply(root, e)
+        NETCONF_RPC_LATENCY.labels(operation=operation).observe(time.perf_counter() - start)
+        await self._send(session, body)
+        return True
+
+    def _kill_session(self, session, request):
+        target = request.findtext(f'{{{BASE_NS}}}session-id')
+        if not target or not target.strip().isdigit():
+            raise RpcError('missing-element', 'session-id is required', 'protocol')
+        target_id = int(target)
+        if target_id == session.session_id:
+            raise RpcError('invalid-value', 'cannot kill the current session', 'protocol')
+        other = self._sessions.get(target_id)
+        if other is None:
+            raise RpcError('invalid-value', f'unknown session {target_id}', 'protocol')
+        other.writer.close()
+
+    def _dispatch(self, root, operation):
+        handler = {
+            'get': self._rpc_get,
+            'get-config': self._rpc_get_config,
+            'edit-config': self._rpc_edit_config,
+        }.get(operation)
+        if handler is None:
+            raise RpcError('operation-not-supported', f'{operation} is not supported', 'protocol')
+        try:
+            return handler(root, root[0])
+        except RpcError:
+            raise
+        except Exception as e:
+            raise RpcError('operation-failed', str(e))
+
+    # ---- replies -------------------------------------------------------
+
+    @staticmethod
+    def _reply(rpc):
+        reply = etree.Element(f'{{{BASE_NS}}}rpc-reply', nsmap={None: BASE_NS})
+        if rpc is not None:
+            for key, value in rpc.attrib.items():
+                reply.set(key, value)
+        return reply
+
+    def _ok_reply(self, rpc):
+        reply = self._reply(rpc)
+        etree.SubElement(reply, f'{{{BASE_NS}}}ok')
+        return etree.tostring(reply, xml_declaration=True, encoding='UTF-8')
+
+    def _error_reply(self, rpc, error):
+        reply = self._reply(rpc)
+        rpc_error = etree.SubElement(reply, f'{{{BASE_NS}}}rpc-error')
+        etree.SubElement(rpc_error, f'{{{BASE_NS}}}error-type').text = error.error_type
+        etree.SubElement(rpc_error, f'{{{BASE_NS}}}error-tag').text = error.tag
+        etree.SubElement(rpc_error, f'{{{BASE_NS}}}error-severity').text = 'error'
+        etree.SubElement(rpc_error, f'{{{BASE_NS}}}error-message').text = str(error)
+        return etree.tostring(reply, xml_declaration=True, encoding='UTF-8')
+
+    def _data_reply(self, rpc, containers):
+        reply = self._reply(rpc)
+        data = etree.SubElement(reply, f'{{{BASE_NS}}}data')
+        for container in containers:
+            data.append(container)
+        return etree.tostring(reply, xml_declaration=True, encoding='UTF-8')
+
+    # ---- operations ----------------------------------------------------
+
+    @staticmethod
+    def _check_source(request, tag='source'):
+        datastore = request.find(f'{{{BASE_NS}}}{tag}')
+        if datastore is None or not len(datastore):
+            raise RpcError('missing-element', f'{tag} is required', 'protocol')
+        if _local(datastore[0].tag) != 'running':
+            raise RpcError('invalid-value', 'only the running datastore is supported', 'protocol')
+
+    @staticmethod
+    def _filter(request):
+        """Return {container: subtree} from a subtree filter, or None for no filter."""
+        selection = request.find(f'{{{BASE_NS}}}filter')
+        if selection is None:
+            return None
+        if selection.get('type', 'subtree') != 'subtree':
+            raise RpcError('invalid-value', 'only subtree filters are supported', 'protocol')
+        return {_local(child.tag): child for child in selection if _local(child.tag)}
+
+    def _subscribers_element(self, selection):
+        container = etree.Element(f'{{{OPEN5GS_NS}}}subscribers', nsmap={None: OPEN5GS_NS})
+        imsi = None
+        if selection is not None:
+            imsi = selection.findtext(f'{{{OPEN5GS_NS}}}subscriber/{{{OPEN5GS_NS}}}imsi')
+        if imsi:
+            subscriber = self.subscriber_store.get(imsi.strip())
+            subscribers = [subscriber] if subscriber else []
+        else:
+            subscribers = self.subscriber_store.iter_documents()
+        for subscriber in subscribers:
+            _append_value(container, 'subscriber', subscriber)
+        return container
+
+    def _core_element(self):
+        container = etree.Element(f'{{{OPEN5GS_NS}}}core', nsmap={None: OPEN5GS_NS})
+        for nf, values in self.metrics_provider().items():
+            element = etree.SubElement(container, f'{{{OPEN5GS_NS}}}{nf}')
+            _append_value(element, 'metrics', values)
+        return container
+
+    def _rpc_get(self, rpc, request):
+        selection = self._filter(request)
+        containers = []
+        if selection is None or 'subscribers' in selection:
+            containers.append(self._subscribers_element((selection or {}).get('subscribers')))
+        if selection is None or 'core' in selection:
+            containers.append(self._core_element())
+        return self._data_reply(rpc, containers)
+
+    def _rpc_get_config(self, rpc, request):
+        self._check_source(request)
+        selection = self._filter(request)
+        containers = []
+        if selection is None or 'subscribers' in selection:
+            containers.append(self._subscribers_element((selection or {}).get('subscribers')))
+        return self._data_reply(rpc, containers)
+
+    def _rpc_edit_config(self, rpc, request):
+        self._check_source(request, 'target')
+        config = request.find(f'{{{BASE_NS}}}config')
+        if config is None:
+            raise RpcError('missing-element', 'config is required', 'protocol')
+        default_operation = request.findtext(f'{{{BASE_NS}}}default-operation') or 'merge'
+
+        for subscriber in config.iter(f'{{{OPEN5GS_NS}}}subscriber'):
+            operation = subscriber.get(f'{{{BASE_NS}}}operation', default_operation)
+            data = _subscriber_input(subscriber)
+            imsi = data.get('imsi', '')
+            if not imsi:
+                raise RpcError('missing-element', 'subscriber imsi is required')
+
+            if operation in ('delete', 'remove'):
+                if not self.subscriber_store.delete(imsi) and operation == 'delete':
+                    raise RpcError('data-missing', f'subscriber {imsi} does not exist')
+            elif operation in ('merge', 'replace', 'create'):
+                existing = self.subscriber_store.get(imsi)
+                if operation == 'create' and existing is not None:
+                    raise RpcError('data-exists', f'subscriber {imsi} already exists')
+                if operation == 'merge' and existing is not None:
+                    self._merge_subscriber(imsi, existing, data)
+                else:
+                    self.subscriber_store.upsert(self._subscriber_document(data))
+            elif operation != 'none':
+                raise RpcError('bad-attribute', f'unknown operation {operation}', 'protocol')
+        return self._ok_reply(rpc)
+
+    def _subscriber_document(self, data):
+        """Full document for create/replace: builder defaults overlaid with the supplied containers."""
+        flat = {key: value for key, value in data.items() if not isinstance(value, (dict, list))}
+        try:
+            doc = self.document_builder(flat)
+        except ValueError as e:
+            raise RpcError('invalid-value', str(e))
+        for key, value in data.items():
+            if key == 'security' and isinstance(value, dict):
+                doc['security'] = dict(doc['security'], **value)
+            elif isinstance(value, (dict, list)):
+                doc[key] = value
+        return doc
+
+    def _merge_subscriber(self, imsi, existing, data):
+        """Apply only the supplied leaves to an existing subscriber."""
+        supplied = {key: value for key, value in data.items() if key != 'imsi'}
+        security = {name: supplied.pop(name) for name in _SECURITY_LEAVES if name in supplied}
+        if security:
+            supplied['security'] = dict(supplied.get('security') or {}, **security)
+        flat = [name for name in ('dnn', 'sst', 'type') if name in supplied]
+        if flat:
+            raise RpcError('invalid-value', f"merge {', '.join(flat)} through slice/session, not top-level leaves")
+        paths = _merge_paths(existing, supplied)
+        if paths and not self.subscriber_store.update_fields(imsi, paths):
+            raise RpcError('data-missing', f'subscriber {imsi} does not exist')
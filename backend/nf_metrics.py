@@ -0,0 +1,55 @@
+from prometheus_client.core import GaugeMetricFamily
+
+
+class NFMetricsCollector:
+    """Prometheus collector that reads per-core NF gauges from the current metrics snapshot.
+
+    Values are taken from one snapshot reference per scrape, so a scrape
+    never mixes two collection cycles and the collector thread does not
+    touch any gauge children. Every worker holds the current snapshot
+    (followers mirror the elected collector), so this works unchanged in
+    multiprocess mode. Every series carries a `core` label; cluster totals
+    are a `sum by (nf)` away.
+    """
+
+    def __init__(self, cores_provider):
+        self._cores_provider = cores_provider
+
+    def collect(self):
+        cores = self._cores_provider()
+
+        up = GaugeMetricFamily('core_up', 'Whether the last collection from a core succeeded', labels=['core'])
+        status = GaugeMetricFamily(
+            'nf_status', 'Network function status (1 active, 0 down)', labels=['nf', 'core']
+        )
+        load = GaugeMetricFamily('nf_load_percent', 'Network function load percentage', labels=['nf', 'core'])
+        sessions = GaugeMetricFamily('nf_sessions_total', 'Sessions handled per NF', labels=['nf', 'core'])
+        registered = GaugeMetricFamily('registered_ues_total', 'Total registered UEs', labels=['core'])
+        throughput = GaugeMetricFamily('upf_throughput_mbps', 'UPF throughput Mbps', labels=['core'])
+        packets = GaugeMetricFamily('upf_packets_total', 'UPF packet count', labels=['core'])
+
+        for core, state in cores.items():
+            up.add_metric([core], 1 if state.get('status') == 'up' else 0)
+            metrics = state.get('metrics') or {}
+            amf = metrics.get('amf', {})
+            smf = metrics.get('smf', {})
+            upf = metrics.get('upf', {})
+
+            for nf in ('amf', 'smf', 'upf'):
+                status.add_metric([nf, core], 1 if metrics.get(nf, {}).get('status') == 'active' else 0)
+            load.add_metric(['amf', core], amf.get('load', 0))
+            load.add_metric(['smf', core], smf.get('load', 0))
+            load.add_metric(['upf', core], upf.get('throughput', 0) / 10)
+            sessions.add_metric(['amf', core], amf.get('sessions', 0))
+            sessions.add_metric(['smf', core], smf.get('pdu_sessions', 0))
+            registered.add_metric([core], amf.get('registered_ues', 0))
+            throughput.add_metric([core], upf.get('throughput', 0))
+            packets.add_metric([core], upf.get('packets', 0))
+
+        yield up
+        yield status
+        yield load
+        yield sessions
+        yield registered
+        yield throughput
+        yield packets
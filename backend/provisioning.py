@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+import time
+
+DEFAULT_BULK_CHUNK_SIZE = int(os.getenv('SUBSCRIBER_BULK_CHUNK_SIZE', '1000'))
+MAX_BULK_CHUNK_SIZE = 10000
+IMPORT_MAX_ERRORS = int(os.getenv('IMPORT_MAX_ERRORS', '100'))
+IMPORT_ERROR_SPILL_DIR = os.getenv('IMPORT_ERROR_SPILL_DIR', '').strip()
+
+
+def resolve_chunk_size(value):
+    """Clamp a user-supplied chunk size, falling back to the configured default."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_BULK_CHUNK_SIZE
+    return max(1, min(size, MAX_BULK_CHUNK_SIZE))
+
+
+class ImportErrorSink:
+    """Keep the first `limit` errors in memory and optionally spill every error to NDJSON."""
+
+    def __init__(self, limit=IMPORT_MAX_ERRORS, spill=False):
+        self.limit = limit
+        self.count = 0
+        self.sample = []
+        self.spill_path = None
+        self._spill_file = None
+        if spill or IMPORT_ERROR_SPILL_DIR:
+            fd, self.spill_path = tempfile.mkstemp(
+                prefix='import-errors-', suffix='.ndjson', dir=IMPORT_ERROR_SPILL_DIR or None
+            )
+            self._spill_file = os.fdopen(fd, 'w', encoding='utf-8')
+
+    def append(self, error):
+        self.count += 1
+        if len(self.sample) < self.limit:
+            self.sample.append(error)
+        if self._spill_file is not None:
+            self._spill_file.write(json.dumps(error) + '\n')
+
+    def close(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def summary(self):
+        return {
+            'errors': self.sample,
+            'error_count': self.count,
+            'errors_truncated': self.count > len(self.sample),
+            'errors_file': self.spill_path,
+        }
+
+
+class SubscriberBulkWriter:
+    """Group subscriber upserts into unordered bulk writes of `chunk_size` rows.
+
+    Write failures are appended to `errors`, which may be a list or an
+    `ImportErrorSink` when the error volume has to stay bounded.
+    """
+
+    def __init__(self, store, chunk_size=DEFAULT_BULK_CHUNK_SIZE, errors=None):
+        self.store = store
+        self.chunk_size = chunk_size
+        self.written = 0
+        self.errors = [] if errors is None else errors
+        self._pending = []
+        self._chunk_count = 0
+        self._chunk_seconds_total = 0.0
+        self._chunk_seconds_min = None
+        self._chunk_seconds_max = 0.0
+        self._started = time.perf_counter()
+
+    def add(self, doc):
+        self._pending.append(doc)
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        chunk, self._pending = self._pending, []
+        start = time.perf_counter()
+        try:
+            failures = self.store.upsert_many(chunk)
+        except Exception as exc:
+            failures = [(doc['imsi'], str(exc)) for doc in chunk]
+        elapsed = time.perf_counter() - start
+
+        self._chunk_count += 1
+        self._chunk_seconds_total += elapsed
+        self._chunk_seconds_max = max(self._chunk_seconds_max, elapsed)
+        if self._chunk_seconds_min is None or elapsed < self._chunk_seconds_min:
+            self._chunk_seconds_min = elapsed
+
+        self.written += len(chunk) - len(failures)
+        for imsi, error in failures:
+            self.errors.append({'imsi': imsi, 'error': error})
+
+    def stats(self):
+        """Throughput and chunk timings for the rows flushed so far."""
+        elapsed = time.perf_counter() - self._started
+        count = self._chunk_count
+        return {
+            'chunk_size': self.chunk_size,
+            'elapsed_seconds': round(elapsed, 4),
+            'rows_per_second': round(self.written / elapsed, 1) if elapsed > 0 else 0.0,
+            'chunks': {
+                'count': count,
+                'min_seconds': round(self._chunk_seconds_min or 0.0, 4),
+                'avg_seconds': round(self._chunk_seconds_total / count, 4) if count else 0.0,
+                'max_seconds': round(self._chunk_seconds_max, 4),
+            },
+        }
@@ -0,0 +1,392 @@
+import csv
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from export_formats import ARROW_FORMATS, iter_arrow_records, iter_ndjson_records, parquet_row_count
+from key_material import KeyMaterialStage
+from provisioning import DEFAULT_BULK_CHUNK_SIZE, IMPORT_MAX_ERRORS
+
+JOB_STATE_DIR = os.getenv('JOB_STATE_DIR', os.path.join(tempfile.gettempdir(), 'open5gs-jobs'))
+JOB_CHUNK_WORKERS = int(os.getenv('JOB_CHUNK_WORKERS', '4'))
+JOB_CHUNK_RETRIES = int(os.getenv('JOB_CHUNK_RETRIES', '3'))
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '120'))
+JOB_CHUNK_ERROR_SAMPLE = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    source TEXT NOT NULL,
+    format TEXT NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    options TEXT NOT NULL,
+    total_rows INTEGER,
+    owner TEXT,
+    heartbeat REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS job_chunks (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    created INTEGER NOT NULL,
+    error_count INTEGER NOT NULL,
+    errors TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    PRIMARY KEY (job_id, idx)
+);
+"""
+
+
+class JobCheckpointStore:
+    """SQLite file holding provisioning jobs and the chunks each one has finished.
+
+    The file may be shared by several worker processes; claims use a
+    conditional UPDATE so only one process runs a job at a time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def create(self, job):
+        columns = ', '.join(job)
+        placeholders = ', '.join('?' for _ in job)
+        self._execute(f'INSERT INTO jobs ({columns}) VALUES ({placeholders})', tuple(job.values()))
+
+    def get(self, job_id):
+        rows = self._execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+        return dict(rows[0]) if rows else None
+
+    def list(self, limit=50):
+        return [dict(row) for row in self._execute('SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,))]
+
+    def update(self, job_id, **fields):
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        self._execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+
+    def claim(self, job_id, owner, lease_seconds):
+        """Take a job that is queued, unowned or whose owner stopped heartbeating."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET owner = ?, heartbeat = ?, status = 'running', started_at = COALESCE(started_at, ?) "
+                "WHERE id = ? AND status IN ('queued', 'running', 'interrupted') "
+                "AND (owner IS NULL OR owner = ? OR heartbeat < ?)",
+                (owner, now, now, job_id, owner, now - lease_seconds)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, job_id, lease_seconds):
+        """Requeue an unfinished job unless it is running under a live heartbeat."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, error = NULL, finished_at = NULL "
+                "WHERE id = ? AND status != 'completed' "
+                "AND (status != 'running' OR heartbeat IS NULL OR heartbeat < ?)",
+                (job_id, time.time() - lease_seconds)
+            )
+            return cursor.rowcount == 1
+
+    def stale(self, lease_seconds):
+        rows = self._execute(
+            "SELECT id FROM jobs WHERE status IN ('queued', 'running', 'interrupted') "
+            "AND (heartbeat IS NULL OR heartbeat < ?)",
+            (time.time() - lease_seconds,)
+        )
+        return [row['id'] for row in rows]
+
+    def heartbeat(self, job_id, owner):
+        self._execute('UPDATE jobs SET heartbeat = ? WHERE id = ? AND owner = ?', (time.time(), job_id, owner))
+
+    def record_chunk(self, job_id, index, rows, created, errors):
+        self._execute(
+            'INSERT OR REPLACE INTO job_chunks VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (job_id, index, rows, created, len(errors), json.dumps(errors[:JOB_CHUNK_ERROR_SAMPLE]), time.time())
+        )
+
+    def completed_chunks(self, job_id):
+        return {row['idx'] for row in self._execute('SELECT idx FROM job_chunks WHERE job_id = ?', (job_id,))}
+
+    def totals(self, job_id):
+        row = self._execute(
+            'SELECT COUNT(*) AS chunks, COALESCE(SUM(rows), 0) AS rows, COALESCE(SUM(created), 0) AS created, '
+            'COALESCE(SUM(error_count), 0) AS error_count FROM job_chunks WHERE job_id = ?', (job_id,)
+        )[0]
+        return dict(row)
+
+    def errors(self, job_id, limit=IMPORT_MAX_ERRORS):
+        errors = []
+        for row in self._execute('SELECT errors FROM job_chunks WHERE job_id = ? ORDER BY idx', (job_id,)):
+            errors.extend(json.loads(row['errors']))
+            if len(errors) >= limit:
+                break
+        return errors[:limit]
+
+
+def _chunked(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ProvisioningJobs:
+    """Background, checkpointed subscriber batch and import jobs.
+
+    The request body (or upload) is spooled to JOB_STATE_DIR and split into
+    chunks. The submitting thread validates chunks in order (key material
+    and in-batch duplicates need the whole batch so far), and a pool of
+    JOB_CHUNK_WORKERS writes them with IMSI upserts. Each finished chunk is
+    checkpointed, so an interrupted job resumes from the first unfinished
+    chunk and replayed chunks are idempotent.
+    """
+
+    def __init__(self, store_provider, build, import_build, state_dir=JOB_STATE_DIR, workers=JOB_CHUNK_WORKERS,
+                 lease_seconds=JOB_LEASE_SECONDS):
+        self.state_dir = state_dir
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.owner = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self._store_provider = store_provider
+        self._builders = {'subscriber-batch': build, 'subscriber-import': import_build}
+        self._checkpoints = None
+        self._init_lock = threading.Lock()
+        self._running = {}
+        self._stop = threading.Event()
+
+    @property
+    def checkpoints(self):
+        # Opened on first use so importing the app never touches the state dir.
+        with self._init_lock:
+            if self._checkpoints is None:
+                os.makedirs(self.state_dir, mode=0o700, exist_ok=True)
+                self._checkpoints = JobCheckpointStore(os.path.join(self.state_dir, 'jobs.sqlite3'))
+            return self._checkpoints
+
+    def submit_batch(self, entries, chunk_size=DEFAULT_BULK_CHUNK_SIZE, op=None):
+        job_id = uuid.uuid4().hex
+        path = self._spool_path(job_id, 'ndjson')
+        with self._open_spool(path, 'w') as handle:
+            for entry in entries:
+                handle.write(json.dumps(entry or {}, separators=(',', ':')) + '\n')
+        return self._create(job_id, 'subscriber-batch', path, 'ndjson', chunk_size, op, total_rows=len(entries))
+
+    def submit_import(self, stream, fmt, chunk_size=DEFAULT_BULK_CHUNK_SIZE, op=None):
+        job_id = uuid.uuid4().hex
+        path = self._spool_path(job_id, fmt)
+        with self._open_spool(path, 'wb') as handle:
+            shutil.copyfileobj(stream, handle, 1024 * 1024)
+        return self._create(job_id, 'subscriber-import', path, fmt, chunk_size, op)
+
+    def resume(self, job_id):
+        """Restart a failed, interrupted or orphaned job from its last checkpoint.
+
+        A job another process is still running (heartbeat within the lease)
+        is left alone and returned as is.
+        """
+        job = self.checkpoints.get(job_id)
+        if job is None:
+            return None
+        if job_id in self._running or not self.checkpoints.release(job_id, self.lease_seconds):
+            return job
+        self._start(job_id)
+        return self.checkpoints.get(job_id)
+
+    def resume_stale(self):
+        """Pick up jobs whose owning process stopped heartbeating (e.g. it was restarted)."""
+        for job_id in self.checkpoints.stale(self.lease_seconds):
+            if job_id not in self._running:
+                print(f"Resuming provisioning job {job_id}")
+                self._start(job_id)
+
+    def status(self, job_id):
+        """Job state with progress, rows/s, ETA and an error sample; None if unknown."""
+        job = self.checkpoints.get(job_id)
+        if job is None:
+            return None
+        totals = self.checkpoints.totals(job_id)
+        options = json.loads(job['options'])
+        elapsed = (job['finished_at'] or time.time()) - job['started_at'] if job['started_at'] else 0
+        rows_this_run = totals['rows'] - options.get('resumed_rows', 0)
+        rate = rows_this_run / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if job['total_rows'] is not None and rate > 0 and job['status'] == 'running':
+            eta = round(max(0, job['total_rows'] - totals['rows']) / rate, 1)
+        return {
+            'id': job['id'],
+            'kind': job['kind'],
+            'status': job['status'],
+            'format': job['format'],
+            'created_at': job['created_at'],
+            'started_at': job['started_at'],
+            'finished_at': job['finished_at'],
+            'progress': {
+                'rows': totals['rows'],
+                'total_rows': job['total_rows'],
+                'created': totals['created'],
+                'error_count': totals['error_count'],
+                'chunks': totals['chunks'],
+                'chunk_size': job['chunk_size'],
+                'rows_per_second': round(rate, 1),
+                'eta_seconds': eta,
+            },
+            'errors': self.checkpoints.errors(job_id),
+            'error': job['error'],
+        }
+
+    def list(self, limit=50):
+        return [
+            {key: job[key] for key in ('id', 'kind', 'status', 'created_at', 'finished_at')}
+            for job in self.checkpoints.list(limit)
+        ]
+
+    def stop(self):
+        self._stop.set()
+
+    def _spool_path(self, job_id, fmt):
+        return os.path.join(self.state_dir, f'{job_id}.{fmt}')
+
+    def _open_spool(self, path, mode):
+        self.checkpoints  # make sure the state dir exists
+        # Spooled batches contain subscriber keys: keep them private to this user.
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        return open(fd, mode, encoding='utf-8' if 'b' not in mode else None)
+
+    def _create(self, job_id, kind, path, fmt, chunk_size, op, total_rows=None):
+        self.checkpoints.create({
+            'id': job_id,
+            'kind': kind,
+            'status': 'queued',
+            'source': path,
+            'format': fmt,
+            'chunk_size': chunk_size,
+            'options': json.dumps({'op': op}),
+            'total_rows': total_rows,
+            'created_at': time.time(),
+        })
+        self._start(job_id)
+        return job_id
+
+    def _start(self, job_id):
+        thread = threading.Thread(target=self._run, args=(job_id,), name=f'provisioning-{job_id[:8]}', daemon=True)
+        self._running[job_id] = thread
+        thread.start()
+
+    def _records(self, job):
+        if job['format'] in ARROW_FORMATS:
+            handle = open(job['source'], 'rb')
+            return handle, iter_arrow_records(handle, job['format'])
+        handle = open(job['source'], encoding='utf-8', newline='')
+        if job['format'] == 'csv':
+            return handle, csv.DictReader(handle)
+        return handle, iter_ndjson_records(handle)
+
+    def _count_rows(self, job):
+        if job['format'] == 'parquet':
+            return parquet_row_count(job['source'])
+        if job['format'] == 'arrow':
+            return None
+        handle, records = self._records(job)
+        rows = 0
+        beat = time.monotonic()
+        with handle:
+            for _ in records:
+                rows += 1
+                # Counting a large spool can outlast the lease; keep it so no other worker claims the job
+                if rows % 10000 == 0 and time.monotonic() - beat >= self.lease_seconds / 4:
+                    self.checkpoints.heartbeat(job['id'], self.owner)
+                    beat = time.monotonic()
+        return rows
+
+    def _run(self, job_id):
+        try:
+            if not self.checkpoints.claim(job_id, self.owner, self.lease_seconds):
+                return
+            job = self.checkpoints.get(job_id)
+            done = self.checkpoints.completed_chunks(job_id)
+            options = json.loads(job['options'])
+            options['resumed_rows'] = self.checkpoints.totals(job_id)['rows']
+            self.checkpoints.update(job_id, options=json.dumps(options), started_at=time.time())
+            if job['total_rows'] is None:
+                self.checkpoints.update(job_id, total_rows=self._count_rows(job))
+
+            stage = KeyMaterialStage(bytes.fromhex(options['op']) if options.get('op') else None)
+            self._process(job, stage, done)
+            self.checkpoints.update(job_id, status='completed', finished_at=time.time(), owner=None)
+            os.remove(job['source'])
+        except Exception as exc:
+            print(f"Provisioning job {job_id} failed: {exc}")
+            status = 'interrupted' if self._stop.is_set() else 'failed'
+            self.checkpoints.update(job_id, status=status, error=str(exc), finished_at=time.time(), owner=None)
+        finally:
+            self._running.pop(job_id, None)
+
+    def _process(self, job, stage, done):
+        chunk_size = job['chunk_size']
+        build = self._builders[job['kind']]
+        slots = threading.BoundedSemaphore(self.workers * 2)
+        failures = []
+
+        def written(future):
+            slots.release()
+            if future.exception() is not None:
+                failures.append(future.exception())
+
+        handle, records = self._records(job)
+        with handle, ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='provisioning-chunk') as pool:
+            for index, entries in enumerate(_chunked(records, chunk_size)):
+                if self._stop.is_set():
+                    raise RuntimeError('shutting down')
+                if failures:
+                    raise failures[0]
+                # Validation runs for finished chunks too so duplicate detection sees the whole batch.
+                docs, rejected = stage.prepare(entries, build, first_row=index * chunk_size + 1)
+                self.checkpoints.heartbeat(job['id'], self.owner)
+                if index in done:
+                    continue
+                slots.acquire()
+                pool.submit(self._write_chunk, job['id'], index, len(entries), docs, rejected).add_done_callback(written)
+        if failures:
+            raise failures[0]
+
+    def _write_chunk(self, job_id, index, rows, docs, rejected):
+        errors = [{'row': row, 'imsi': (entry or {}).get('imsi'), 'error': message} for row, entry, message in rejected]
+        delay = 0.5
+        for attempt in range(JOB_CHUNK_RETRIES + 1):
+            # Slow or retried writes must not let the lease lapse while the reader is blocked on free slots
+            self.checkpoints.heartbeat(job_id, self.owner)
+            try:
+                write_errors = self._store_provider().upsert_many(docs)
+                break
+            except Exception as exc:
+                if attempt == JOB_CHUNK_RETRIES or self._stop.is_set():
+                    raise
+                print(f"Retrying chunk {index} of job {job_id}: {exc}")
+                self._stop.wait(delay)
+                delay *= 2
+        errors.extend({'imsi': imsi, 'error': error} for imsi, error in write_errors)
+        self.checkpoints.record_chunk(job_id, index, rows, len(docs) - len(write_errors), errors)
@@ -0,0 +1,77 @@
+import gzip
+import hashlib
+import json
+import threading
+
+from flask import Response, request
+
+
+class CachedBody:
+    """A JSON payload serialized once, with its gzip form and ETags."""
+
+    __slots__ = ('version', 'body', 'gzip_body', 'etag', 'gzip_etag')
+
+    def __init__(self, version, payload):
+        self.version = version
+        self.body = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, compresslevel=6, mtime=0)
+        digest = hashlib.sha1(self.body).hexdigest()[:16]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'
+
+
+class VersionedResponseCache:
+    """Pre-serialized JSON bodies (plain and gzip) keyed by resource and data version.
+
+    A body is rebuilt only when the version passed in differs from the
+    cached one, so polling an unchanged resource costs a dict lookup.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, key, version, build):
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == version:
+            return entry
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                entry = CachedBody(version, build())
+                self._entries[key] = entry
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # If-None-Match uses weak comparison, so a W/ prefix is ignored.
+    candidates = (tag.strip() for tag in header.split(','))
+    return any(tag[2:] == etag if tag.startswith('W/') else tag == etag for tag in candidates)
+
+
+def cached_json_response(cache, key, version, build):
+    """Serve a cached JSON body with a strong ETag, 304 revalidation and gzip."""
+    return json_body_response(cache.get(key, version, build))
+
+
+def json_body_response(entry):
+    """Response for a CachedBody, honouring If-None-Match and Accept-Encoding."""
+    use_gzip = request.accept_encodings['gzip'] > 0
+    etag = entry.gzip_etag if use_gzip else entry.etag
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+
+    if _etag_matches(request.headers.get('If-None-Match'), etag):
+        return Response(status=304, headers=headers)
+
+    if use_gzip:
+        headers['Content-Encoding'] = 'gzip'
+        return Response(entry.gzip_body, mimetype='application/json', headers=headers)
+    return Response(entry.body, mimetype='application/json', headers=headers)
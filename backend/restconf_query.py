@@ -0,0 +1,134 @@
+MAX_PAGE_LIMIT = 10000
+
+
+def _split_top_level(expr):
+    """Split a fields expression on ';' that are not nested inside parentheses."""
+    parts, depth, start = [], 0, 0
+    for index, char in enumerate(expr):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth < 0:
+                raise ValueError('unbalanced parentheses in fields')
+        elif char == ';' and depth == 0:
+            parts.append(expr[start:index])
+            start = index + 1
+    if depth != 0:
+        raise ValueError('unbalanced parentheses in fields')
+    parts.append(expr[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def parse_fields(expr):
+    """Parse `a;b/c;d(e;f)` into a list of path tuples."""
+    paths = []
+    for item in _split_top_level(expr):
+        if '(' in item:
+            if not item.endswith(')'):
+                raise ValueError(f'invalid fields expression: {item}')
+            prefix, inner = item[:item.index('(')], item[item.index('(') + 1:-1]
+            base = tuple(p for p in prefix.split('/') if p)
+            if not base:
+                raise ValueError(f'invalid fields expression: {item}')
+            paths.extend(base + sub for sub in parse_fields(inner))
+        else:
+            path = tuple(p for p in item.split('/') if p)
+            if not path:
+                raise ValueError(f'invalid fields expression: {item}')
+            paths.append(path)
+    return paths
+
+
+def fields_to_projection(paths):
+    """Translate parsed field paths into a MongoDB projection."""
+    return {'.'.join(path): 1 for path in paths}
+
+
+def _select(node, path):
+    if isinstance(node, list):
+        return [value for value in (_select(item, path) for item in node) if value is not None]
+    if not isinstance(node, dict) or path[0] not in node:
+        return None
+    if len(path) == 1:
+        return {path[0]: node[path[0]]}
+    child = _select(node[path[0]], path[1:])
+    return None if child is None else {path[0]: child}
+
+
+def _merge(target, source):
+    for key, value in source.items():
+        if key in target and isinstance(target[key], dict) and isinstance(value, dict):
+            _merge(target[key], value)
+        elif key in target and isinstance(target[key], list) and isinstance(value, list):
+            for existing, extra in zip(target[key], value):
+                _merge(existing, extra)
+        else:
+            target[key] = value
+    return target
+
+
+def apply_fields(doc, paths):
+    """Return a copy of `doc` containing only the selected paths."""
+    result = {}
+    for path in paths:
+        selected = _select(doc, path)
+        if selected:
+            _merge(result, selected)
+    return result
+
+
+def apply_depth(node, depth):
+    """Prune children deeper than `depth` levels (1 keeps only top-level leaves)."""
+    if isinstance(node, list):
+        return [apply_depth(item, depth) for item in node]
+    if not isinstance(node, dict):
+        return node
+    pruned = {}
+    for key, value in node.items():
+        if isinstance(value, (dict, list)):
+            if depth > 1:
+                pruned[key] = apply_depth(value, depth - 1)
+        else:
+            pruned[key] = value
+    return pruned
+
+
+def parse_list_query(args):
+    """Extract depth/fields/limit/offset/cursor and filters from request args.
+
+    Raises ValueError for malformed values so handlers can answer 400.
+    """
+    query = {
+        'depth': None,
+        'fields': None,
+        'limit': None,
+        'offset': 0,
+        'cursor': args.get('cursor') or None,
+        'imsi_prefix': args.get('imsi-prefix') or None,
+        'msisdn': args.get('msisdn') or None,
+        'dnn': args.get('dnn') or None,
+    }
+
+    depth = args.get('depth')
+    if depth and depth != 'unbounded':
+        if not depth.isdigit() or int(depth) < 1:
+            raise ValueError('depth must be a positive integer or "unbounded"')
+        query['depth'] = int(depth)
+
+    if args.get('fields'):
+        query['fields'] = parse_fields(args['fields'])
+
+    limit = args.get('limit')
+    if limit is not None:
+        if not limit.isdigit() or int(limit) < 1:
+            raise ValueError('limit must be a positive integer')
+        query['limit'] = min(int(limit), MAX_PAGE_LIMIT)
+
+    offset = args.get('offset')
+    if offset is not None:
+        if not offset.isdigit():
+            raise ValueError('offset must be a non-negative integer')
+        query['offset'] = int(offset)
+
+    return query
@@ -0,0 +1,278 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from prometheus_client import Counter, Gauge
+
+from collector import CHANGE_STREAM_UNSUPPORTED
+from response_cache import CachedBody
+from subscriber_store import SubscriberStore
+
+SUBSCRIBER_CACHE_SIZE = int(os.getenv('SUBSCRIBER_CACHE_SIZE', '10000'))
+SUBSCRIBER_CACHE_TTL_SECONDS = float(os.getenv('SUBSCRIBER_CACHE_TTL_SECONDS', '30'))
+
+SUBSCRIBER_CACHE_LOOKUPS = Counter(
+    'subscriber_cache_lookups_total', 'Single-subscriber reads served from the cache (hit) or the store (miss)',
+    ['result']
+)
+SUBSCRIBER_CACHE_INVALIDATIONS = Counter(
+    'subscriber_cache_invalidations_total', 'Cached subscribers dropped, by cause', ['source']
+)
+SUBSCRIBER_CACHE_ENTRIES = Gauge(
+    'subscriber_cache_entries', 'Subscribers held in the read cache', multiprocess_mode='livesum'
+)
+SUBSCRIBER_CACHE_STREAM_ACTIVE = Gauge(
+    'subscriber_cache_change_stream_active',
+    'Whether the subscriber cache is invalidated from a change stream (1) or by TTL (0)',
+    multiprocess_mode='livemax'
+)
+
+
+class _Entry:
+    __slots__ = ('doc', 'doc_id', 'loaded', 'body')
+
+    def __init__(self, doc, doc_id):
+        self.doc = doc
+        self.doc_id = doc_id
+        self.loaded = time.monotonic()
+        self.body = None
+
+
+class CachedSubscriberStore(SubscriberStore):
+    """Bounded LRU read cache in front of another subscriber store.
+
+    Reads by IMSI are served from the cache, together with a JSON body
+    serialized on first use by `render`. Entries only ever hold documents
+    read back from the wrapped store: writes go to the store and then
+    drop the entry, because an upsert merges into fields (written by the
+    Open5GS WebUI, for instance) that the written document does not
+    carry. The next read loads the stored state.
+
+    Writes made by other processes (the WebUI, other workers) are picked
+    up by `watch()`, which follows a change stream on the subscribers
+    collection. Update and delete events carry only the Mongo `_id`, so
+    entries remember the id they were loaded with. Without change streams
+    (standalone MongoDB) entries expire after `ttl` seconds instead.
+    """
+
+    def __init__(self, store, render, max_entries=SUBSCRIBER_CACHE_SIZE, ttl=SUBSCRIBER_CACHE_TTL_SECONDS):
+        self._store = store
+        self._render = render
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._by_id = {}
+        # Bumped on every write or invalidation so a read that raced one does not cache what it loaded
+        self._generation = 0
+        self._watching = False
+        self._streaming = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __getattr__(self, name):
+        # Store-specific extras such as ensure_indexes()
+        return getattr(self._store, name)
+
+    # -- reads ------------------------------------------------------------
+
+    def _lookup(self, imsi):
+        with self._lock:
+            entry = self._entries.get(imsi)
+            if entry is not None and self._expired(entry):
+                self._drop(imsi)
+                SUBSCRIBER_CACHE_INVALIDATIONS.labels(source='expired').inc()
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(imsi)
+                SUBSCRIBER_CACHE_LOOKUPS.labels(result='hit').inc()
+                return entry
+            generation = self._generation
+        SUBSCRIBER_CACHE_LOOKUPS.labels(result='miss').inc()
+
+        doc_id, doc = self._store.get_with_id(imsi)
+        if doc is None:
+            return None
+        entry = _Entry(doc, doc_id)
+        with self._lock:
+            if generation == self._generation:
+                self._insert(imsi, entry)
+        return entry
+
+    def _expired(self, entry):
+        return self._watching and not self._streaming and time.monotonic() - entry.loaded > self.ttl
+
+    def get(self, imsi):
+        entry = self._lookup(imsi)
+        return entry.doc if entry is not None else None
+
+    def get_with_id(self, imsi):
+        entry = self._lookup(imsi)
+        return (entry.doc_id, entry.doc) if entry is not None else (None, None)
+
+    def get_body(self, imsi):
+        """CachedBody of the rendered subscriber, or None when it does not exist."""
+        entry = self._lookup(imsi)
+        if entry is None:
+            return None
+        body = entry.body
+        if body is None:
+            body = entry.body = CachedBody(0, self._render(entry.doc))
+        return body
+
+    def list(self):
+        return self._store.list()
+
+    def iter_documents(self, projection=None, batch_size=1000):
+        return self._store.iter_documents(projection, batch_size=batch_size)
+
+    def count(self):
+        return self._store.count()
+
+    def find_by_msisdn(self, msisdn):
+        return self._store.find_by_msisdn(msisdn)
+
+    def find_by_dnn_sst(self, dnn, sst=None):
+        return self._store.find_by_dnn_sst(dnn, sst)
+
+    def query(self, imsi_prefix=None, msisdn=None, dnn=None, cursor=None, offset=0, limit=None,
+              projection=None):
+        return self._store.query(imsi_prefix=imsi_prefix, msisdn=msisdn, dnn=dnn, cursor=cursor,
+                                 offset=offset, limit=limit, projection=projection)
+
+    # -- writes -----------------------------------------------------------
+
+    def upsert(self, doc):
+        try:
+            self._store.upsert(doc)
+        finally:
+            self.invalidate([doc['imsi']])
+
+    def upsert_many(self, docs):
+        try:
+            return self._store.upsert_many(docs)
+        finally:
+            self.invalidate(doc['imsi'] for doc in docs)
+
+    def update_fields(self, imsi, fields):
+        try:
+            return self._store.update_fields(imsi, fields)
+        finally:
+            self.invalidate([imsi])
+
+    def delete(self, imsi):
+        try:
+            return self._store.delete(imsi)
+        finally:
+            self.invalidate([imsi])
+
+    def delete_many(self, imsis):
+        imsis = list(imsis)
+        try:
+            return self._store.delete_many(imsis)
+        finally:
+            self.invalidate(imsis)
+
+    # -- cache maintenance (callers hold self._lock) ----------------------
+
+    def _insert(self, imsi, entry):
+        if imsi in self._entries:
+            self._drop(imsi)
+        self._entries[imsi] = entry
+        self._by_id[entry.doc_id] = imsi
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+            SUBSCRIBER_CACHE_INVALIDATIONS.labels(source='evicted').inc()
+        SUBSCRIBER_CACHE_ENTRIES.set(len(self._entries))
+
+    def _drop(self, imsi):
+        entry = self._entries.pop(imsi, None)
+        if entry is None:
+            return False
+        if self._by_id.get(entry.doc_id) == imsi:
+            del self._by_id[entry.doc_id]
+        SUBSCRIBER_CACHE_ENTRIES.set(len(self._entries))
+        return True
+
+    def invalidate(self, imsis, source='write'):
+        """Drop cached subscribers by IMSI."""
+        dropped = 0
+        with self._lock:
+            self._generation += 1
+            for imsi in imsis:
+                dropped += self._drop(imsi)
+        if dropped:
+            SUBSCRIBER_CACHE_INVALIDATIONS.labels(source=source).inc(dropped)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._by_id.clear()
+        SUBSCRIBER_CACHE_ENTRIES.set(0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'invalidation': 'change-stream' if self._streaming else ('ttl' if self._watching else 'writes'),
+            }
+
+    # -- change stream invalidation ----------------------------------------
+
+    def watch(self, collection):
+        """Follow `collection` (db.subscribers) so writes from other processes invalidate entries."""
+        self._watching = True
+        self._thread = threading.Thread(
+            target=self._watch, args=(collection,), name='watch-subscriber-cache', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _apply(self, change):
+        doc_id = (change.get('documentKey') or {}).get('_id')
+        imsi = (change.get('fullDocument') or {}).get('imsi')
+        if imsi is None:
+            # Every entry was loaded with its id, so an unknown id is not cached
+            with self._lock:
+                imsi = self._by_id.get(doc_id)
+        if imsi is not None:
+            self.invalidate([imsi], source='change_stream')
+
+    def _watch(self, collection):
+        from pymongo.errors import OperationFailure, PyMongoError
+
+        resume_token = None
+        pipeline = [{'$match': {'operationType': {'$in': ['insert', 'update', 'replace', 'delete']}}}]
+        while not self._stop.is_set():
+            try:
+                with collection.watch(pipeline, resume_after=resume_token, max_await_time_ms=1000) as stream:
+                    if resume_token is None:
+                        # Writes made before the stream opened were never seen
+                        self.clear()
+                    self._set_streaming(True)
+                    while not self._stop.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is not None:
+                            self._apply(change)
+                        resume_token = stream.resume_token
+            except OperationFailure as exc:
+                self._set_streaming(False)
+                if exc.code == CHANGE_STREAM_UNSUPPORTED:
+                    print("Change stream unavailable for the subscriber cache, expiring entries by TTL instead")
+                    return
+                print(f"Subscriber cache change stream restarted: {exc}")
+                resume_token = None
+                self._stop.wait(1)
+            except PyMongoError as exc:
+                print(f"Subscriber cache change stream interrupted: {exc}")
+                self._set_streaming(False)
+                self._stop.wait(5)
+
+    def _set_streaming(self, streaming):
+        self._streaming = streaming
+        SUBSCRIBER_CACHE_STREAM_ACTIVE.set(1 if streaming else 0)
@@ -0,0 +1,334 @@
+import bisect
+import copy
+import re
+import threading
+
+
+def _subscriber_dnn_sst_keys(doc):
+    """Yield the (dnn, sst) pairs a subscriber document is provisioned for."""
+    for slice_ in doc.get('slice') or []:
+        sst = slice_.get('sst')
+        for session in slice_.get('session') or []:
+            yield (session.get('name'), sst)
+
+
+class SubscriberStore:
+    """Common interface for subscriber persistence (MongoDB or in-memory)."""
+
+    def get(self, imsi):
+        raise NotImplementedError
+
+    def get_with_id(self, imsi):
+        """(backend document id, document) for one subscriber; the id is what change events carry."""
+        return imsi, self.get(imsi)
+
+    def list(self):
+        raise NotImplementedError
+
+    def iter_documents(self, projection=None, batch_size=1000):
+        """Yield subscriber documents one at a time without materializing the collection."""
+        raise NotImplementedError
+
+    def upsert(self, doc):
+        raise NotImplementedError
+
+    def upsert_many(self, docs):
+        """Upsert a chunk of documents, returning a list of (imsi, error) failures."""
+        raise NotImplementedError
+
+    def update_fields(self, imsi, fields):
+        """Set dotted-path fields on an existing subscriber, returning True when it existed."""
+        raise NotImplementedError
+
+    def delete(self, imsi):
+        """Remove one subscriber, returning True when it existed."""
+        raise NotImplementedError
+
+    def delete_many(self, imsis):
+        """Remove subscribers by IMSI, returning the number deleted."""
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def find_by_msisdn(self, msisdn):
+        raise NotImplementedError
+
+    def find_by_dnn_sst(self, dnn, sst=None):
+        raise NotImplementedError
+
+    def query(self, imsi_prefix=None, msisdn=None, dnn=None, cursor=None, offset=0, limit=None,
+              projection=None):
+        """Filtered page of subscribers ordered by IMSI.
+
+        `cursor` is the last IMSI of the previous page (keyset pagination).
+        """
+        raise NotImplementedError
+
+
+class InMemorySubscriberStore(SubscriberStore):
+    """Thread-safe subscriber store keyed by IMSI with secondary indexes.
+
+    Upserts and deletes are O(1); MSISDN and DNN/SST lookups go through
+    index sets instead of scanning every document.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._by_imsi = {}
+        self._by_msisdn = {}
+        self._by_dnn_sst = {}
+        self._sorted_imsis = None
+
+    def _index(self, doc):
+        imsi = doc['imsi']
+        msisdn = doc.get('msisdn')
+        if msisdn:
+            self._by_msisdn.setdefault(msisdn, set()).add(imsi)
+        for key in _subscriber_dnn_sst_keys(doc):
+            self._by_dnn_sst.setdefault(key, set()).add(imsi)
+
+    def _unindex(self, doc):
+        imsi = doc['imsi']
+        msisdn = doc.get('msisdn')
+        if msisdn:
+            bucket = self._by_msisdn.get(msisdn)
+            if bucket is not None:
+                bucket.discard(imsi)
+                if not bucket:
+                    del self._by_msisdn[msisdn]
+        for key in _subscriber_dnn_sst_keys(doc):
+            bucket = self._by_dnn_sst.get(key)
+            if bucket is not None:
+                bucket.discard(imsi)
+                if not bucket:
+                    del self._by_dnn_sst[key]
+
+    def get(self, imsi):
+        with self._lock:
+            return self._by_imsi.get(imsi)
+
+    def list(self):
+        with self._lock:
+            return list(self._by_imsi.values())
+
+    def iter_documents(self, projection=None, batch_size=1000):
+        # Documents are replaced, never mutated, so a snapshot of references is enough.
+        yield from self.list()
+
+    def upsert(self, doc):
+        with self._lock:
+            previous = self._by_imsi.get(doc['imsi'])
+            if previous is not None:
+                self._unindex(previous)
+            else:
+                self._sorted_imsis = None
+            self._by_imsi[doc['imsi']] = doc
+            self._index(doc)
+
+    def upsert_many(self, docs):
+        with self._lock:
+            for doc in docs:
+                self.upsert(doc)
+        return []
+
+    def update_fields(self, imsi, fields):
+        with self._lock:
+            current = self._by_imsi.get(imsi)
+            if current is None:
+                return False
+            # Stored documents are shared with readers, so update a copy and swap it in
+            doc = copy.deepcopy(current)
+            for path, value in fields.items():
+                parts = path.split('.')
+                target = doc
+                for part in parts[:-1]:
+                    target = target[int(part)] if isinstance(target, list) else target.setdefault(part, {})
+                target[parts[-1]] = value
+            self.upsert(doc)
+            return True
+
+    def delete(self, imsi):
+        with self._lock:
+            doc = self._by_imsi.pop(imsi, None)
+            if doc is None:
+                return False
+            self._unindex(doc)
+            self._sorted_imsis = None
+            return True
+
+    def delete_many(self, imsis):
+        deleted = 0
+        with self._lock:
+            for imsi in set(imsis):
+                if self.delete(imsi):
+                    deleted += 1
+        return deleted
+
+    def count(self):
+        with self._lock:
+            return len(self._by_imsi)
+
+    def find_by_msisdn(self, msisdn):
+        with self._lock:
+            return [self._by_imsi[i] for i in self._by_msisdn.get(msisdn, ())]
+
+    def find_by_dnn_sst(self, dnn, sst=None):
+        with self._lock:
+            if sst is not None:
+                imsis = self._by_dnn_sst.get((dnn, sst), set())
+            else:
+                imsis = set()
+                for (key_dnn, _), bucket in self._by_dnn_sst.items():
+                    if key_dnn == dnn:
+                        imsis |= bucket
+            return [self._by_imsi[i] for i in imsis]
+
+    def query(self, imsi_prefix=None, msisdn=None, dnn=None, cursor=None, offset=0, limit=None,
+              projection=None):
+        with self._lock:
+            if msisdn is not None or dnn is not None:
+                # Narrow through the secondary indexes and sort only the candidates.
+                candidates = None
+                if msisdn is not None:
+                    candidates = set(self._by_msisdn.get(msisdn, ()))
+                if dnn is not None:
+                    by_dnn = set()
+                    for (key_dnn, _), bucket in self._by_dnn_sst.items():
+                        if key_dnn == dnn:
+                            by_dnn |= bucket
+                    candidates = by_dnn if candidates is None else candidates & by_dnn
+                ordered = sorted(candidates)
+            else:
+                if self._sorted_imsis is None:
+                    self._sorted_imsis = sorted(self._by_imsi)
+                ordered = self._sorted_imsis
+
+            start = 0
+            if cursor is not None:
+                start = bisect.bisect_right(ordered, cursor)
+            if imsi_prefix:
+                start = max(start, bisect.bisect_left(ordered, imsi_prefix))
+
+            page = []
+            skipped = 0
+            for index in range(start, len(ordered)):
+                imsi = ordered[index]
+                if imsi_prefix and not imsi.startswith(imsi_prefix):
+                    break
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                page.append(self._by_imsi[imsi])
+                if limit is not None and len(page) >= limit:
+                    break
+            return page
+
+
+class MongoSubscriberStore(SubscriberStore):
+    """Subscriber store backed by the Open5GS `subscribers` collection.
+
+    pymongo is imported inside the methods that need it, so the in-memory
+    store works without loading the driver.
+    """
+
+    def __init__(self, db):
+        self._collection = db.subscribers
+
+    def get(self, imsi):
+        return self._collection.find_one({'imsi': imsi}, {'_id': 0})
+
+    def get_with_id(self, imsi):
+        doc = self._collection.find_one({'imsi': imsi})
+        if doc is None:
+            return None, None
+        return doc.pop('_id'), doc
+
+    def list(self):
+        return list(self._collection.find({}, {'_id': 0}))
+
+    def iter_documents(self, projection=None, batch_size=1000):
+        fields = {'_id': 0}
+        fields.update(projection or {})
+        with self._collection.find({}, fields, batch_size=batch_size) as cursor:
+            yield from cursor
+
+    def upsert(self, doc):
+        self._collection.update_one({'imsi': doc['imsi']}, {'$set': doc}, upsert=True)
+
+    def upsert_many(self, docs):
+        if not docs:
+            return []
+        from pymongo import UpdateOne
+        from pymongo.errors import BulkWriteError
+
+        operations = [UpdateOne({'imsi': doc['imsi']}, {'$set': doc}, upsert=True) for doc in docs]
+        try:
+            self._collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as exc:
+            return [
+                (docs[err['index']]['imsi'], err.get('errmsg', 'write error'))
+                for err in exc.details.get('writeErrors', [])
+            ]
+        return []
+
+    def update_fields(self, imsi, fields):
+        return self._collection.update_one({'imsi': imsi}, {'$set': fields}).matched_count > 0
+
+    def delete(self, imsi):
+        return self._collection.delete_one({'imsi': imsi}).deleted_count > 0
+
+    def delete_many(self, imsis):
+        return self._collection.delete_many({'imsi': {'$in': list(imsis)}}).deleted_count
+
+    def count(self):
+        return self._collection.count_documents({})
+
+    def find_by_msisdn(self, msisdn):
+        return list(self._collection.find({'msisdn': msisdn}, {'_id': 0}))
+
+    def find_by_dnn_sst(self, dnn, sst=None):
+        if sst is None:
+            query = {'slice.session.name': dnn}
+        else:
+            query = {'slice': {'$elemMatch': {'sst': sst, 'session.name': dnn}}}
+        return list(self._collection.find(query, {'_id': 0}))
+
+    def ensure_indexes(self):
+        """Create the indexes used by listing filters and keyset pagination.
+
+        IMSI is the subscriber key, so its index is unique; a non-unique one
+        left by older versions is replaced. It is created last so existing
+        duplicate IMSIs do not stop the other indexes from being built.
+        """
+        from pymongo import ASCENDING
+
+        self._collection.create_index([('msisdn', ASCENDING)])
+        self._collection.create_index([('slice.session.name', ASCENDING), ('slice.sst', ASCENDING)])
+        existing = self._collection.index_information().get('imsi_1')
+        if existing is not None and not existing.get('unique'):
+            self._collection.drop_index('imsi_1')
+        self._collection.create_index([('imsi', ASCENDING)], unique=True)
+
+    def query(self, imsi_prefix=None, msisdn=None, dnn=None, cursor=None, offset=0, limit=None,
+              projection=None):
+        from pymongo import ASCENDING
+
+        criteria = {}
+        if imsi_prefix:
+            criteria['imsi'] = {'$regex': '^' + re.escape(imsi_prefix)}
+        if cursor is not None:
+            criteria.setdefault('imsi', {})['$gt'] = cursor
+        if msisdn is not None:
+            criteria['msisdn'] = msisdn
+        if dnn is not None:
+            criteria['slice.session.name'] = dnn
+
+        fields = {'_id': 0}
+        if projection:
+            fields.update(projection)
+            fields['imsi'] = 1
+        found = self._collection.find(criteria, fields).sort('imsi', ASCENDING).skip(offset)
+        if limit is not None:
+            found = found.limit(limit)
+        return list(found)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Backend modules are flat and imported by name, as gunicorn and app.py do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
@@ -0,0 +1,67 @@
+import pytest
+
+from alert_rules import AlertEngine, AlertEventLog, AlertRule, RuleError, _Window
+
+
+def engine(repeat=0, **spec):
+    rule = AlertRule(dict({'name': 'amf_load', 'signal': 'amf.load', 'aggregate': 'last',
+                           'threshold': 80, 'clear': 70, 'for': 10}, **spec), repeat)
+    return AlertEngine([rule], AlertEventLog(path=''))
+
+
+def feed(alerts, samples, signal='amf.load'):
+    """[(time, value)] fed one per tick; returns (time, status, severity) of every event raised."""
+    raised = []
+    for now, value in samples:
+        raised.extend((now, event['status'], event['severity']) for event in alerts.evaluate({signal: value}, now))
+    return raised
+
+
+def test_fires_after_hold_and_resolves_only_below_clear():
+    alerts = engine()
+    events = feed(alerts, [(0, 85), (5, 90), (10, 85), (15, 75), (20, 71), (25, 69)])
+    assert events == [(10, 'firing', 'warning'), (25, 'resolved', 'info')]
+    assert alerts.active() == {}
+    assert [event['status'] for event in alerts.event_log.list()] == ['resolved', 'firing']
+
+
+def test_dip_below_threshold_restarts_hold():
+    alerts = engine()
+    assert feed(alerts, [(0, 85), (5, 79), (10, 85), (15, 85)]) == []
+    assert alerts.active()['amf_load'][0]['status'] == 'pending'
+    assert feed(alerts, [(20, 85)]) == [(20, 'firing', 'warning')]
+
+
+def test_escalation_and_repeat_while_firing():
+    alerts = engine(repeat=30, critical=95, **{'for': 0})
+    events = feed(alerts, [(0, 85), (10, 96), (20, 97), (40, 90), (45, 90)])
+    assert events == [(0, 'firing', 'warning'), (10, 'firing', 'critical'), (40, 'firing', 'warning')]
+
+
+def test_wildcard_rule_makes_one_instance_per_nf():
+    alerts = engine(signal='*.load', **{'for': 0})
+    events = alerts.evaluate({'amf.load': 90, 'smf.load': 50, 'upf.throughput': 99}, 0)
+    assert [(event['metadata']['nf'], event['message']) for event in events] == [
+        ('amf', 'amf_load: amf.load last is 90.00 (> 80.0)')
+    ]
+
+
+def test_window_aggregates_slide():
+    window = _Window(10)
+    window.track_percentiles()
+    for ts, value in [(0, 5), (4, 1), (8, 9), (12, 3)]:
+        window.push(ts, value)
+    # The sample at t=0 left the window at t=10
+    assert window.value('avg') == pytest.approx(13 / 3)
+    assert (window.value('min'), window.value('max'), window.value('last')) == (1, 9, 3)
+    assert window.value('rate') == pytest.approx((3 - 1) / 8)
+    assert window.value('p50') == 3
+
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(RuleError):
+        AlertRule({'name': 'x', 'signal': 'amf.load', 'threshold': 1, 'aggregate': 'rate'}, 0)
+    with pytest.raises(RuleError):
+        AlertRule({'name': 'x', 'signal': 'amf.load', 'threshold': 1, 'op': '=='}, 0)
+    with pytest.raises(RuleError):
+        AlertRule({'name': 'x', 'signal': 'amf.load'}, 0)
@@ -0,0 +1,76 @@
+import time
+
+from collector import IncrementalCounter
+
+
+class FakeCollection:
+    def __init__(self, db, count):
+        self.db = db
+        self.count = count
+        self.counted = 0
+
+    def count_documents(self, query, session=None):
+        self.counted += 1
+        session.operation_time = self.db.clock
+        return self.count
+
+
+class FakeSession:
+    operation_time = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeDB:
+    """Just enough of a pymongo Database for exact counts with operation times."""
+
+    def __init__(self, subscribers, sessions):
+        self.clock = 10
+        self.subscribers = FakeCollection(self, subscribers)
+        self.sessions = FakeCollection(self, sessions)
+        self.client = self
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def start_session(self):
+        return FakeSession()
+
+
+def streaming_counter(db, **options):
+    counter = IncrementalCounter(db, **options)
+    counter._streaming = {'subscribers': True, 'sessions': True}
+    counter.reconcile()
+    return counter
+
+
+def test_events_already_in_the_count_are_skipped():
+    db = FakeDB(subscribers=5, sessions=2)
+    counter = streaming_counter(db)
+    counter._apply('subscribers', {'operationType': 'insert', 'clusterTime': 9})
+    counter._apply('subscribers', {'operationType': 'insert', 'clusterTime': 10})
+    counter._apply('subscribers', {'operationType': 'insert', 'clusterTime': 11})
+    counter._apply('subscribers', {'operationType': 'delete', 'clusterTime': 12})
+    counter._apply('subscribers', {'operationType': 'insert', 'clusterTime': 13})
+    assert counter.counts() == (6, 2)
+
+
+def test_session_recounts_are_throttled():
+    db = FakeDB(subscribers=5, sessions=2)
+    counter = streaming_counter(db, session_recount=60)
+    assert db.sessions.counted == 1
+    for clock in range(11, 20):
+        db.clock = clock
+        counter._apply('sessions', {'operationType': 'update', 'clusterTime': clock})
+        counter.counts()
+    assert db.sessions.counted == 1
+
+    counter._sessions_counted = time.monotonic() - 60
+    db.sessions.count = 3
+    assert counter.counts() == (5, 3)
+    assert db.sessions.counted == 2
+    assert counter.counts() == (5, 3) and db.sessions.counted == 2
@@ -0,0 +1,36 @@
+import mongomock
+
+from deregistration import SessionDeregistrar, run_deregistration
+from subscriber_store import MongoSubscriberStore
+
+
+def deregistrar():
+    db = mongomock.MongoClient()['open5gs']
+    db.sessions.insert_many([
+        {'imsi': '999700000000001', 'state': 'ACTIVE'},
+        {'imsi': '999700000000002', 'state': 'DEREGISTERED'},
+    ])
+    return SessionDeregistrar(db.sessions, MongoSubscriberStore(db))
+
+
+class FailingDeregistrar:
+    def deregister(self, imsis):
+        return [{'imsi': imsi, 'result': 'failed', 'error': 'down'} for imsi in imsis]
+
+
+def test_per_ue_output():
+    output = run_deregistration(deregistrar(), [['999700000000001', '999700000000002', '999700000000003']])
+    assert [entry['result'] for entry in output['ue']] == ['deregistered', 'already-deregistered', 'not-found']
+    assert output['requested'] == 3 and output['result'] == 'success'
+
+
+def test_job_output_keeps_counts_and_a_failure_sample():
+    chunks = [[f'9997000000{i:05d}' for i in range(start, start + 50)] for start in range(0, 500, 50)]
+    progress = []
+    output = run_deregistration(FailingDeregistrar(), chunks, on_progress=lambda n, counts: progress.append(n),
+                                per_ue=False, failure_sample=5)
+    assert 'ue' not in output
+    assert output['failed'] == output['requested'] == 500
+    assert len(output['failed-ue']) == 5 and output['failed-ue-truncated']
+    assert output['result'] == 'partial-failure'
+    assert progress[-1] == 500
@@ -0,0 +1,27 @@
+from event_stream import EventBroadcaster, StreamSlots
+
+
+def test_broadcasters_share_the_stream_budget():
+    slots = StreamSlots(limit=2)
+    events, logs = EventBroadcaster(slots=slots), EventBroadcaster(slots=slots)
+    first, second = events.subscribe(), logs.subscribe()
+    assert first is not None and second is not None
+    assert events.subscribe() is None and logs.subscribe() is None
+
+    logs.unsubscribe(second)
+    logs.unsubscribe(second)
+    assert slots.used == 1
+    assert events.subscribe() is not None
+
+
+def test_stream_releases_its_slot_when_the_client_goes_away():
+    slots = StreamSlots(limit=1)
+    broadcaster = EventBroadcaster(slots=slots)
+    subscriber = broadcaster.subscribe()
+    frames = broadcaster.stream(subscriber, lambda: 'event: snapshot\ndata: {}\n\n')
+    assert next(frames).startswith('retry')
+    broadcaster.publish('metrics', {'version': 2})
+    assert next(frames) == 'event: snapshot\ndata: {}\n\n'
+    assert next(frames) == 'event: metrics\ndata: {"version":2}\n\n'
+    frames.close()
+    assert slots.used == 0
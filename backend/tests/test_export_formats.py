@@ -0,0 +1,39 @@
+import io
+import json
+
+import pytest
+
+import export_formats
+from app import app
+from export_formats import MissingDependencyError, resolve_format
+
+
+@pytest.fixture
+def without_pyarrow(monkeypatch):
+    monkeypatch.setattr(export_formats, '_pyarrow', (None, None))
+
+
+def test_resolve_format_from_value_or_extension():
+    assert resolve_format('NDJSON') == 'ndjson'
+    assert resolve_format(None, 'subscribers.jsonl') == 'ndjson'
+    assert resolve_format(None, 'subscribers.txt') == 'csv'
+    with pytest.raises(ValueError):
+        resolve_format('xml')
+
+
+def test_arrow_formats_without_pyarrow(without_pyarrow):
+    with pytest.raises(MissingDependencyError):
+        resolve_format('parquet')
+    response = app.test_client().get('/api/subscribers/export?format=arrow')
+    assert response.status_code == 501
+    assert 'pyarrow' in response.get_json()['error']
+
+
+def test_streamed_import_summary_is_complete_when_the_first_chunk_fails():
+    upload = (io.BytesIO(b'not json\n'), 'subscribers.ndjson')
+    response = app.test_client().post('/api/subscribers/import?stream=true', data={'file': upload})
+    error, summary = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert error['event'] == 'error' and error['error'].startswith('Invalid NDJSON: line 1')
+    assert summary['event'] == 'summary'
+    assert (summary['rows'], summary['created'], summary['error_count']) == (0, 0, 0)
+    assert summary['chunks']['count'] == 0 and 'rows_per_second' in summary
@@ -0,0 +1,15 @@
+import app as app_module
+from app import app
+
+
+def test_profiles_endpoint_is_disabled_without_admin_token(monkeypatch):
+    client = app.test_client()
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', '')
+    assert client.get('/api/admin/profiles').status_code == 404
+    assert client.delete('/api/admin/profiles').status_code == 404
+
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 'secret')
+    assert client.get('/api/admin/profiles').status_code == 403
+    assert client.get('/api/admin/profiles', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    response = client.get('/api/admin/profiles', headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 200 and 'requests' in response.get_json()
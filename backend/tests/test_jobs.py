@@ -0,0 +1,19 @@
+import os
+import time
+
+from jobs import JobRegistry
+
+
+def test_state_dir_is_created_on_start_not_construction(tmp_path):
+    registry = JobRegistry(workers=1, state_dir=str(tmp_path / 'state'))
+    assert not os.path.exists(tmp_path / 'state')
+
+    registry.start()
+    job = registry.submit('noop', lambda job: {'ok': True})
+    deadline = time.time() + 5
+    while registry.get(job.id)['status'] != 'completed' and time.time() < deadline:
+        time.sleep(0.01)
+    registry.shutdown()
+
+    assert os.path.exists(tmp_path / 'state' / 'jobs' / f'{job.id}.json')
+    assert registry.get(job.id)['result'] == {'ok': True}
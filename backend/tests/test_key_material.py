@@ -0,0 +1,82 @@
+import pytest
+
+import key_material
+from app import app, build_subscriber_document
+from export_formats import MissingDependencyError
+from key_material import KeyMaterialStage, parse_op
+
+# 3GPP TS 35.208 test set 1
+K = '465b5ce8b199b49faa5f0a2ee238a6bc'
+OP = 'cdc202d5123e20f62b6d676ac72cb318'
+OPC = 'cd63cb71954a9f4e48a5994e37a02baf'
+
+
+def row(imsi, **fields):
+    return {'imsi': imsi, 'k': K, **fields}
+
+
+def test_derives_opc_from_batch_op():
+    docs, rejected = KeyMaterialStage(parse_op(OP)).prepare(
+        [row('999700000000001'), row('999700000000002')], build_subscriber_document
+    )
+    assert rejected == []
+    assert [doc['security']['opc'] for doc in docs] == [OPC, OPC]
+
+
+def test_per_row_op_and_supplied_opc():
+    supplied = 'E8ED289DEBA952E4283B54E88E6183CA'
+    docs, rejected = KeyMaterialStage().prepare(
+        [row('999700000000001', op=OP.upper()), row('999700000000002', opc=supplied)], build_subscriber_document
+    )
+    assert rejected == []
+    assert docs[0]['security']['opc'] == OPC
+    assert docs[1]['security']['opc'] == supplied
+
+
+def test_rejects_bad_key_material_and_duplicates():
+    stage = KeyMaterialStage(parse_op(OP))
+    entries = [
+        row('999700000000001', msisdn='821012345678'),
+        row('999700000000002', k='00'),
+        row('999700000000001'),
+        row('999700000000003', msisdn='821012345678'),
+        row('999700000000004', op='xyz'),
+    ]
+    docs, rejected = stage.prepare(entries, build_subscriber_document, first_row=2)
+    assert [doc['imsi'] for doc in docs] == ['999700000000001']
+    assert [(number, message) for number, _, message in rejected] == [
+        (3, 'k must be 32 hex digits'),
+        (4, 'duplicate IMSI 999700000000001 in batch (first at row 2)'),
+        (5, 'duplicate MSISDN 821012345678 in batch (first at row 2)'),
+        (6, 'op must be 32 hex digits'),
+    ]
+
+    # Duplicate tracking spans the chunks of one batch
+    docs, rejected = stage.prepare([row('999700000000001')], build_subscriber_document, first_row=7)
+    assert docs == [] and rejected[0][0] == 7
+
+
+def test_parse_op():
+    assert parse_op(None) is None
+    assert parse_op('  ') is None
+    assert parse_op(OP) == bytes.fromhex(OP)
+    with pytest.raises(ValueError):
+        parse_op('1234')
+
+
+def test_op_without_cryptography(monkeypatch):
+    monkeypatch.setattr(key_material, '_primitives', ())
+    with pytest.raises(MissingDependencyError):
+        parse_op(OP)
+    response = app.test_client().post('/api/subscribers/batch', json={'subscribers': [row('999700000000001')],
+                                                                      'op': OP})
+    assert response.status_code == 501
+    assert 'cryptography' in response.get_json()['error']
+
+
+def test_rejected_entries_are_redacted():
+    entry = row('999700000000001', opc='E8ED289DEBA952E4283B54E88E6183CA', amf='zz', op=OP,
+                security={'k': K, 'amf': 'zz'})
+    _, rejected = KeyMaterialStage().prepare([entry], build_subscriber_document)
+    assert rejected[0][1] == {'imsi': '999700000000001', 'amf': 'zz', 'security': {'amf': 'zz'}}
+    assert entry['k'] == K  # the caller's entry is untouched
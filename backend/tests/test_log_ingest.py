@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from log_ingest import LEVELS, LogStore, LogTailer, parse_level
+
+
+def line(second, level, message):
+    return f'10/17 14:32:{second:02d}.123: [gmm] {level}: {message} (../src/amf/gmm-sm.c:1234)\n'
+
+
+def append(path, *lines):
+    with open(path, 'a', encoding='utf-8') as handle:
+        handle.writelines(lines)
+
+
+def messages(store, **filters):
+    return [entry['message'].split(' (')[0] for entry in reversed(store.query(**filters))]
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = tmp_path / 'amf.log'
+    append(path, line(1, 'INFO', 'old'))
+    return path
+
+
+@pytest.fixture
+def store():
+    return LogStore()
+
+
+@pytest.fixture
+def tailer(store, log_path):
+    return LogTailer(store, files={'amf': str(log_path)}, backfill=None)
+
+
+def test_follows_appends_and_holds_partial_lines(tailer, store, log_path):
+    assert tailer.poll() == 1
+    append(log_path, line(2, 'WARNING', 'first'), '10/17 14:32:03.000: [gmm] ERROR: par')
+    assert tailer.poll() == 1
+    append(log_path, 'tial\n')
+    assert tailer.poll() == 1
+    assert messages(store) == ['old', 'first', 'partial']
+    assert messages(store, min_level=parse_level('warning')) == ['first', 'partial']
+    assert store.query(limit=1)[0]['level'] == LEVELS[4]
+
+
+def test_rotation_drains_old_file_then_reads_new_one(tailer, store, log_path):
+    tailer.poll()
+    append(log_path, line(2, 'INFO', 'before rotate'))
+    os.rename(log_path, f'{log_path}.1')
+    # Written by the NF to the rotated file after the rename, before it reopens
+    append(f'{log_path}.1', line(3, 'INFO', 'late write'))
+    append(log_path, line(4, 'INFO', 'new file'))
+
+    assert tailer.poll() == 3
+    assert messages(store) == ['old', 'before rotate', 'late write', 'new file']
+    assert tailer.sources['amf']['inode'] == os.stat(log_path).st_ino
+
+
+def test_truncation_rereads_from_start(tailer, store, log_path):
+    append(log_path, line(2, 'INFO', 'will be truncated'))
+    tailer.poll()
+    with open(log_path, 'w', encoding='utf-8') as handle:
+        handle.write(line(5, 'INFO', 'after truncate'))
+
+    assert tailer.poll() == 1
+    assert messages(store)[-1] == 'after truncate'
+    assert tailer.sources['amf']['offset'] == os.path.getsize(log_path)
+
+
+def test_backfill_starts_on_a_line_boundary(store, log_path):
+    append(log_path, *(line(second, 'INFO', f'line {second}') for second in range(2, 10)))
+    tailer = LogTailer(store, files={'amf': str(log_path)}, backfill=len(line(9, 'INFO', 'line 9')) * 2 + 5)
+    assert tailer.poll() == 2
+    assert messages(store) == ['line 8', 'line 9']
+
+
+def test_store_evicts_oldest_entries():
+    store = LogStore(max_bytes=1000)
+    store.add((float(i), 'amf', 2, 'gmm', f'message {i}') for i in range(20))
+    stats = store.stats()
+    assert stats['bytes'] <= 1000 and stats['evicted'] == 20 - stats['entries']
+    assert [entry['message'] for entry in store.query(nf='amf', limit=2)] == ['message 19', 'message 18']
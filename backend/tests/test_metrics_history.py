@@ -0,0 +1,36 @@
+from metrics_history import MetricsHistory
+
+
+def history(samples):
+    """[(time, value)] recorded for amf.load."""
+    store = MetricsHistory()
+    for ts, value in samples:
+        store.record({'amf': {'load': value}}, ts)
+    return store
+
+
+def test_minute_tier_includes_the_open_bucket_as_partial():
+    store = history([(0, 10), (30, 20), (60, 30), (90, 50), (120, 40), (130, 60)])
+    result = store.query('amf', 'load', 0, 200, step=60)
+    assert result['tier'] == 'minute'
+    assert result['points'] == [[0, 15, 10, 20], [60, 40, 30, 50], [120, 50, 40, 60]]
+    assert result['partial'] is True
+
+    closed = store.query('amf', 'load', 0, 100, step=60)
+    assert [point[0] for point in closed['points']] == [0, 60] and closed['partial'] is False
+
+
+def test_hour_tier_merges_closed_minutes_with_the_open_one():
+    store = history([(0, 10), (3590, 30), (3600, 50), (3610, 70)])
+    result = store.query('amf', 'load', 0, 4000, step=3600)
+    assert result['tier'] == 'hour'
+    assert result['points'] == [[0, 20, 10, 30], [3600, 60, 50, 70]]
+    assert result['partial'] is True
+
+    store.record({'amf': {'load': 90}}, 3670)
+    assert store.query('amf', 'load', 0, 4000, step=3600)['points'][-1] == [3600, 70, 50, 90]
+
+
+def test_raw_tier_is_never_partial():
+    result = history([(0, 1), (2, 3)]).query('amf', 'load', 0, 10)
+    assert result['tier'] == 'raw' and result['points'][-1] == [2, 3, 3, 3] and result['partial'] is False
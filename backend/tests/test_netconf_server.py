@@ -0,0 +1,141 @@
+import mongomock
+import pytest
+from lxml import etree
+
+from app import build_subscriber_document
+from netconf_server import (
+    BASE_NS, OPEN5GS_NS, FramingError, MessageFramer, NetconfServer, RpcError, _element_value, encode_message
+)
+from subscriber_store import InMemorySubscriberStore, MongoSubscriberStore
+
+IMSI = '999700000000001'
+
+
+@pytest.fixture(params=['memory', 'mongo'])
+def store(request):
+    if request.param == 'mongo':
+        return MongoSubscriberStore(mongomock.MongoClient()['open5gs'])
+    return InMemorySubscriberStore()
+
+
+@pytest.fixture
+def server(store):
+    return NetconfServer(subscriber_store=store, document_builder=build_subscriber_document)
+
+
+def rpc(server, body):
+    root = etree.fromstring(f'<rpc xmlns="{BASE_NS}" message-id="1">{body}</rpc>'.encode())
+    return etree.fromstring(server._dispatch(root, etree.QName(root[0]).localname))
+
+
+def edit(server, subscriber, operation='merge'):
+    reply = rpc(server, (
+        f'<edit-config><target><running/></target><default-operation>{operation}</default-operation>'
+        f'<config><subscribers xmlns="{OPEN5GS_NS}"><subscriber>{subscriber}</subscriber></subscribers></config>'
+        '</edit-config>'
+    ))
+    assert reply.find(f'{{{BASE_NS}}}ok') is not None, etree.tostring(reply)
+
+
+def get_config(server):
+    reply = rpc(server, (
+        '<get-config><source><running/></source><filter type="subtree">'
+        f'<subscribers xmlns="{OPEN5GS_NS}"><subscriber><imsi>{IMSI}</imsi></subscriber></subscribers>'
+        '</filter></get-config>'
+    ))
+    subscriber = reply.find(f'{{{BASE_NS}}}data/{{{OPEN5GS_NS}}}subscribers/{{{OPEN5GS_NS}}}subscriber')
+    return subscriber, _element_value(subscriber)
+
+
+def seed(store):
+    doc = build_subscriber_document({
+        'imsi': IMSI, 'msisdn': '821012345678', 'k': '465B5CE8B199B49FAA5F0A2EE238A6BC',
+        'opc': 'E8ED289DEBA952E4283B54E88E6183CA', 'sst': 2, 'dnn': 'ims',
+    })
+    store.upsert(doc)
+    return doc
+
+
+def test_merge_only_changes_supplied_leaves(server, store):
+    original = seed(store)
+    edit(server, f'<imsi>{IMSI}</imsi><msisdn>821099999999</msisdn>')
+
+    _, config = get_config(server)
+    assert config['msisdn'] == '821099999999'
+    assert config['security'] == original['security']
+    assert config['slice'] == original['slice']
+
+
+def test_merge_nested_session_leaf_keeps_siblings(server, store):
+    original = seed(store)
+    edit(server, f'<imsi>{IMSI}</imsi><slice><sst>2</sst><session><name>ims</name>'
+                 '<qos><index>5</index></qos></session></slice>')
+
+    stored = store.get(IMSI)
+    session = stored['slice'][0]['session'][0]
+    assert session['qos'] == {'index': 5, 'arp': {'priority': 8}}
+    assert session['ambr'] == original['slice'][0]['session'][0]['ambr']
+    assert len(stored['slice']) == 1 and stored['slice'][0]['sst'] == 2
+
+
+def test_get_config_round_trips_through_edit_config(server, store):
+    original = seed(store)
+    element, _ = get_config(server)
+    store.delete(IMSI)
+
+    edit(server, ''.join(etree.tostring(child, encoding='unicode') for child in element), 'replace')
+    assert store.get(IMSI) == original
+
+
+def test_create_fills_defaults_and_rejects_existing(server, store):
+    edit(server, f'<imsi>{IMSI}</imsi><slice><sst>3</sst><session><name>iot</name></session></slice>', 'create')
+    doc = store.get(IMSI)
+    assert doc['security']['amf'] == '8000'
+    assert doc['slice'] == [{'sst': 3, 'session': [{'name': 'iot'}]}]
+
+    with pytest.raises(RpcError) as error:
+        edit(server, f'<imsi>{IMSI}</imsi>', 'create')
+    assert error.value.tag == 'data-exists'
+
+
+def frame_events(framer, pieces):
+    """Messages (joined data between 'end' events) produced by feeding `pieces` in order."""
+    messages, current = [], b''
+    for piece in pieces:
+        for kind, data in framer.feed(piece):
+            if kind == 'data':
+                current += data
+            else:
+                messages.append(current)
+                current = b''
+    return messages, current
+
+
+def test_framer_end_of_message_split_anywhere():
+    stream = b'<hello/>]]>]]><rpc message-id="1"/>]]>]]>'
+    for size in (1, 3, 7, len(stream)):
+        pieces = [stream[i:i + size] for i in range(0, len(stream), size)]
+        assert frame_events(MessageFramer(), pieces) == ([b'<hello/>', b'<rpc message-id="1"/>'], b'')
+
+
+def test_framer_holds_back_partial_delimiter():
+    framer = MessageFramer()
+    assert list(framer.feed(b'<a>]]>]]')) == [('data', b'<a>')]
+    assert list(framer.feed(b'x]]>]]>')) == [('data', b']]>]]x'), ('end', None)]
+
+
+def test_framer_chunked_messages():
+    stream = encode_message(b'<rpc message-id="2"/>', True) + b'\n#4\n<rpc\n#3\n/>x\n##\n'
+    for size in (1, 5, len(stream)):
+        framer = MessageFramer()
+        framer.chunked = True
+        pieces = [stream[i:i + size] for i in range(0, len(stream), size)]
+        assert frame_events(framer, pieces) == ([b'<rpc message-id="2"/>', b'<rpc/>x'], b'')
+
+
+@pytest.mark.parametrize('stream', [b'<rpc/>\n##\n', b'\n#0\n', b'\n#012\n', b'\n#a\n', b'\n#12345678901234'])
+def test_framer_rejects_bad_chunk_headers(stream):
+    framer = MessageFramer()
+    framer.chunked = True
+    with pytest.raises(FramingError):
+        list(framer.feed(stream))
@@ -0,0 +1,87 @@
+import json
+import time
+
+import pytest
+
+from app import build_subscriber_document
+from provisioning_jobs import ProvisioningJobs
+from subscriber_store import InMemorySubscriberStore
+
+
+@pytest.fixture
+def store():
+    return InMemorySubscriberStore()
+
+
+@pytest.fixture
+def jobs(tmp_path, store):
+    jobs = ProvisioningJobs(lambda: store, build_subscriber_document, build_subscriber_document,
+                            state_dir=str(tmp_path), workers=2, lease_seconds=60)
+    yield jobs
+    jobs.stop()
+
+
+def wait(jobs, job_id):
+    thread = jobs._running.get(job_id)
+    if thread is not None:
+        thread.join(5)
+    return jobs.status(job_id)
+
+
+def entries(count):
+    return [{'imsi': f'99970000000{i:04d}', 'k': '465B5CE8B199B49FAA5F0A2EE238A6BC',
+             'opc': 'E8ED289DEBA952E4283B54E88E6183CA'} for i in range(count)]
+
+
+def orphan(jobs, heartbeat, count=5):
+    """A running job row owned by another process, as left behind in the shared state dir."""
+    job_id = 'orphaned'
+    path = jobs._spool_path(job_id, 'ndjson')
+    with jobs._open_spool(path, 'w') as handle:
+        handle.writelines(json.dumps(entry) + '\n' for entry in entries(count))
+    jobs.checkpoints.create({
+        'id': job_id, 'kind': 'subscriber-batch', 'status': 'running', 'source': path, 'format': 'ndjson',
+        'chunk_size': 2, 'options': json.dumps({'op': None}), 'total_rows': count, 'owner': 'other-worker',
+        'heartbeat': heartbeat, 'created_at': time.time(), 'started_at': time.time(),
+    })
+    return job_id
+
+
+def test_batch_job_writes_every_chunk(jobs, store):
+    job_id = jobs.submit_batch(entries(5), chunk_size=2)
+    status = wait(jobs, job_id)
+    assert status['status'] == 'completed'
+    assert status['progress']['rows'] == 5 and status['progress']['chunks'] == 3
+    assert store.count() == 5
+
+
+def test_resume_leaves_job_with_live_heartbeat(jobs, store):
+    job_id = orphan(jobs, heartbeat=time.time())
+    job = jobs.resume(job_id)
+    assert job['status'] == 'running' and job['owner'] == 'other-worker'
+    assert job_id not in jobs._running
+    assert store.count() == 0
+
+
+def test_resume_reclaims_job_with_stale_heartbeat(jobs, store):
+    job_id = orphan(jobs, heartbeat=time.time() - 120)
+    jobs.resume(job_id)
+    assert wait(jobs, job_id)['status'] == 'completed'
+    assert store.count() == 5
+
+
+def test_counting_rows_keeps_the_lease(jobs, monkeypatch):
+    job_id = orphan(jobs, heartbeat=time.time(), count=25000)
+    jobs.checkpoints.update(job_id, owner=jobs.owner, heartbeat=0.0)
+    jobs.lease_seconds = 0
+    assert jobs._count_rows(jobs.checkpoints.get(job_id)) == 25000
+    assert jobs.checkpoints.get(job_id)['heartbeat'] > time.time() - 60
+
+
+def test_error_rows_do_not_keep_key_material(jobs):
+    bad = dict(entries(1)[0], amf='zz', op='CDC202D5123E20F62B6D676AC72CB318')
+    job_id = jobs.submit_batch([bad], chunk_size=2)
+    status = wait(jobs, job_id)
+    assert status['progress']['error_count'] == 1
+    stored = json.dumps(status) + json.dumps(jobs.checkpoints.errors(job_id))
+    assert bad['k'] not in stored and bad['opc'] not in stored and bad['op'] not in stored
@@ -0,0 +1,31 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+from response_cache import CachedBody, json_body_response
+
+ENTRY = CachedBody(1, {'imsi': '999700000000001'})
+
+
+def respond(**headers):
+    with Flask(__name__).test_request_context(headers=headers):
+        return json_body_response(ENTRY)
+
+
+@pytest.mark.parametrize('accept, gzipped', [
+    ('gzip', True), ('br, gzip;q=0.5', True), ('*', True),
+    ('gzip;q=0', False), ('deflate', False), ('*;q=0, identity', False), ('', False),
+])
+def test_gzip_follows_accept_encoding_quality(accept, gzipped):
+    response = respond(**{'Accept-Encoding': accept})
+    body = response.get_data()
+    assert (response.headers.get('Content-Encoding') == 'gzip') is gzipped
+    assert json.loads(gzip.decompress(body) if gzipped else body) == {'imsi': '999700000000001'}
+    assert response.headers['ETag'] == (ENTRY.gzip_etag if gzipped else ENTRY.etag)
+
+
+def test_matching_etag_revalidates():
+    assert respond(**{'If-None-Match': f'W/{ENTRY.etag}'}).status_code == 304
+    assert respond(**{'If-None-Match': ENTRY.etag, 'Accept-Encoding': 'gzip'}).status_code == 200
@@ -0,0 +1,99 @@
+import json
+
+import mongomock
+import pytest
+
+from app import build_subscriber_document, subscriber_resource
+from subscriber_cache import CachedSubscriberStore
+from subscriber_store import InMemorySubscriberStore, MongoSubscriberStore
+
+IMSI = '999700000000001'
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient()['open5gs']
+
+
+@pytest.fixture
+def cache(db):
+    return CachedSubscriberStore(MongoSubscriberStore(db), subscriber_resource)
+
+
+def subscriber(imsi=IMSI, **fields):
+    return build_subscriber_document({'imsi': imsi, 'k': '465B5CE8B199B49FAA5F0A2EE238A6BC',
+                                      'opc': 'E8ED289DEBA952E4283B54E88E6183CA', **fields})
+
+
+def test_upsert_keeps_fields_written_by_other_writers(db, cache):
+    cache.upsert(subscriber(msisdn='821012345678'))
+    # Fields the Open5GS WebUI sets but this API never writes
+    db.subscribers.update_one({'imsi': IMSI}, {'$set': {'schema_version': 1, 'mme_host': ['mme.local']}})
+    cache.invalidate([IMSI])
+
+    cache.upsert(subscriber(msisdn='821099999999'))
+
+    stored = db.subscribers.find_one({'imsi': IMSI}, {'_id': 0})
+    assert stored['mme_host'] == ['mme.local']
+    assert cache.get(IMSI) == stored
+    assert json.loads(cache.get_body(IMSI).body) == subscriber_resource(stored)
+
+
+def test_reads_match_backing_store_after_each_write(db, cache):
+    cache.upsert_many([subscriber(), subscriber('999700000000002')])
+    assert cache.get(IMSI) == db.subscribers.find_one({'imsi': IMSI}, {'_id': 0})
+
+    assert cache.update_fields(IMSI, {'msisdn': '821011111111'})
+    assert cache.get(IMSI)['msisdn'] == '821011111111'
+
+    assert cache.delete(IMSI)
+    assert cache.get(IMSI) is None
+    assert cache.get_body(IMSI) is None
+    assert cache.get('999700000000002') == db.subscribers.find_one({'imsi': '999700000000002'}, {'_id': 0})
+
+
+def test_hits_are_served_without_the_store(db, cache):
+    cache.upsert(subscriber())
+    first = cache.get_body(IMSI)
+    db.subscribers.update_one({'imsi': IMSI}, {'$set': {'msisdn': '821022222222'}})
+    assert cache.get_body(IMSI) is first
+    assert cache.stats()['entries'] == 1
+
+
+def test_change_event_drops_entry_by_document_id(db, cache):
+    cache.upsert(subscriber())
+    doc_id, _ = cache.get_with_id(IMSI)
+    db.subscribers.update_one({'_id': doc_id}, {'$set': {'msisdn': '821033333333'}})
+
+    cache._apply({'operationType': 'update', 'documentKey': {'_id': doc_id}})
+    assert cache.get(IMSI)['msisdn'] == '821033333333'
+
+    cache._apply({'operationType': 'delete', 'documentKey': {'_id': 'unknown'}})
+    assert cache.stats()['entries'] == 1
+
+
+def test_read_racing_a_write_is_not_cached(db, cache):
+    cache.upsert(subscriber(msisdn='821012345678'))
+    inner = cache._store
+    real = inner.get_with_id
+
+    def racing_read(imsi):
+        loaded = real(imsi)
+        cache.update_fields(imsi, {'msisdn': '821044444444'})
+        return loaded
+
+    inner.get_with_id = racing_read
+    assert cache.get(IMSI)['msisdn'] == '821012345678'
+    inner.get_with_id = real
+    assert cache.get(IMSI)['msisdn'] == '821044444444'
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = CachedSubscriberStore(InMemorySubscriberStore(), subscriber_resource, max_entries=2)
+    imsis = [f'99970000000000{i}' for i in range(3)]
+    cache.upsert_many([subscriber(imsi) for imsi in imsis])
+    cache.get(imsis[0])
+    cache.get(imsis[1])
+    cache.get(imsis[0])
+    cache.get(imsis[2])
+    assert list(cache._entries) == [imsis[0], imsis[2]]
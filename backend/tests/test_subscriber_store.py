@@ -0,0 +1,124 @@
+import mongomock
+import pymongo
+import pytest
+
+from app import build_subscriber_document
+from subscriber_store import InMemorySubscriberStore, MongoSubscriberStore
+
+
+def subscriber(index, msisdn=None, dnn='internet', sst=1):
+    return build_subscriber_document({
+        'imsi': f'9997000000{index:05d}', 'msisdn': msisdn or f'8210{index:08d}', 'dnn': dnn, 'sst': sst,
+        'k': '465B5CE8B199B49FAA5F0A2EE238A6BC', 'opc': 'E8ED289DEBA952E4283B54E88E6183CA',
+    })
+
+
+def imsis(docs):
+    return [doc['imsi'] for doc in docs]
+
+
+@pytest.fixture(params=['memory', 'mongo'])
+def store(request):
+    if request.param == 'mongo':
+        store = MongoSubscriberStore(mongomock.MongoClient()['open5gs'])
+        store.ensure_indexes()
+    else:
+        store = InMemorySubscriberStore()
+    assert store.upsert_many([subscriber(index, dnn='ims' if index % 3 == 0 else 'internet')
+                              for index in range(10)]) == []
+    return store
+
+
+def test_upsert_moves_index_entries(store):
+    imsi = subscriber(1)['imsi']
+    store.upsert(subscriber(1, msisdn='821099999999', dnn='ims', sst=2))
+
+    assert store.find_by_msisdn('821000000001') == []
+    assert sorted(imsis(store.find_by_msisdn('821099999999'))) == [imsi]
+    assert imsi not in imsis(store.find_by_dnn_sst('internet'))
+    assert sorted(imsis(store.find_by_dnn_sst('ims', 2))) == [imsi]
+    assert imsi in imsis(store.find_by_dnn_sst('ims'))
+    assert store.count() == 10
+
+
+def test_dnn_and_sst_must_match_in_the_same_slice(store):
+    doc = subscriber(42, dnn='ims', sst=1)
+    doc['slice'].append({'sst': 2, 'default_indicator': False,
+                         'session': [dict(doc['slice'][0]['session'][0], name='internet')]})
+    store.upsert(doc)
+    assert doc['imsi'] in imsis(store.find_by_dnn_sst('ims', 1))
+    assert doc['imsi'] in imsis(store.find_by_dnn_sst('internet', 2))
+    assert doc['imsi'] not in imsis(store.find_by_dnn_sst('ims', 2))
+    assert doc['imsi'] not in imsis(store.find_by_dnn_sst('internet', 1))
+
+
+def test_delete_and_update_fields_maintain_indexes(store):
+    first, second = subscriber(0)['imsi'], subscriber(1)['imsi']
+    assert store.delete(first)
+    assert not store.delete(first)
+    assert store.find_by_msisdn('821000000000') == []
+    assert first not in imsis(store.find_by_dnn_sst('ims'))
+    assert sorted(imsis(store.find_by_dnn_sst('ims', 1))) == [subscriber(i)['imsi'] for i in (3, 6, 9)]
+
+    assert store.update_fields(second, {'msisdn': '821088888888', 'slice.0.session.0.name': 'mms'})
+    assert sorted(imsis(store.find_by_msisdn('821088888888'))) == [second]
+    assert sorted(imsis(store.find_by_dnn_sst('mms', 1))) == [second]
+    assert not store.update_fields(first, {'msisdn': '1'})
+
+    assert store.delete_many([second, second, 'missing']) == 1
+    assert store.count() == 8
+
+
+def test_update_fields_does_not_mutate_documents_held_by_readers(store):
+    imsi = subscriber(2)['imsi']
+    before = store.get(imsi)
+    store.update_fields(imsi, {'security.amf': '9001'})
+    assert before['security']['amf'] == '8000'
+    assert store.get(imsi)['security']['amf'] == '9001'
+
+
+def test_query_pages_by_imsi_cursor(store):
+    pages = []
+    cursor = None
+    while True:
+        page = store.query(cursor=cursor, limit=4)
+        if not page:
+            break
+        pages.append(imsis(page))
+        cursor = page[-1]['imsi']
+    assert [len(page) for page in pages] == [4, 4, 2]
+    assert sum(pages, []) == sorted(subscriber(i)['imsi'] for i in range(10))
+
+    # New IMSIs are visible to the next page
+    store.upsert(subscriber(99))
+    assert imsis(store.query(cursor=cursor, limit=4)) == [subscriber(99)['imsi']]
+
+
+def test_query_prefix_paging_stops_at_prefix_end(store):
+    for imsi in ('001010000000001', '999710000000001'):
+        store.upsert(build_subscriber_document({'imsi': imsi, 'k': '465B5CE8B199B49FAA5F0A2EE238A6BC',
+                                                'opc': 'E8ED289DEBA952E4283B54E88E6183CA'}))
+    prefix = '999700000000'
+    first = store.query(imsi_prefix=prefix, limit=6)
+    rest = store.query(imsi_prefix=prefix, cursor=first[-1]['imsi'], limit=6)
+    assert imsis(first + rest) == sorted(subscriber(i)['imsi'] for i in range(10))
+    assert imsis(store.query(imsi_prefix=prefix, offset=8)) == [subscriber(8)['imsi'], subscriber(9)['imsi']]
+
+
+def test_query_filters_through_indexes(store):
+    ims = [subscriber(i)['imsi'] for i in (0, 3, 6, 9)]
+    assert imsis(store.query(dnn='ims')) == ims
+    assert imsis(store.query(dnn='ims', cursor=ims[1], limit=1)) == [ims[2]]
+    assert imsis(store.query(msisdn='821000000003', dnn='ims')) == [ims[1]]
+    assert store.query(msisdn='821000000003', dnn='internet') == []
+
+
+def test_ensure_indexes_makes_imsi_unique():
+    collection = mongomock.MongoClient()['open5gs'].subscribers
+    collection.create_index('imsi')
+    MongoSubscriberStore(collection.database).ensure_indexes()
+    assert collection.index_information()['imsi_1'].get('unique') is True
+
+    collection.insert_one({'imsi': '999700000000001'})
+    with pytest.raises(pymongo.errors.DuplicateKeyError):
+        collection.insert_one({'imsi': '999700000000001'})